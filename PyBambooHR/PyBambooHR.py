@@ -10,10 +10,27 @@ PyBambooHR.py contains a class by the same name with functions that correspond
 to BambooHR API calls defined at http://www.bamboohr.com/api/documentation/.
 """
 
+import contextlib
 import datetime
+import hashlib
+import os
+import threading
+import time
 import requests
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
 from . import utils
 from . import config
+from . import diff
+from .buffer import WriteBehindBuffer
+from .collection import EmployeeCollection
+from .deadline import Deadline, DeadlineExceeded, PartialDict, PartialList
+from .decode import RecordDecoder
+from .query import EmployeeIndex
+from .quota import CallMeter, CallStats, body_size
+from .records import LazyRecord
+from .tables import TableMirror
+from . import files
+from . import reports
 from .utils import make_field_xml
 from os.path import basename
 
@@ -35,6 +52,22 @@ else:
     # unicode is defined: We are running Python 2
     bytes = str
 
+# Clock for ordering loads, unaffected by changes of the system time (Python 2 has no monotonic).
+_monotonic = getattr(time, 'monotonic', time.time)
+
+
+class _EmployeesLoad(Future):
+    """
+    A get_all_employees load in flight: resolves to (employees, skipped). Keeps the time
+    it started and the update_employee changes made while it runs.
+    """
+
+    def __init__(self, key):
+        Future.__init__(self)
+        self.key = key
+        self.started = _monotonic()
+        self.updates = {}
+
 
 class PyBambooHR(object):
     """
@@ -67,6 +100,26 @@ class PyBambooHR(object):
         # Requests timeout
         self.timeout = timeout
 
+        # HTTP session used for every call. Pass one in to share its connection pool.
+        self.session = kwargs.get('session')
+        if self.session is None:
+            # Sized so that one instance can be shared by many threads without dropping connections.
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=kwargs.get('max_connections', 32))
+            self.session = requests.Session()
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+
+        # Optional CacheBackend shared with other instances (and processes) for employees, metadata and reports.
+        self.cache = kwargs.get('cache')
+        self.cache_ttl = kwargs.get('cache_ttl', 300)
+        self.meta_cache_ttl = kwargs.get('meta_cache_ttl', 3600)
+
+        # Calls made by this instance, per endpoint. call_budget caps them (see call_scope for per-job counts).
+        self.call_stats = CallStats(limit=kwargs.get('call_budget'))
+
+        # Optional ParseExecutor used to parse large XML responses in worker processes.
+        self.parse_executor = kwargs.get('parse_executor')
+
         # Referred to in the documentation as [ Company ] sometimes.
         self.subdomain = subdomain
 
@@ -82,6 +135,13 @@ class PyBambooHR(object):
         # Some people will want to use underscore keys for employee data...
         self.underscore_keys = underscore_keys
 
+        # Return employees as LazyRecords, which only translate and decode the fields that are read.
+        self.lazy_records = kwargs.get('lazy_records', False)
+
+        # Convert employee values to Python types (see record_decoder).
+        self.typed_records = kwargs.get('typed_records', False)
+        self._decoder = None
+
         # Ask BambooHR for information that is scheduled in the future
         self.only_current = kwargs.get('only_current', False)
 
@@ -187,9 +247,34 @@ class PyBambooHR(object):
             "benefitClassChangeReason": ("list", ""),
         }
 
+        # Held while the employees are swapped or changed, never during API calls. Loads build a new
+        # dictionary outside of it and swap it in, so threads reading the previous one are never disturbed.
+        # Concurrent loads of the same fields share the one in flight (an _EmployeesLoad, by field set);
+        # updates made meanwhile are replayed on its result.
+        self._employees_lock = threading.RLock()
+        self._employees_loads = {}
+        # Field set and start time of the load self.employees comes from.
+        self._employees_key = None
+        self._employees_started = None
+
+        # Guards the smaller pieces of lazily built state (decoder, report caches, indexes list).
+        self._state_lock = threading.Lock()
+
         # dicctionary with employees data
         self.employees = {}
 
+        # ids get_all_employees ran out of time for; the next call fetches them
+        self.employees_skipped = []
+
+        # Deadline and call scopes of the operation running on each thread (see deadline and call_scope)
+        self._local = threading.local()
+
+        # EmployeeIndex instances kept in sync with self.employees (see index_employees)
+        self.employee_indexes = []
+
+        # IncrementalReport instances by field-set hash (see get_cached_custom_report)
+        self.cached_reports = {}
+
     def _format_employee_xml(self, employee):
         """
         Utility method for turning an employee dictionary into valid employee xml.
@@ -215,7 +300,7 @@ class PyBambooHR(object):
         @param employee: Dictionary containing row data information.
         """
         xml_fields = ''
-        for k, v in row.iteritems():
+        for k, v in row.items():
             xml_fields += make_field_xml(k, v, pre='\t', post='\n')
 
         xml = "<row>\n{}</row>".format(xml_fields)
@@ -259,8 +344,7 @@ class PyBambooHR(object):
 
         xml = self._format_employee_xml(employee)
         url = self.base_url + 'employees/'
-        r = requests.post(url, timeout=self.timeout, data=xml, headers=self.headers, auth=(self.api_key, ''))
-        r.raise_for_status()
+        r = self._request('POST', url, data=xml)
 
         return {'url': r.headers['location'], 'id': r.headers['location'].replace(url, "")}
 
@@ -276,11 +360,101 @@ class PyBambooHR(object):
         employee = utils.camelcase_keys(employee)
         xml = self._format_employee_xml(employee)
         url = self.base_url + 'employees/{0}'.format(id)
-        r = requests.post(url, timeout=self.timeout, data=xml, headers=self.headers, auth=(self.api_key, ''))
-        r.raise_for_status()
+        r = self._request('POST', url, data=xml)
+
+        # Keep the cached copy (if any) in line with what was just written.
+        with self._employees_lock:
+            for load in self._employees_loads.values():
+                load.updates.setdefault(str(id), {}).update(employee)
+            cached = self.employees.get(str(id))
+            if cached is not None:
+                # Copy on write: threads holding the previous record keep a consistent copy.
+                cached = dict(cached)
+                cached.update(utils.underscore_keys(employee) if self.underscore_keys else employee)
+                self.employees[str(id)] = cached
+                for index in self.employee_indexes:
+                    index.upsert(id, cached)
 
         return True
 
+    def diff_employee(self, id, employee, baseline=None):
+        """
+        Utility method returning the fields of employee which differ from what is known about the employee.
+        Values are compared according to their type in employee_fields.
+
+        @param id: String of containing the employee id.
+        @param employee: Dictionary containing the wanted employee information.
+        @param baseline: Dictionary (optional) of the known employee information. Defaults to the copy in self.employees.
+        @return: Dictionary of the changed fields (camelcase keys).
+        """
+        if baseline is None:
+            baseline = self.employees.get(str(id))
+        baseline = utils.camelcase_keys(baseline) if baseline else None
+        return diff.RecordDiffer(self.employee_fields).diff(utils.camelcase_keys(employee), baseline)
+
+    def update_employee_changes(self, id, employee, baseline=None):
+        """
+        API method for updating an existing employee with only the fields that changed.
+        No request is made when nothing changed.
+
+        @param id: String of containing the employee id you want to update.
+        @param employee: Dictionary containing the wanted employee information.
+        @param baseline: Dictionary (optional) of the known employee information. Defaults to the copy in self.employees.
+        @return: Dictionary of the fields which were sent (empty when the update was skipped).
+        """
+        changes = self.diff_employee(id, employee, baseline)
+        if changes:
+            self.update_employee(id, changes)
+        return changes
+
+    def update_employees_changes(self, employees, baselines=None, max_workers=4, budget=None):
+        """
+        API method for updating many employees with only the fields that changed, concurrently.
+
+        @param employees: Dictionary of employee id to dictionary of wanted employee information.
+        @param baselines: Dictionary (optional) of employee id to known employee information. Defaults to self.employees.
+        @param max_workers: Integer number of concurrent updates.
+        @param budget: Number of seconds (optional) the whole call may take. Updates not sent in time are
+        left out of the result and listed in its skipped list.
+        @return: Dictionary of employee id to the fields which were sent, or the exception raised by the update.
+        Employees without changes are left out. A PartialDict with a budget.
+        """
+        if baselines is None:
+            baselines = self.employees
+        baselines = dict((str(k), utils.camelcase_keys(v)) for k, v in baselines.items() if v)
+        desired = dict((k, utils.camelcase_keys(v)) for k, v in employees.items())
+        changes = diff.RecordDiffer(self.employee_fields).diff_many(desired, baselines)
+
+        def update(item):
+            try:
+                self.update_employee(item[0], item[1])
+            except DeadlineExceeded:
+                return item[0], None
+            except Exception as e:
+                return item[0], e
+            return item
+
+        with self.deadline(budget) as deadline:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(self._bind_deadline(deadline, update), changes.items()))
+
+        sent = dict(r for r in results if r[1] is not None)
+        if budget is not None:
+            return PartialDict(sent, [r[0] for r in results if r[1] is None])
+        return sent
+
+    def write_behind(self, max_pending=100, flush_interval=5.0, max_workers=4):
+        """
+        Returns a WriteBehindBuffer for this instance. Its update_employee and add_row methods
+        take the same arguments as the ones here, but calls are merged per employee (and per
+        table row) and sent later in bulk. See WriteBehindBuffer for details.
+
+        @param max_pending: Integer number of buffered calls which triggers a flush.
+        @param flush_interval: Number of seconds between automatic flushes.
+        @param max_workers: Integer number of concurrent writes during a flush.
+        """
+        return WriteBehindBuffer(self, max_pending=max_pending, flush_interval=flush_interval, max_workers=max_workers)
+
     def get_employee_directory(self):
         """
         API method for returning a globally shared company directory.
@@ -289,8 +463,7 @@ class PyBambooHR(object):
         @return: A list of employee dictionaries which is a list of employees in the directory.
         """
         url = self.base_url + 'employees/directory'
-        r = requests.get(url, timeout=self.timeout, headers=self.headers, auth=(self.api_key, ''))
-        r.raise_for_status()
+        r = self._request('GET', url)
 
         data = r.json()
         employees = data['employees']
@@ -332,46 +505,217 @@ class PyBambooHR(object):
             })
 
         url = self.base_url + "employees/{0}".format(employee_id)
-        r = requests.get(url, timeout=self.timeout, headers=self.headers, params=payload, auth=(self.api_key, ''))
-        r.raise_for_status()
+        r = self._request('GET', url, params=payload)
 
-        employee = r.json()
+        return self._wrap_employee(r.json())
 
-        if self.underscore_keys:
-            employee = utils.underscore_keys(employee)
+    def get_employee_ids(self, disabledUsers=False):
+        """
+        API method for returning the ids of all employees, as used by get_all_employees.
 
-        return employee
+        @param disabledUsers: Boolean flag that indicates if disabled users are included.
+        @return: List of employee ids (strings).
+        """
+        users = {}
+        # get all employees (doesn't get whom don't have activity)
+        for u in self.get_meta_users().values():
+            users[str(u['employeeId'])] = True if u['status']=='enabled' else False
+        # get all enabled employees (included whom don't have activity, but are enabled)
+        for u in self.get_employee_directory():
+            users[u['id']] = True
+
+        # filter enabled/active employees
+        if not disabledUsers:
+            users = {k:v for k,v in users.items() if v}
+
+        return list(users.keys())
 
-    def get_all_employees(self, field_list=None, disabledUsers=False, reloadEmployees=False):
+    def get_all_employees(self, field_list=None, disabledUsers=False, reloadEmployees=False, budget=None):
         """
         API method for returning a dictionary of employees.
 
         @param allUsers: Boolean flag that indicates if get all employees.
         @param field_list: List of fields to return with the employee dictionary.
         @param reloadEmployees: Boolean flag that indicates if get all employees again.
-        @return: Dictionary of dictionarys containing employees information.
+        @param budget: Number of seconds (optional) the whole call may take. When time runs out the
+        employees fetched so far are returned, the ids left are in the result's skipped list
+        (and in self.employees_skipped), and the next call fetches them.
+        When a call budget (see call_scope) has fewer calls left than there are employees,
+        they are fetched with one custom report instead of one get_employee call each.
+        @return: Dictionary of dictionarys containing employees information (a PartialDict with a budget).
         """
-        if reloadEmployees or not self.employees:
-            self.employees = {}
+        key = (tuple(field_list) if field_list else None, bool(disabledUsers))
+        requested = _monotonic()
+        with self.deadline(budget) as deadline:
+            while True:
+                owned = None
+                with self._employees_lock:
+                    if reloadEmployees and self._employees_key == key and self._employees_started >= requested:
+                        # Another thread loaded the same fields, starting after this call did.
+                        reloadEmployees = False
+                    if not (reloadEmployees or not self.employees or self.employees_skipped):
+                        employees, skipped = self.employees, self.employees_skipped
+                        break
+                    load = self._employees_loads.get(key)
+                    if load is None:
+                        owned = self._employees_loads[key] = _EmployeesLoad(key)
+
+                if owned is not None:
+                    employees, skipped = self._swap_employees(owned, field_list, disabledUsers, reloadEmployees, budget)
+                    break
+
+                # Another thread is loading the same fields: wait for it rather than fetching too.
+                try:
+                    result = load.result(timeout=deadline.remaining() if deadline is not None else None)
+                except TimeoutError:
+                    raise DeadlineExceeded("The deadline of the operation passed while the employees were loading")
+                if not reloadEmployees or load.started >= requested:
+                    employees, skipped = result
+                    break
+                # That load started before the reload was asked for: start a fresh one.
+
+        if budget is not None:
+            return PartialDict(employees, skipped)
+        return employees
 
-            users = {}
-            # get all employees (doesn't get whom don't have activity)
-            for u in self.get_meta_users().values():
-                users[str(u['employeeId'])] = True if u['status']=='enabled' else False
-            # get all enabled employees (included whom don't have activity, but are enabled)
-            for u in self.get_employee_directory():
-                users[u['id']] = True
+    def _swap_employees(self, load, field_list, disabledUsers, reloadEmployees, budget):
+        """
+        Fetches the employees for get_all_employees (without holding _employees_lock), swaps
+        them in unless a load started later already did, and resolves load, the Future other
+        threads wait on.
+        """
+        try:
+            if self.cache is not None and budget is None:
+                # Shared with the other users of the cache; only one of them fetches at a time.
+                key = '{0}:{1}'.format(reports.field_set_key(field_list or ['*']), 'all' if disabledUsers else 'enabled')
+                fetch = lambda: self._load_employees(field_list, disabledUsers, True, None)[0]
+                employees = dict(self._cached('employees', key, fetch, self.cache_ttl, force=reloadEmployees))
+                skipped = []
+            else:
+                employees, skipped = self._load_employees(field_list, disabledUsers, reloadEmployees, budget)
+        except BaseException as e:
+            with self._employees_lock:
+                del self._employees_loads[load.key]
+            load.set_exception(e)
+            raise
+
+        with self._employees_lock:
+            # Replay the updates made while the employees were loading.
+            for employee_id, fields in load.updates.items():
+                if employee_id in employees:
+                    employees[employee_id] = dict(employees[employee_id])
+                    employees[employee_id].update(utils.underscore_keys(fields) if self.underscore_keys else fields)
+            if self._employees_started is None or load.started >= self._employees_started:
+                for index in self.employee_indexes:
+                    index.rebuild(employees)
+                self.employees, self.employees_skipped = employees, skipped
+                self._employees_key, self._employees_started = load.key, load.started
+            del self._employees_loads[load.key]
+        load.set_result((employees, skipped))
+        return employees, skipped
+
+    def _load_employees(self, field_list, disabledUsers, reloadEmployees, budget):
+        """
+        Fetches the employees for get_all_employees, resuming from self.employees_skipped
+        unless reloadEmployees is set.
 
-            # filter enabled/active employees
-            if not disabledUsers:
-                users = {k:v for k,v in users.items() if v}
+        @return: Tuple of (dictionary of employees, list of the ids skipped for lack of time).
+        """
+        with self.deadline(budget) as deadline:
+            if reloadEmployees or not self.employees_skipped:
+                employees = {}
+                users = self.get_employee_ids(disabledUsers=disabledUsers)
+            else:
+                employees = dict(self.employees)
+                users = self.employees_skipped
+            skipped = []
+
+            missing = [u for u in users if u not in employees]
+            remaining = self.remaining_calls()
+            if remaining is not None and len(missing) > remaining:
+                # Not enough calls left for one per employee: one custom report instead.
+                try:
+                    report = self.request_custom_report(['id'] + list(field_list) if field_list else None,
+                                                        report_format='json', cached=False)
+                except requests.exceptions.Timeout:
+                    if deadline is None or not deadline.expired():
+                        raise
+                    return employees, missing
+                rows = dict((str(row.get('id')), row) for row in report.get('employees', []))
+                for uKey in missing:
+                    if uKey in rows:
+                        employees[uKey] = self._wrap_employee(rows[uKey])
+                return employees, skipped
 
             # get employees data according to field_list
-            for i,uKey in enumerate(users.keys()):
-                if uKey not in self.employees.keys():
-                    self.employees[uKey] = self.get_employee(uKey, field_list=field_list)
+            for i,uKey in enumerate(users):
+                if uKey not in employees:
+                    try:
+                        employees[uKey] = self.get_employee(uKey, field_list=field_list)
+                    except requests.exceptions.Timeout:
+                        if deadline is None or not deadline.expired():
+                            raise
+                        skipped = [u for u in users[i:] if u not in employees]
+                        break
+
+        return employees, skipped
+
+    def index_employees(self, hash_fields=None, date_fields=None):
+        """
+        Returns an EmployeeIndex over the cached employees (self.employees) which is kept
+        in sync when get_all_employees reloads them and when update_employee changes one.
+
+        @param hash_fields: List (optional) of fields to index for equality filters.
+        @param date_fields: List (optional) of date fields to index for range filters.
+        @return: EmployeeIndex
+        """
+        kwargs = {}
+        if hash_fields is not None:
+            kwargs['hash_fields'] = hash_fields
+        if date_fields is not None:
+            kwargs['date_fields'] = date_fields
+        with self._employees_lock:
+            index = EmployeeIndex(self.employees, **kwargs)
+            self.employee_indexes.append(index)
+        return index
+
+    def employee_collection(self, field_list=None, disabledUsers=False, report_threshold=10, max_workers=4):
+        """
+        Returns the employees (the ones get_all_employees would return) in an EmployeeCollection,
+        which loads fields in batches when they are first read.
+
+        @param field_list: List of fields to load up front (in one batch). Other fields are loaded when read.
+        @param disabledUsers: Boolean flag that indicates if disabled users are included.
+        @param report_threshold: Integer number of employees missing a field from which one custom report is used to load it.
+        @param max_workers: Integer number of concurrent get_employee calls otherwise.
+        @return: EmployeeCollection
+        """
+        employees = dict((i, {'id': i}) for i in self.get_employee_ids(disabledUsers=disabledUsers))
+        collection = EmployeeCollection(self, employees, report_threshold=report_threshold, max_workers=max_workers)
+        if field_list:
+            collection.load(*field_list)
+        return collection
+
+    def table_mirror(self, tables, state_path=None):
+        """
+        Returns a TableMirror of employee tables, which downloads each table once and then
+        keeps it current with get_employee_changed_table. Call sync() on it to update it.
 
-        return self.employees
+        @param tables: List of table names, e.g. ['jobInfo', 'compensation'].
+        @param state_path: String (optional) path of the JSON file the mirror is saved in.
+        @return: TableMirror
+        """
+        return TableMirror(self, tables, state_path=state_path)
+
+    def record_decoder(self, meta_fields=False):
+        """
+        Returns a RecordDecoder which converts employee records to Python types (dates,
+        integers, booleans, amounts) according to employee_fields.
+
+        @param meta_fields: Boolean. True to also load the types of the company's custom fields with get_meta_fields.
+        @return: RecordDecoder
+        """
+        return RecordDecoder.from_client(self, meta_fields=meta_fields)
 
     def get_employee_photo(self, employee_id, photo_size='small'):
         """
@@ -382,13 +726,24 @@ class PyBambooHR(object):
         @return A tuple whose first element is the photo data and second element
         is the content type header.
         """
+        r = self._get_employee_photo_response(employee_id, photo_size)
+
+        return r.content, r.headers.get('content-type', '')
+
+    def _get_employee_photo_response(self, employee_id, photo_size='small', extra_headers=None):
+        """
+        Fetches an employee photo and returns the response itself so callers can look at
+        validators (ETag, Last-Modified) or a 304 answer to a conditional request.
+
+        @param extra_headers: Dictionary of headers to send on top of the global ones, e.g. If-None-Match.
+        """
         url = self.base_url + "employees/{0}/photo".format(employee_id)
         if photo_size:
             url = url + "/{}".format(photo_size)
-        r = requests.get(url, timeout=self.timeout, headers=self.headers, auth=(self.api_key, ''))
-        r.raise_for_status()
+        headers = dict(self.headers, **extra_headers) if extra_headers else self.headers
+        r = self._request('GET', url, headers=headers)
 
-        return r.content, r.headers.get('content-type', '')
+        return r
 
     def get_employee_files(self, employee_id):
         """
@@ -399,9 +754,8 @@ class PyBambooHR(object):
         """
 
         url = self.base_url + "employees/{0}/files/view/".format(employee_id)
-        r = requests.get(url, timeout=self.timeout, headers=self.headers, auth=(self.api_key, ''))
-        r.raise_for_status()
-        data = utils.transform_table_data(r.content)
+        r = self._request('GET', url)
+        data = self._parse(utils.transform_table_data, r.content)
 
         return data['employee']
 
@@ -425,10 +779,157 @@ class PyBambooHR(object):
                       "share": (None, "yes" if share else "no")}
 
             url = self.base_url + "employees/{0}/files/".format(employee_id)
-            r = requests.post(url, timeout=self.timeout, headers=self.headers, auth=(self.api_key, ''), files=params)
-            r.raise_for_status()
+            r = self._request('POST', url, files=params)
         return True
 
+    def iter_employee_file(self, employee_id, file_id, chunk_size=64 * 1024):
+        """
+        API method to stream the content of an employee file without holding it in memory.
+
+        @param employee_id: String of the employee id.
+        @param file_id: String of the file id (as listed by get_employee_files).
+        @param chunk_size: Integer number of bytes per yielded chunk.
+        @return A generator of byte strings.
+        """
+        url = self.base_url + "employees/{0}/files/{1}".format(employee_id, file_id)
+        r = self._request('GET', url, stream=True)
+        try:
+            for block in r.iter_content(chunk_size):
+                if block:
+                    yield block
+        finally:
+            r.close()
+
+    def download_employee_file(self, employee_id, file_id, output_filename, chunk_size=64 * 1024):
+        """
+        API method to download an employee file straight to disk.
+        The file is written next to output_filename first and only renamed once complete.
+
+        @param employee_id: String of the employee id.
+        @param file_id: String of the file id (as listed by get_employee_files).
+        @param output_filename: String of the path to save the file to.
+        @return A dictionary with the path, size in bytes and sha256 checksum of the file.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        part_filename = output_filename + '.part'
+        try:
+            with open(part_filename, 'wb') as handle:
+                for block in self.iter_employee_file(employee_id, file_id, chunk_size):
+                    digest.update(block)
+                    size += len(block)
+                    handle.write(block)
+        except BaseException:
+            if os.path.exists(part_filename):
+                os.remove(part_filename)
+            raise
+        utils.replace_file(part_filename, output_filename)
+
+        return {'file_id': str(file_id), 'path': output_filename, 'bytes': size, 'sha256': digest.hexdigest()}
+
+    def upload_employee_files(self, employee_id, file_paths, category_id, share, max_workers=4, progress_file=None, budget=None):
+        """
+        Uploads several files for an employee concurrently.
+        Files recorded as done in progress_file (with the same contents) are skipped, so an interrupted
+        run can be resumed.
+
+        @param employee_id: String of the employee id.
+        @param file_paths: List of paths of the files to upload.
+        @param category_id: The category id to upload the files to
+        @param share: Boolean indicating if the files are shared with employee
+        @param max_workers: Integer number of concurrent uploads.
+        @param progress_file: String (optional) path of a file to record finished uploads in.
+        @param budget: Number of seconds (optional) the whole call may take. Files not started in time are
+        left out of the result and listed (by path) in its skipped list.
+        @return A list of dictionaries, one per file, with file_path, ok, bytes, sha256 and error keys.
+        A PartialList with a budget, or when an outer deadline (see deadline) ran out.
+        """
+        progress = files.TransferProgress(progress_file)
+
+        def upload(file_path):
+            result = {'file_path': file_path, 'ok': False, 'bytes': None, 'sha256': None, 'error': None}
+            try:
+                result['sha256'] = files.file_checksum(file_path)
+            except Exception as e:
+                result['error'] = e
+                return result
+            # A file changed since it was uploaded is uploaded again.
+            key = '{0}:{1}:{2}'.format(employee_id, file_path, result['sha256'])
+            done = progress.get(key)
+            if done:
+                return dict(done, skipped=True)
+            try:
+                result['bytes'] = os.path.getsize(file_path)
+                self.upload_employee_file(employee_id, file_path, category_id, share)
+            except DeadlineExceeded:
+                return None
+            except Exception as e:
+                result['error'] = e
+                return result
+            result['ok'] = True
+            progress.complete(key, result)
+            return result
+
+        with self.deadline(budget) as deadline:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(self._bind_deadline(deadline, upload), file_paths))
+
+        skipped = [p for p, r in zip(file_paths, results) if r is None]
+        if budget is not None or skipped:
+            return PartialList([r for r in results if r is not None], skipped)
+        return results
+
+    def download_employee_files(self, employee_id, output_dir, file_ids=None, max_workers=4, progress_file=None, budget=None):
+        """
+        Downloads the files of an employee concurrently into output_dir.
+        Files recorded as done in progress_file (and still present on disk) are skipped.
+
+        @param employee_id: String of the employee id.
+        @param output_dir: String of the directory to save the files in.
+        @param file_ids: List (optional) of file ids to download. Defaults to every file listed by get_employee_files.
+        @param max_workers: Integer number of concurrent downloads.
+        @param progress_file: String (optional) path of a file to record finished downloads in.
+        @param budget: Number of seconds (optional) the whole call may take. Files not started in time are
+        left out of the result and listed (by file id) in its skipped list.
+        @return A list of dictionaries, one per file, with file_id, path, ok, bytes, sha256 and error keys.
+        A PartialList with a budget, or when an outer deadline (see deadline) ran out.
+        """
+        with self.deadline(budget) as deadline:
+            listed = files.list_files(self.get_employee_files(employee_id))
+        if file_ids is not None:
+            wanted = set(str(file_id) for file_id in file_ids)
+            listed = [f for f in listed if str(f.get('id')) in wanted]
+
+        progress = files.TransferProgress(progress_file)
+
+        def download(f):
+            name = basename(f.get('originalFileName') or f.get('name') or 'file')
+            path = os.path.join(output_dir, '{0}-{1}'.format(f['id'], name))
+            key = '{0}:{1}'.format(employee_id, f['id'])
+            done = progress.get(key)
+            if done and os.path.exists(done['path']):
+                return dict(done, skipped=True)
+            result = {'file_id': str(f['id']), 'path': path, 'ok': False, 'bytes': None, 'sha256': None, 'error': None}
+            try:
+                result.update(self.download_employee_file(employee_id, f['id'], path))
+            except DeadlineExceeded:
+                return None
+            except Exception as e:
+                result['error'] = e
+                return result
+            result['ok'] = True
+            progress.complete(key, result)
+            return result
+
+        with self.deadline(deadline):
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(self._bind_deadline(deadline, download), listed))
+
+        skipped = [str(f['id']) for f, r in zip(listed, results) if r is None]
+        if budget is not None or skipped:
+            return PartialList([r for r in results if r is not None], skipped)
+        return results
+
     def add_row(self, table_name, employee_id, row):
         """
         API method for adding a row to a table
@@ -442,8 +943,7 @@ class PyBambooHR(object):
         xml = self._format_row_xml(row)
         url = self.base_url + \
             "employees/{0}/tables/{1}/".format(employee_id, table_name)
-        r = requests.post(url, timeout=self.timeout, data=xml, headers=self.headers, auth=(self.api_key, ''))
-        r.raise_for_status()
+        r = self._request('POST', url, data=xml)
 
         return True
 
@@ -461,8 +961,7 @@ class PyBambooHR(object):
         xml = self._format_row_xml(row)
         url = self.base_url + \
             "employees/{0}/tables/{1}/{2}/".format(employee_id, table_name, row_id)
-        r = requests.post(url, timeout=self.timeout, data=xml, headers=self.headers, auth=(self.api_key, ''))
-        r.raise_for_status()
+        r = self._request('POST', url, data=xml)
 
         return True
 
@@ -485,8 +984,11 @@ class PyBambooHR(object):
 
         filter_duplicates = 'yes' if filter_duplicates else 'no'
         url = self.base_url + "reports/{0}?format={1}&fd={2}&onlyCurrent={3}".format(report_id, report_format, filter_duplicates, self.only_current)
-        r = requests.get(url, timeout=self.timeout, headers=self.headers, auth=(self.api_key, ''))
-        r.raise_for_status()
+        if report_format == 'json' and not output_filename and self.cache is not None:
+            key = 'company:{0}:{1}:{2}'.format(report_id, filter_duplicates, self.only_current)
+            return self._cached('reports', key, lambda: self._request('GET', url).json(), self.cache_ttl)
+
+        r = self._request('GET', url)
 
         if report_format == 'json':
             # return list/dict for json type
@@ -509,7 +1011,7 @@ class PyBambooHR(object):
 
     def request_custom_report(
             self, field_list, report_format='xls', title="My Custom Report",
-            output_filename=None, last_changed=None):
+            output_filename=None, last_changed=None, cached=True):
         """
         API method for returning a custom report by field list.
         http://www.bamboohr.com/api/documentation/employees.php#requestCustomReport
@@ -520,6 +1022,7 @@ class PyBambooHR(object):
         @param fields: List of report fields
         @param report_format: String of the format to receive the report. (csv, pdf, xls, xml)
         @param output_filename: String (optional) if a filename/location is passed, the results will be saved to disk
+        @param cached: Boolean. False to bypass the cache backend (json reports are cached when there is one).
         @return: A result in the format specified. (Will vary depending on format requested.)
         """
         if report_format not in self.report_formats:
@@ -541,8 +1044,11 @@ class PyBambooHR(object):
             get_fields, title=title, report_format=report_format,
             last_changed=last_changed)
         url = self.base_url + "reports/custom/?format={0}".format(report_format)
-        r = requests.post(url, timeout=self.timeout, data=xml, headers=self.headers, auth=(self.api_key, ''))
-        r.raise_for_status()
+        if report_format == 'json' and cached and not output_filename and not last_changed and self.cache is not None:
+            key = 'custom:{0}:{1}'.format(reports.field_set_key(get_fields), title)
+            return self._cached('reports', key, lambda: self._request('POST', url, data=xml).json(), self.cache_ttl)
+
+        r = self._request('POST', url, data=xml)
 
         if report_format == 'json':
             # return list/dict for json type
@@ -563,6 +1069,61 @@ class PyBambooHR(object):
 
         return result
 
+    def request_chunked_custom_report(self, field_list, chunk_width=20, max_workers=4, title="My Custom Report", budget=None):
+        """
+        API method for a wide custom report, run as several narrower custom reports in parallel.
+        The field list is split into chunks of chunk_width fields (each chunk also asks for 'id'),
+        the chunks are requested concurrently and their rows are joined by employee id.
+
+        @param field_list: List of report fields
+        @param chunk_width: Integer maximum number of fields per report. Tune it to find the fastest split.
+        @param max_workers: Integer number of reports requested at once.
+        @param title: String title of the reports.
+        @param budget: Number of seconds (optional) the whole call may take. The fields of chunks which did
+        not finish in time are missing from the records and listed in the result's skipped list.
+        @return: Dictionary shaped like a json custom report, with one record per employee (a PartialDict with a budget).
+        """
+        field_list = [utils.underscore_to_camelcase(field) for field in field_list] if field_list else list(self.employee_fields)
+        chunks = reports.split_fields(field_list, chunk_width)
+
+        def run(chunk):
+            try:
+                return self.request_custom_report(chunk, report_format='json', title=title)
+            except requests.exceptions.Timeout:
+                if deadline is None or not deadline.expired():
+                    raise
+                return None
+
+        with self.deadline(budget) as deadline:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(self._bind_deadline(deadline, run), chunks))
+
+        report = reports.merge_reports([r for r in results if r is not None], title=title)
+        if budget is not None:
+            return PartialDict(report, [f for chunk, r in zip(chunks, results) if r is None for f in chunk if f != 'id'])
+        return report
+
+    def get_cached_custom_report(self, field_list, reconcile_interval=24 * 60 * 60, full=False):
+        """
+        Returns the rows of a custom report from a local cache kept for its set of fields.
+        The first call downloads the whole report, later calls only fetch the rows changed since
+        the previous call (using the lastChanged filter), and a full download every
+        reconcile_interval seconds drops deleted employees.
+
+        @param field_list: List of report fields
+        @param reconcile_interval: Number of seconds between full downloads.
+        @param full: Boolean. True to force a full download now.
+        @return: Dictionary of employee id to record.
+        """
+        field_list = [utils.underscore_to_camelcase(field) for field in field_list]
+        key = reports.field_set_key(['id'] + field_list)
+        with self._state_lock:
+            report = self.cached_reports.get(key)
+            if report is None:
+                report = self.cached_reports[key] = reports.IncrementalReport(self, field_list, reconcile_interval)
+        report.reconcile_interval = reconcile_interval
+        return report.refresh(full=full)
+
     def get_tabular_data(self, table_name, employee_id='all'):
         """
         API method to retrieve tabular data for an employee, or all employees if employee_id argument is 'all' (the default).
@@ -572,10 +1133,9 @@ class PyBambooHR(object):
         the values of the table's fields for a particular date, which is stored by key 'date' in the dictionary.
         """
         url = self.base_url + 'employees/{}/tables/{}'.format(employee_id, table_name)
-        r = requests.get(url, timeout=self.timeout, headers=self.headers, auth=(self.api_key, ''))
-        r.raise_for_status()
+        r = self._request('GET', url)
 
-        return utils.transform_tabular_data(r.content)
+        return self._parse(utils.transform_tabular_data, r.content)
 
     def get_employee_changed_table(self, table_name='jobInfo', since=None):
         """
@@ -607,8 +1167,7 @@ class PyBambooHR(object):
         if _type:
             params.update({'type': _type})
 
-        r = requests.get(url, timeout=self.timeout, params=params, headers=self.headers, auth=(self.api_key, ''))
-        r.raise_for_status()
+        r = self._request('GET', url, params=params)
 
         return r.json()
 
@@ -622,8 +1181,7 @@ class PyBambooHR(object):
             params['start'] = start_date
         if end_date:
             params['end'] = end_date
-        r = requests.get(url, timeout=self.timeout, params=params, headers=self.headers, auth=(self.api_key, ''))
-        r.raise_for_status()
+        r = self._request('GET', url, params=params)
         return r.json()
         # return utils.transform_whos_out(r.content)
 
@@ -657,10 +1215,7 @@ class PyBambooHR(object):
         @return: list containing fields information
         """
         url = self.base_url + "meta/fields/"
-        r = requests.get(url, timeout=self.timeout, headers=self.headers, auth=(self.api_key, ''))
-        r.raise_for_status()
-
-        return r.json()
+        return self._cached('meta', 'fields', lambda: self._request('GET', url).json(), self.meta_cache_ttl)
 
     def get_meta_tables(self):
         """
@@ -673,10 +1228,12 @@ class PyBambooHR(object):
         """
 
         url = self.base_url + "meta/tables/"
-        r = requests.get(url, timeout=self.timeout, auth=(self.api_key, ''))
-        r.raise_for_status()
-        data = utils.transform_table_data(r.content)
-        self.meta_tables = data['tables']['table']
+
+        def fetch():
+            r = self._request('GET', url, headers={})
+            return self._parse(utils.transform_table_data, r.content)['tables']['table']
+
+        self.meta_tables = self._cached('meta', 'tables', fetch, self.meta_cache_ttl)
 
         return self.meta_tables
 
@@ -691,10 +1248,7 @@ class PyBambooHR(object):
         """
 
         url = self.base_url + "meta/lists/"
-        r = requests.get(url, timeout=self.timeout, headers=self.headers, auth=(self.api_key, ''))
-        r.raise_for_status()
-
-        return r.json()
+        return self._cached('meta', 'lists', lambda: self._request('GET', url).json(), self.meta_cache_ttl)
 
     def get_meta_users(self):
         """
@@ -707,15 +1261,158 @@ class PyBambooHR(object):
         """
 
         url = self.base_url + "meta/users/"
-        r = requests.get(url, timeout=self.timeout, headers=self.headers, auth=(self.api_key, ''))
+        return self._cached('meta', 'users', lambda: self._request('GET', url).json(), self.meta_cache_ttl)
+
+    def _cached(self, kind, key, fetch, ttl, force=False):
+        """
+        Returns fetch() through the cache backend (if there is one), keyed per subdomain
+        and API key, since keys with different permissions see different fields.
+        """
+        if self.cache is None:
+            return fetch()
+        owner = hashlib.sha256(self.api_key.encode('utf-8')).hexdigest()[:16]
+        return self.cache.get_or_refresh('{0}:{1}:{2}'.format(self.subdomain, owner, kind), key, fetch, ttl=ttl, force=force)
+
+    @contextlib.contextmanager
+    def deadline(self, budget):
+        """
+        Bounds the total time of every call made on this thread inside the with block:
+
+            with bamboo.deadline(30):
+                employees = bamboo.get_all_employees()
+
+        Each request gets the time left as its timeout (or the usual timeout if that is
+        shorter), and requests due after the deadline raise DeadlineExceeded without being
+        sent. Nested deadlines keep the earliest.
+
+        @param budget: Number of seconds, a Deadline, or None for no (new) deadline.
+        @return: The Deadline in effect (None if there is none).
+        """
+        outer = getattr(self._local, 'deadline', None)
+        if budget is None:
+            yield outer
+            return
+        deadline = budget if isinstance(budget, Deadline) else Deadline(budget)
+        self._local.deadline = deadline.earliest(outer)
+        try:
+            yield self._local.deadline
+        finally:
+            self._local.deadline = outer
+
+    def _bind_deadline(self, deadline, func):
+        """
+        Wraps func so that it runs under deadline (None for the calling thread's) and the
+        call scopes of the calling thread, for calls made from worker threads.
+        """
+        if deadline is None:
+            deadline = getattr(self._local, 'deadline', None)
+        scopes = list(getattr(self._local, 'scopes', []))
+
+        def run(*args, **kwargs):
+            outer = getattr(self._local, 'scopes', [])
+            self._local.scopes = scopes
+            try:
+                with self.deadline(deadline):
+                    return func(*args, **kwargs)
+            finally:
+                self._local.scopes = outer
+        return run
+
+    @contextlib.contextmanager
+    def call_scope(self, name=None, budget=None):
+        """
+        Counts the calls made on this thread inside the with block (and by the worker
+        threads of the operations run in it), e.g. per job:
+
+            with bamboo.call_scope('nightly-sync', budget=500) as calls:
+                bamboo.get_all_employees()
+            log.info(calls.to_dict())
+
+        With a budget, calls beyond it raise CallBudgetExceeded without being sent, and
+        operations which can get the same data with fewer calls (get_all_employees,
+        EmployeeCollection) switch to a single custom report when the budget left is too
+        small for one call per employee. Scopes nest; every enclosing scope counts the calls.
+
+        @param name: String (optional) naming the job.
+        @param budget: Integer (optional) maximum number of calls.
+        @return: The CallStats of the scope.
+        """
+        stats = CallStats(name=name, limit=budget)
+        outer = getattr(self._local, 'scopes', [])
+        self._local.scopes = outer + [stats]
+        try:
+            yield stats
+        finally:
+            self._local.scopes = outer
+
+    def remaining_calls(self):
+        """
+        Returns the number of calls left before a call budget (call_budget or that of a
+        call_scope of this thread) is used up, or None when there is no budget.
+        """
+        left = [s.remaining() for s in [self.call_stats] + getattr(self._local, 'scopes', [])]
+        left = [l for l in left if l is not None]
+        return min(left) if left else None
+
+    def _request(self, method, url, **kwargs):
+        """
+        Sends a request through this instance's session and raises on error statuses.
+        Every API method goes through here, so the session (and its connection pool) can be
+        shared between instances or wrapped.
+
+        @param method: String of the HTTP method.
+        @param url: String of the full url.
+        @return: The requests response.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        deadline = getattr(self._local, 'deadline', None)
+        if deadline is not None:
+            kwargs['timeout'] = deadline.timeout(kwargs['timeout'])
+        kwargs.setdefault('headers', self.headers)
+        kwargs.setdefault('auth', (self.api_key, ''))
+        meter = CallMeter([self.call_stats] + getattr(self._local, 'scopes', []), method, url, body_size(kwargs.get('data')))
+        if getattr(self.session, 'meters_calls', False):
+            # The session counts every request it sends (e.g. hedged duplicates).
+            r = self.session.request(method, url, call_meter=meter, **kwargs)
+        else:
+            meter.send()
+            r = self.session.request(method, url, **kwargs)
+            meter.received(r, kwargs.get('stream'))
         r.raise_for_status()
+        return r
 
-        return r.json()
+    def _wrap_employee(self, employee):
+        """
+        Applies underscore_keys, typed_records and lazy_records to an employee record from the API.
+        """
+        decoder = None
+        if self.typed_records:
+            with self._state_lock:
+                if self._decoder is None:
+                    self._decoder = self.record_decoder()
+                decoder = self._decoder
+
+        if self.lazy_records:
+            return LazyRecord(employee, underscore_keys=self.underscore_keys, decoder=decoder)
+
+        if decoder is not None:
+            employee = decoder.decode(employee)
+        if self.underscore_keys:
+            employee = utils.underscore_keys(employee)
+        return employee
+
+    def _parse(self, func, content):
+        """
+        Runs one of the utils.transform_* parsers on a response body, through the
+        parse executor when there is one.
+        """
+        if self.parse_executor is None:
+            return func(content)
+        return self.parse_executor.parse(func, content)
 
     def _query(self, url, params, raw=False):
         url = self.base_url + url
-        r = requests.get(url, timeout=self.timeout, params=params, headers=self.headers, auth=(self.api_key, ''))
-        r.raise_for_status()
+        r = self._request('GET', url, params=params)
         if raw:
             return r
         else:
@@ -1 +1,19 @@
-from PyBambooHR import PyBambooHR
+from .PyBambooHR import PyBambooHR
+from .buffer import WriteBehindBuffer
+from .cache import CacheBackend, MemoryCache, SQLiteCache
+from .cassette import Cassette
+from .changes import ChangeFeedPoller
+from .collection import EmployeeCollection
+from .deadline import Deadline, DeadlineExceeded, PartialDict, PartialList
+from .decode import RecordDecoder
+from .org import OrgChart
+from .parsing import ParseExecutor
+from .photos import PhotoCache
+from .pool import BambooClientPool
+from .query import EmployeeIndex
+from .quota import CallBudgetExceeded, CallStats
+from .records import LazyRecord
+from .resilience import CircuitOpenError, ResilientSession
+from .snapshot import Snapshot, SnapshotRecord
+from .tables import TableMirror
+from .time_off import WhosOutIndex, TimeOffRequestCache
@@ -0,0 +1,172 @@
+"""
+A write-behind buffer which coalesces employee updates and table rows before they
+are sent to BambooHR.
+"""
+
+import threading
+import zlib
+
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from . import utils
+
+
+class WriteBehindBuffer(object):
+    """
+    Collects update_employee and add_row calls and sends them later, merged.
+
+    Pending updates for the same employee are merged into a single update (later values
+    win), and rows added to the same table for the same employee and effective 'date'
+    are merged into a single row. Rows without a 'date' field are never merged.
+
+    Writes are sent when max_pending calls are waiting, every flush_interval seconds,
+    or when flush() is called, through max_workers threads. All writes for one employee
+    go through the same thread, in the order they were flushed, so a later flush can
+    never overtake an earlier one and leave an older value in BambooHR. Within a flush,
+    an employee's merged writes are sent in the order of their first call: an update
+    merged into an earlier one goes out before rows added in between. Every call returns
+    a concurrent.futures.Future which gets the result, or the exception, of the merged
+    write it ended up in.
+
+    Use it as a context manager (or call close()) to make sure nothing is left unsent.
+    """
+
+    def __init__(self, client, max_pending=100, flush_interval=5.0, max_workers=4):
+        """
+        @param client: PyBambooHR instance to write through.
+        @param max_pending: Integer number of buffered calls which triggers a flush.
+        @param flush_interval: Number of seconds between automatic flushes (None to only flush on size or explicitly).
+        @param max_workers: Integer number of concurrent writes (for different employees) during a flush.
+        """
+        self.client = client
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        # Merged writes in the order of their first call: key to (fields, futures), where the
+        # key is ('update', employee id) or ('row', table, employee id, date).
+        self._writes = OrderedDict()
+        self._pending = 0
+        self._executors = [ThreadPoolExecutor(max_workers=1) for _ in range(max_workers)]
+        self._closed = threading.Event()
+        self._timer = None
+        if flush_interval:
+            self._timer = threading.Thread(target=self._flush_periodically, name='WriteBehindBuffer')
+            self._timer.daemon = True
+            self._timer.start()
+
+    def update_employee(self, id, employee):
+        """
+        Buffers an update_employee call.
+
+        @param id: String of containing the employee id you want to update.
+        @param employee: Dictionary containing employee information.
+        @return: Future of the result of the merged update.
+        """
+        future = Future()
+        with self._lock:
+            self._check_open()
+            fields, futures = self._writes.setdefault(('update', str(id)), ({}, []))
+            fields.update(utils.camelcase_keys(employee))
+            futures.append(future)
+            full = self._added()
+        if full:
+            self._dispatch()
+        return future
+
+    def add_row(self, table_name, employee_id, row):
+        """
+        Buffers an add_row call.
+
+        @param table_name: string of table's name
+        @param employee_id: string of employee id
+        @param row: dictionary containing row information
+        @return: Future of the result of the merged add_row.
+        """
+        future = Future()
+        row = utils.camelcase_keys(row)
+        with self._lock:
+            self._check_open()
+            date = row.get('date')
+            key = ('row', table_name, str(employee_id), date if date is not None else object())
+            fields, futures = self._writes.setdefault(key, ({}, []))
+            fields.update(row)
+            futures.append(future)
+            full = self._added()
+        if full:
+            self._dispatch()
+        return future
+
+    def flush(self):
+        """
+        Sends everything buffered so far and waits until it is written.
+        Failures are reported through the futures returned to the callers.
+        """
+        for future in self._dispatch():
+            future.exception()
+
+    def close(self):
+        """
+        Flushes and stops the buffer. Later calls raise UserWarning.
+        """
+        self._closed.set()
+        # Let a periodic flush in progress finish submitting before the executors go away.
+        if self._timer is not None and self._timer is not threading.current_thread():
+            self._timer.join()
+        self.flush()
+        for executor in self._executors:
+            executor.shutdown(wait=True)
+
+    def __len__(self):
+        return self._pending
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _check_open(self):
+        if self._closed.is_set():
+            raise UserWarning("This write-behind buffer has been closed")
+
+    def _added(self):
+        self._pending += 1
+        return self._pending >= self.max_pending
+
+    def _dispatch(self):
+        with self._lock:
+            pending, self._writes = self._writes, OrderedDict()
+            self._pending = 0
+
+        writes = []
+        for key, (fields, futures) in pending.items():
+            if key[0] == 'update':
+                employee_id = key[1]
+                write = self._executor(employee_id).submit(self.client.update_employee, employee_id, fields)
+            else:
+                table_name, employee_id = key[1], key[2]
+                write = self._executor(employee_id).submit(self.client.add_row, table_name, employee_id, fields)
+            writes.append((write, futures))
+
+        for write, futures in writes:
+            write.add_done_callback(lambda done, futures=futures: self._resolve(done, futures))
+        return [write for write, _ in writes]
+
+    def _executor(self, employee_id):
+        # Each employee always maps to the same single-thread executor.
+        return self._executors[zlib.crc32(employee_id.encode('utf-8')) % len(self._executors)]
+
+    @staticmethod
+    def _resolve(done, futures):
+        error = done.exception()
+        for future in futures:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(done.result())
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            self._dispatch()
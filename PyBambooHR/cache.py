@@ -0,0 +1,263 @@
+"""
+Cache backends for employee records, metadata and report results, so several
+PyBambooHR instances (threads, or worker processes on one host) can share one warm cache.
+"""
+
+import contextlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class CacheBackend(object):
+    """
+    The interface of a cache backend. Entries live in namespaces, are stored with the
+    time they were written and may expire after ttl seconds.
+
+    Subclasses implement get_entry, set, delete, clear and lock; get_or_refresh builds
+    the coordinated refresh on top of them: when an entry is missing (or a refresh is
+    forced), the first caller takes the entry's lock and fetches it while the others
+    wait for the lock and then read what it stored, so only one of them calls the API.
+    """
+
+    def get_entry(self, namespace, key):
+        """
+        Returns a tuple of (value, time stored) or None if there is no unexpired entry.
+        """
+        raise NotImplementedError
+
+    def set(self, namespace, key, value, ttl=None):
+        """
+        Stores a value, for ttl seconds (None to keep it until it is replaced or deleted).
+        """
+        raise NotImplementedError
+
+    def delete(self, namespace, key):
+        raise NotImplementedError
+
+    def clear(self, namespace=None):
+        """
+        Drops every entry, or only those of a namespace.
+        """
+        raise NotImplementedError
+
+    def lock(self, name, timeout=60):
+        """
+        Returns a context manager holding the named lock, or giving up after timeout
+        seconds. It yields True if the lock was acquired.
+        """
+        raise NotImplementedError
+
+    def get(self, namespace, key, default=None):
+        entry = self.get_entry(namespace, key)
+        return default if entry is None else entry[0]
+
+    def get_or_refresh(self, namespace, key, fetch, ttl=None, force=False, wait=60):
+        """
+        Returns the cached value, calling fetch() to (re)fill the entry when it is missing
+        or force is True. Concurrent callers of the same entry share one fetch.
+
+        @param namespace: String of the namespace.
+        @param key: String of the key.
+        @param fetch: Callable returning the value.
+        @param ttl: Number of seconds (optional) the value is kept.
+        @param force: Boolean. True to refresh even if there is an entry. A refresh another caller finished meanwhile counts.
+        @param wait: Number of seconds between checks for the entry while another caller holds the lock.
+        """
+        if not force:
+            entry = self.get_entry(namespace, key)
+            if entry is not None:
+                return entry[0]
+
+        requested = time.time()
+        while True:
+            with self.lock('{0}\x00{1}'.format(namespace, key), timeout=wait) as acquired:
+                entry = self.get_entry(namespace, key)
+                if entry is not None and (not force or entry[1] >= requested):
+                    return entry[0]
+                if acquired:
+                    value = fetch()
+                    self.set(namespace, key, value, ttl)
+                    return value
+            # Another caller is still fetching (a long load can take many minutes): keep waiting
+            # for its entry rather than fetching too. A lock whose holder died is taken over
+            # once its lease runs out.
+
+
+class MemoryCache(CacheBackend):
+    """
+    A cache backend in the memory of the process, shared by the threads (and the
+    PyBambooHR instances) using it.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get_entry(self, namespace, key):
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None:
+                return None
+            value, stored, expires = entry
+            if expires is not None and expires <= time.time():
+                del self._entries[(namespace, key)]
+                return None
+            return value, stored
+
+    def set(self, namespace, key, value, ttl=None):
+        now = time.time()
+        with self._lock:
+            self._entries[(namespace, key)] = (value, now, now + ttl if ttl else None)
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._entries.pop((namespace, key), None)
+
+    def clear(self, namespace=None):
+        with self._lock:
+            if namespace is None:
+                self._entries = {}
+            else:
+                self._entries = dict((k, v) for k, v in self._entries.items() if k[0] != namespace)
+
+    @contextlib.contextmanager
+    def lock(self, name, timeout=60):
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        acquired = _acquire(lock, timeout)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+
+
+def _acquire(lock, timeout):
+    try:
+        return lock.acquire(True, timeout)
+    except TypeError:  # Python 2 locks have no timeout
+        deadline = time.time() + timeout
+        while not lock.acquire(False):
+            if time.time() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+
+class SQLiteCache(CacheBackend):
+    """
+    A cache backend in a SQLite database in WAL mode, shared by every process on the
+    host that opens the same file (e.g. the workers of a web server):
+
+        cache = SQLiteCache('/var/cache/myapp/bamboohr.sqlite')
+        bamboo = PyBambooHR(subdomain='yoursub', api_key='yourapikeyhere', cache=cache)
+
+    WAL lets readers go on while one process writes. Locks are rows of a locks table
+    with a lease of lock_lease seconds, which the holder keeps renewing for as long as its
+    refresh runs, so only the lock of a worker which died is taken over (once its lease
+    has run out).
+
+    Values are pickled, since the employee records cached may be typed or lazy records
+    rather than plain JSON data. Unpickling runs code chosen by whoever wrote the file, so
+    the file must only be writable by the processes sharing the cache: it is created
+    readable and writable by its owner only, and should not be put where other users can
+    replace it.
+
+    Every thread (and every process after a fork) gets its own connection.
+    """
+
+    def __init__(self, path, lock_lease=60, poll_interval=0.05):
+        """
+        @param path: String of the database file.
+        @param lock_lease: Number of seconds after which a lock whose holder stopped renewing it is considered abandoned.
+        @param poll_interval: Number of seconds between attempts to take a held lock.
+        """
+        self.path = path
+        self.lock_lease = lock_lease
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+
+        if not os.path.exists(path):
+            # SQLite gives the -wal and -shm files the permissions of the database.
+            os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o600))
+
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('CREATE TABLE IF NOT EXISTS entries (namespace TEXT, key TEXT, value BLOB, '
+                           'stored REAL, expires REAL, PRIMARY KEY (namespace, key))')
+        connection.execute('CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, owner TEXT, expires REAL)')
+
+    def get_entry(self, namespace, key):
+        row = self._connection().execute('SELECT value, stored, expires FROM entries WHERE namespace = ? AND key = ?',
+                                         (namespace, key)).fetchone()
+        if row is None or (row[2] is not None and row[2] <= time.time()):
+            return None
+        return pickle.loads(bytes(row[0])), row[1]
+
+    def set(self, namespace, key, value, ttl=None):
+        now = time.time()
+        self._connection().execute('INSERT OR REPLACE INTO entries (namespace, key, value, stored, expires) VALUES (?, ?, ?, ?, ?)',
+                                   (namespace, key, sqlite3.Binary(pickle.dumps(value, 2)), now, now + ttl if ttl else None))
+
+    def delete(self, namespace, key):
+        self._connection().execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, key))
+
+    def clear(self, namespace=None):
+        if namespace is None:
+            self._connection().execute('DELETE FROM entries')
+        else:
+            self._connection().execute('DELETE FROM entries WHERE namespace = ?', (namespace,))
+        self._connection().execute('DELETE FROM entries WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+
+    @contextlib.contextmanager
+    def lock(self, name, timeout=60):
+        connection = self._connection()
+        owner = uuid.uuid4().hex
+        deadline = time.time() + timeout
+        acquired = False
+        while True:
+            now = time.time()
+            connection.execute('DELETE FROM locks WHERE name = ? AND expires <= ?', (name, now))
+            cursor = connection.execute('INSERT OR IGNORE INTO locks (name, owner, expires) VALUES (?, ?, ?)',
+                                        (name, owner, now + self.lock_lease))
+            if cursor.rowcount == 1:
+                acquired = True
+                break
+            if now >= deadline:
+                break
+            time.sleep(self.poll_interval)
+
+        stop = threading.Event()
+        if acquired:
+            renewer = threading.Thread(target=self._renew, args=(name, owner, stop), name='SQLiteCache-lease')
+            renewer.daemon = True
+            renewer.start()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                stop.set()
+                renewer.join()
+                connection.execute('DELETE FROM locks WHERE name = ? AND owner = ?', (name, owner))
+
+    def _renew(self, name, owner, stop):
+        # Runs while a lock is held, so a refresh longer than the lease keeps it.
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            while not stop.wait(self.lock_lease / 3.0):
+                connection.execute('UPDATE locks SET expires = ? WHERE name = ? AND owner = ?',
+                                   (time.time() + self.lock_lease, name, owner))
+        finally:
+            connection.close()
+
+    def _connection(self):
+        if getattr(self._local, 'pid', None) != os.getpid():
+            # Autocommit: every statement is its own transaction, waiting up to 30s for writers.
+            self._local.connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.pid = os.getpid()
+        return self._local.connection
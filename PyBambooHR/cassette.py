@@ -0,0 +1,213 @@
+"""
+Record and replay of HTTP interactions at the transport boundary of PyBambooHR, for
+reproducible offline runs.
+"""
+
+import base64
+import collections
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+
+from requests.structures import CaseInsensitiveDict
+
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    # Python 2
+    from urllib import urlencode
+
+
+def _read_upload(value):
+    """
+    Returns the bytes of an uploaded file (a file object, bytes or a string), leaving a
+    file object where it was so the request still sends all of it.
+    """
+    if hasattr(value, 'read'):
+        position = value.tell()
+        content = value.read()
+        value.seek(position)
+        value = content
+    if value is None:
+        return b''
+    return value.encode('utf-8') if not isinstance(value, bytes) else value
+
+
+def request_key(method, url, params=None, data=None, files=None):
+    """
+    Returns the string used to match a request against the recorded ones: the method,
+    url, sorted query parameters and a digest of the body (or of the uploaded files).
+    """
+    if params:
+        items = params.items() if hasattr(params, 'items') else params
+        url = '{0}?{1}'.format(url, urlencode(sorted((str(k), str(v)) for k, v in items)))
+    body = ''
+    if data:
+        raw = data.encode('utf-8') if not isinstance(data, bytes) else data
+        body = hashlib.sha1(raw).hexdigest()
+    elif files:
+        digest = hashlib.sha1()
+        items = files.items() if hasattr(files, 'items') else files
+        for name, value in sorted(items, key=lambda item: item[0]):
+            # requests takes a file, or a (filename, file or content, ...) tuple
+            if isinstance(value, (tuple, list)):
+                filename, value = value[0], value[1]
+            else:
+                # as requests does, the file name without the (machine specific) directory
+                filename = os.path.basename(str(getattr(value, 'name', name)))
+            for part in (name, filename or '', _read_upload(value)):
+                part = part.encode('utf-8') if not isinstance(part, bytes) else part
+                digest.update(part + b'\0')
+        body = 'files:' + digest.hexdigest()
+    return '{0} {1} {2}'.format(method.upper(), url, body)
+
+
+class Cassette(object):
+    """
+    A requests.Session stand-in which records or replays HTTP interactions.
+
+    Pass it as the session of a PyBambooHR instance:
+
+        cassette = Cassette('/tmp/sync.cassette', mode='record')
+        bamboo = PyBambooHR(subdomain='yoursub', api_key='yourapikeyhere', session=cassette)
+        ...
+        cassette.save()
+
+    In 'record' mode every request goes through a real session and the interaction is
+    kept (call save() to write the gzipped JSON lines file). In 'replay' mode responses
+    are served from the file: requests are matched by a hash index, so each lookup is
+    O(1), and identical requests get their recorded responses in recorded order.
+
+    latency controls the delay of replayed responses: None for none, 'recorded' for the
+    time the original call took, a number of seconds, or a callable taking the recorded
+    interaction and returning seconds.
+    """
+
+    version = 1
+
+    def __init__(self, path, mode='replay', session=None, latency=None):
+        """
+        @param path: String of the cassette file.
+        @param mode: String of 'record' or 'replay'.
+        @param session: requests.Session (optional) used to make the real calls in record mode.
+        @param latency: None, 'recorded', a number of seconds or a callable, see above.
+        """
+        if mode not in ('record', 'replay'):
+            raise UserWarning("Cassette mode must be 'record' or 'replay'")
+
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.session = session or (requests.Session() if mode == 'record' else None)
+
+        self._lock = threading.Lock()
+        self._interactions = []
+        self._index = collections.defaultdict(collections.deque)
+        if mode == 'replay':
+            self.load()
+
+    def request(self, method, url, **kwargs):
+        """
+        Same signature as requests.Session.request.
+        """
+        key = request_key(method, url, kwargs.get('params'), kwargs.get('data'), kwargs.get('files'))
+        if self.mode == 'record':
+            return self._record(key, method, url, **kwargs)
+        return self._replay(key)
+
+    def load(self):
+        """
+        Reads the cassette file and builds the replay index.
+        """
+        with gzip.open(self.path, 'rb') as handle:
+            lines = handle.read().decode('utf-8').splitlines()
+        header = json.loads(lines[0])
+        if header.get('version') != self.version:
+            raise UserWarning("Unsupported cassette version {0}".format(header.get('version')))
+
+        self._interactions = [json.loads(line) for line in lines[1:] if line]
+        self._index = collections.defaultdict(collections.deque)
+        for interaction in self._interactions:
+            self._index[interaction['key']].append(interaction)
+
+    def save(self):
+        """
+        Writes the recorded interactions to the cassette file.
+        """
+        with self._lock:
+            lines = [json.dumps({'version': self.version})]
+            lines.extend(json.dumps(interaction, sort_keys=True) for interaction in self._interactions)
+        with gzip.open(self.path, 'wb') as handle:
+            handle.write('\n'.join(lines).encode('utf-8'))
+
+    def __len__(self):
+        return len(self._interactions)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.mode == 'record':
+            self.save()
+
+    def _record(self, key, method, url, **kwargs):
+        started = time.time()
+        r = self.session.request(method, url, **kwargs)
+        content = r.content
+        elapsed = time.time() - started
+
+        interaction = {
+            'key': key,
+            'method': method.upper(),
+            'url': r.url,
+            'status': r.status_code,
+            'reason': r.reason,
+            'headers': dict(r.headers),
+            'elapsed': elapsed,
+        }
+        try:
+            interaction['text'] = content.decode('utf-8')
+        except UnicodeDecodeError:
+            interaction['base64'] = base64.b64encode(content).decode('ascii')
+
+        with self._lock:
+            self._interactions.append(interaction)
+        return r
+
+    def _replay(self, key):
+        with self._lock:
+            recorded = self._index.get(key)
+            if not recorded:
+                raise LookupError("No recorded response for {0}".format(key))
+            # Keep the last response of a key around so it can be replayed again.
+            interaction = recorded.popleft() if len(recorded) > 1 else recorded[0]
+
+        delay = self.latency
+        if delay == 'recorded':
+            delay = interaction.get('elapsed', 0)
+        elif callable(delay):
+            delay = delay(interaction)
+        if delay:
+            time.sleep(delay)
+
+        return self._build_response(interaction)
+
+    @staticmethod
+    def _build_response(interaction):
+        r = requests.models.Response()
+        r.status_code = interaction['status']
+        r.reason = interaction.get('reason')
+        r.url = interaction['url']
+        r.headers = CaseInsensitiveDict(interaction['headers'])
+        if 'base64' in interaction:
+            r._content = base64.b64decode(interaction['base64'])
+        else:
+            r._content = interaction['text'].encode('utf-8')
+        r._content_consumed = True
+        r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+        return r
@@ -0,0 +1,258 @@
+"""
+A long running poller over the employee change endpoints (get_employee_changes and
+get_employee_changed_table) which hands batches of changes to subscriber callbacks.
+"""
+
+import datetime
+import json
+import logging
+import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from . import utils
+
+logger = logging.getLogger(__name__)
+
+
+def parse_timestamp(value):
+    """
+    Parses a BambooHR change timestamp (e.g. 2011-06-02T19:26:23+00:00) into a naive UTC datetime.
+    """
+    return datetime.datetime.strptime(value[:19], '%Y-%m-%dT%H:%M:%S')
+
+
+class ChangeFeedPoller(object):
+    """
+    Polls BambooHR for employee (and optionally table) changes and fans them out to
+    subscribers.
+
+    The since checkpoint is saved to checkpoint_path after every poll, so a restarted
+    poller continues where the previous one stopped. Changes are deduplicated per
+    employee within a poll (and against the boundary of the previous poll), split into
+    batches and delivered to every subscriber by a worker pool. Subscribers are called
+    concurrently, but each one receives its batches one at a time and in order. At most
+    max_pending batches are in flight; dispatching blocks beyond that so slow subscribers
+    slow the poller down instead of piling up memory.
+
+    Each change is a dictionary with 'kind' ('employee' or 'table'), 'id', 'action' and
+    'lastChanged' keys, plus 'table' and 'rows' for table changes and 'record' when
+    hydrate_fields is used.
+    """
+
+    def __init__(self, client, checkpoint_path=None, since=None, tables=None, interval=60,
+                 batch_size=100, max_workers=4, max_pending=8, hydrate_fields=None, on_error=None, max_backoff=900):
+        """
+        @param client: PyBambooHR instance to poll.
+        @param checkpoint_path: String (optional) path of the JSON file the checkpoints are kept in.
+        @param since: datetime to start from when there is no saved checkpoint. Defaults to now.
+        @param tables: List (optional) of table names to poll with get_employee_changed_table.
+        @param interval: Number of seconds between polls in run().
+        @param batch_size: Integer maximum number of changes per delivered batch.
+        @param max_workers: Integer number of threads delivering batches.
+        @param max_pending: Integer maximum number of batches waiting or being delivered.
+        @param hydrate_fields: List (optional) of fields to fetch, with one custom report per poll, for changed employees.
+        @param on_error: Callable (optional) called with (callback, batch, exception) when a subscriber raises,
+        and with (None, None, exception) when a poll in run() fails.
+        @param max_backoff: Number of seconds run() waits at most after consecutive failed polls.
+        """
+        self.client = client
+        self.checkpoint_path = checkpoint_path
+        self.tables = list(tables or [])
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.hydrate_fields = hydrate_fields
+        self.on_error = on_error
+        self.max_backoff = max_backoff
+
+        self._subscribers = []
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._stop = threading.Event()
+        self._thread = None
+
+        start = since or datetime.datetime.utcnow().replace(microsecond=0)
+        self._checkpoints = {'employees': {'since': start, 'seen': []}}
+        for table in self.tables:
+            self._checkpoints['table:' + table] = {'since': start, 'seen': []}
+        self._load_checkpoints()
+
+    def subscribe(self, callback):
+        """
+        Registers a callable which is called with each batch (a list of changes).
+        """
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    @property
+    def since(self):
+        """
+        The datetime the next employee poll starts from.
+        """
+        return self._checkpoints['employees']['since']
+
+    def poll_once(self):
+        """
+        Polls every feed once, delivers the changes and saves the new checkpoints.
+        Returns once every subscriber has received every batch of this poll.
+
+        @return: Integer number of changes delivered.
+        """
+        changes = []
+        new_checkpoints = {}
+
+        state = self._checkpoints['employees']
+        data = self.client.get_employee_changes(since=state['since'])
+        employees = (data or {}).get('employees') or {}
+        events = [dict(change, kind='employee', id=str(change.get('id', employee_id))) for employee_id, change in employees.items()]
+        changes.extend(self._dedupe(events, state))
+        new_checkpoints['employees'] = self._advance(state, events, (data or {}).get('latest'))
+
+        for table in self.tables:
+            state = self._checkpoints['table:' + table]
+            data = self.client.get_employee_changed_table(table_name=table, since=state['since'])
+            employees = (data or {}).get('employees') or {}
+            events = [dict(change, kind='table', table=table, id=str(employee_id), action='Updated') for employee_id, change in employees.items()]
+            changes.extend(self._dedupe(events, state))
+            new_checkpoints['table:' + table] = self._advance(state, events, (data or {}).get('latest'))
+
+        if changes and self.hydrate_fields:
+            self._hydrate(changes, min(state['since'] for state in self._checkpoints.values()))
+
+        if changes and self._subscribers:
+            for future in self._deliver(changes):
+                # Without on_error a failing subscriber keeps the checkpoint where it was,
+                # so the same changes are delivered again on the next poll.
+                future.result()
+
+        self._checkpoints.update(new_checkpoints)
+        self._save_checkpoints()
+        return len(changes)
+
+    def run(self):
+        """
+        Polls until stop() is called, waiting interval seconds between polls. A failed
+        poll (e.g. a network error or a 5xx) is logged and passed to on_error, and the
+        wait doubles after each consecutive failure, up to max_backoff seconds.
+        """
+        self._stop.clear()
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                logger.exception("Polling BambooHR for changes failed (%d in a row)", failures)
+                if self.on_error is not None:
+                    try:
+                        self.on_error(None, None, e)
+                    except Exception:
+                        logger.exception("The on_error callback of the change feed poller failed")
+            self._stop.wait(min(self.max_backoff, self.interval * 2 ** failures) if failures else self.interval)
+
+    def start(self):
+        """
+        Runs the poller on a background (daemon) thread.
+        """
+        self._thread = threading.Thread(target=self.run, name='ChangeFeedPoller')
+        self._thread.daemon = True
+        self._thread.start()
+        return self._thread
+
+    def stop(self, wait=True):
+        """
+        Asks the poller to stop after the current poll.
+        """
+        self._stop.set()
+        if wait and self._thread is not None:
+            self._thread.join()
+
+    def _dedupe(self, events, state):
+        latest = {}
+        seen = set(state['seen'])
+        for event in events:
+            if (event['id'], event.get('lastChanged')) in seen:
+                # Already delivered by the previous poll, which ended on the same timestamp.
+                continue
+            if event.get('lastChanged') and parse_timestamp(event['lastChanged']) < state['since']:
+                continue
+            current = latest.get(event['id'])
+            if current is None or event.get('lastChanged', '') >= current.get('lastChanged', ''):
+                latest[event['id']] = event
+        return sorted(latest.values(), key=lambda e: e.get('lastChanged', ''))
+
+    def _advance(self, state, events, latest):
+        stamps = [e['lastChanged'] for e in events if e.get('lastChanged')]
+        if latest:
+            stamps.append(latest)
+        if not stamps:
+            return state
+        newest = max(stamps, key=parse_timestamp)
+        since = parse_timestamp(newest)
+        if since < state['since']:
+            return state
+        seen = [(e['id'], e['lastChanged']) for e in events if e.get('lastChanged') and parse_timestamp(e['lastChanged']) == since]
+        return {'since': since, 'seen': seen}
+
+    def _hydrate(self, changes, since):
+        fields = list(self.hydrate_fields)
+        if 'id' not in fields:
+            fields.append('id')
+        # Only the employees changed since the oldest checkpoint, not the whole company.
+        report = self.client.request_custom_report(fields, report_format='json', last_changed=since)
+        records = dict((str(r.get('id')), r) for r in report.get('employees', []))
+        for change in changes:
+            record = records.get(change['id'])
+            if record is not None:
+                change['record'] = record
+
+    def _deliver(self, changes):
+        batches = [changes[i:i + self.batch_size] for i in range(0, len(changes), self.batch_size)]
+        subscribers = list(self._subscribers)
+        previous = [None] * len(subscribers)
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for batch in batches:
+                for i, callback in enumerate(subscribers):
+                    self._pending.acquire()
+                    future = executor.submit(self._call, callback, batch, previous[i])
+                    future.add_done_callback(lambda f: self._pending.release())
+                    futures.append(future)
+                    previous[i] = future
+        return futures
+
+    def _call(self, callback, batch, previous=None):
+        # The subscriber's previous batch was submitted earlier, so it is already running
+        # (or done) by the time a worker gets here.
+        if previous is not None:
+            wait([previous])
+        try:
+            callback(batch)
+        except Exception as e:
+            if self.on_error is None:
+                raise
+            self.on_error(callback, batch, e)
+
+    def _load_checkpoints(self):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path, 'rb') as handle:
+            saved = json.loads(handle.read().decode('utf-8'))
+        for key, state in saved.items():
+            if key in self._checkpoints:
+                self._checkpoints[key] = {
+                    'since': parse_timestamp(state['since']),
+                    'seen': [tuple(s) for s in state.get('seen', [])],
+                }
+
+    def _save_checkpoints(self):
+        if not self.checkpoint_path:
+            return
+        saved = dict((key, {'since': state['since'].strftime('%Y-%m-%dT%H:%M:%S+00:00'), 'seen': state['seen']})
+                     for key, state in self._checkpoints.items())
+        utils.atomic_write(self.checkpoint_path, json.dumps(saved, sort_keys=True).encode('utf-8'))
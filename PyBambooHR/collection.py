@@ -0,0 +1,203 @@
+"""
+A collection of partially fetched employee records which loads missing fields on
+demand, for many employees at once.
+"""
+
+import threading
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
+
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from . import utils
+
+
+class EmployeeCollection(Mapping):
+    """
+    Employee records fetched with a narrow field_list, which fetch any other field the
+    first time it is read:
+
+        employees = bamboo.employee_collection(field_list=['firstName', 'lastName'])
+        for employee in employees.values():
+            print(employee['firstName'], employee['department'])
+
+    Reading 'department' on the first employee loads it for every employee of the
+    collection which does not have it yet, so the loop above costs one extra request,
+    not one per employee. Fields queued with prefetch() are loaded in the same request.
+
+    A batch is loaded with one JSON custom report when at least report_threshold
+    employees need it (or more than the calls left in a call budget), and otherwise with
+    get_employee calls through max_workers threads. Fields which BambooHR does not return
+    for an employee are set to None so they are not asked for again.
+
+    Batches are fetched without holding the collection's lock, so readers of fields
+    already loaded (or of other fields) are not held up; a reader of a field whose batch
+    is in flight waits for that batch instead of fetching it again.
+    """
+
+    def __init__(self, client, employees, report_threshold=10, max_workers=4):
+        """
+        @param client: PyBambooHR instance used to load fields.
+        @param employees: Dictionary of employee id to record, e.g. from get_all_employees.
+        @param report_threshold: Integer number of employees from which a custom report is used.
+        @param max_workers: Integer number of concurrent get_employee calls.
+        """
+        self.client = client
+        self.report_threshold = report_threshold
+        self.max_workers = max_workers
+        self._records = dict((str(k), v) for k, v in employees.items())
+        self._queued = set()
+        # Field to the Future of the batch loading it.
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, employee_id):
+        employee_id = str(employee_id)
+        if employee_id not in self._records:
+            raise KeyError(employee_id)
+        return PartialEmployee(self, employee_id)
+
+    def __iter__(self):
+        return iter(list(self._records))
+
+    def __len__(self):
+        return len(self._records)
+
+    def prefetch(self, *fields):
+        """
+        Queues fields to be loaded with the next batch (or right away with load()).
+        """
+        with self._lock:
+            self._queued.update(utils.underscore_to_camelcase(f) for f in fields)
+
+    def load(self, *fields):
+        """
+        Loads the given fields and any queued ones for every employee which misses them.
+        """
+        self.prefetch(*fields)
+        self._load()
+        # Fields another thread took from the queue may still be loading.
+        with self._lock:
+            waits = set(self._loading[f] for f in (utils.underscore_to_camelcase(f) for f in fields) if f in self._loading)
+        for future in waits:
+            future.result()
+
+    def raw(self, employee_id):
+        """
+        Returns the underlying record of an employee as loaded so far.
+        """
+        return self._records[str(employee_id)]
+
+    def _key(self, field):
+        return utils.camelcase_to_underscore(field) if self.client.underscore_keys else field
+
+    def _field(self, employee_id, field):
+        record = self._records[employee_id]
+        if field in record:
+            return record[field]
+
+        camel = utils.underscore_to_camelcase(field)
+        if not camel.startswith('custom') and camel not in self.client.employee_fields:
+            raise KeyError(field)
+        key = self._key(camel)
+        while key not in record:
+            with self._lock:
+                loading = self._loading.get(camel)
+                if loading is None and key not in record:
+                    self._queued.add(camel)
+            if loading is not None:
+                loading.result()
+            else:
+                self._load()
+        return record[key]
+
+    def _load(self):
+        """
+        Loads the queued fields, and waits for the batches already loading any of them.
+        """
+        with self._lock:
+            fields, self._queued = sorted(self._queued), set()
+            waits = set(self._loading[f] for f in fields if f in self._loading)
+            fields = [f for f in fields if f not in self._loading]
+            wanted = {}
+            for employee_id, record in self._records.items():
+                missing = [f for f in fields if self._key(f) not in record]
+                if missing:
+                    wanted[employee_id] = missing
+            if wanted:
+                batch = Future()
+                for field in fields:
+                    self._loading[field] = batch
+
+        if wanted:
+            try:
+                loaded = self._fetch(wanted)
+            except BaseException as e:
+                with self._lock:
+                    for field in fields:
+                        del self._loading[field]
+                batch.set_exception(e)
+                raise
+            with self._lock:
+                for employee_id, missing in wanted.items():
+                    row = loaded.get(employee_id) or {}
+                    record = self._records[employee_id]
+                    for field in missing:
+                        key = self._key(field)
+                        record[key] = row.get(key, row.get(field))
+                for field in fields:
+                    del self._loading[field]
+            batch.set_result(None)
+
+        for future in waits:
+            future.result()
+
+    def _fetch(self, wanted):
+        """
+        Fetches the missing fields of the employees of wanted (employee id to list of fields).
+
+        @return: Dictionary of employee id to the loaded record.
+        """
+        needed = sorted(set(f for missing in wanted.values() for f in missing))
+        remaining = self.client.remaining_calls()
+        if len(wanted) >= self.report_threshold or (remaining is not None and len(wanted) > remaining):
+            report = self.client.request_custom_report(['id'] + needed, report_format='json')
+            # Wrapped like get_employee's records, so both paths honour lazy, typed and underscore settings.
+            loaded = dict((str(row.get('id')), self.client._wrap_employee(row)) for row in report.get('employees', []))
+        else:
+            def fetch(employee_id):
+                return employee_id, self.client.get_employee(employee_id, field_list=wanted[employee_id])
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                loaded = dict(executor.map(self.client._bind_deadline(getattr(self.client._local, 'deadline', None), fetch), list(wanted)))
+        return loaded
+
+
+class PartialEmployee(Mapping):
+    """
+    One employee of an EmployeeCollection. Reading a field it does not have yet loads it
+    through the collection. Iterating only covers the fields loaded so far.
+    """
+
+    __slots__ = ('_collection', '_employee_id')
+
+    def __init__(self, collection, employee_id):
+        self._collection = collection
+        self._employee_id = employee_id
+
+    def __getitem__(self, field):
+        return self._collection._field(self._employee_id, field)
+
+    def __iter__(self):
+        return iter(list(self._collection.raw(self._employee_id)))
+
+    def __len__(self):
+        return len(self._collection.raw(self._employee_id))
+
+    def __contains__(self, field):
+        return field in self._collection.raw(self._employee_id)
+
+    def __repr__(self):
+        return 'PartialEmployee({0!r})'.format(self._collection.raw(self._employee_id))
@@ -0,0 +1,89 @@
+"""
+Deadlines bounding the total time of operations made of several API calls, and the
+partial results they return when time runs out.
+"""
+
+import time
+
+import requests
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """
+    Raised instead of sending a request when the deadline of the operation has passed.
+    """
+
+
+class Deadline(object):
+    """
+    A point in time by which an operation has to be done.
+    """
+
+    def __init__(self, budget):
+        """
+        @param budget: Number of seconds from now.
+        """
+        self.expires = time.time() + budget
+
+    def remaining(self):
+        """
+        Returns the number of seconds left (negative once expired).
+        """
+        return self.expires - time.time()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, timeout=None):
+        """
+        Returns the timeout for the next request: the given one, capped to the time left.
+        Raises DeadlineExceeded when no time is left.
+
+        @param timeout: Number of seconds, (connect, read) tuple or None.
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded("The deadline of the operation has passed")
+        if timeout is None:
+            return remaining
+        if isinstance(timeout, tuple):
+            return tuple(remaining if t is None else min(t, remaining) for t in timeout)
+        return min(timeout, remaining)
+
+    def earliest(self, other):
+        """
+        Returns whichever of this deadline and other (a Deadline or None) expires first.
+        """
+        if other is None or self.expires <= other.expires:
+            return self
+        return other
+
+
+class PartialDict(dict):
+    """
+    The dictionary result of an operation run with a budget. skipped lists what was not
+    done because time ran out (empty when the operation completed).
+    """
+
+    def __init__(self, data, skipped=None):
+        dict.__init__(self, data)
+        self.skipped = list(skipped or [])
+
+    @property
+    def complete(self):
+        return not self.skipped
+
+
+class PartialList(list):
+    """
+    The list result of an operation run with a budget. skipped lists what was not done
+    because time ran out (empty when the operation completed).
+    """
+
+    def __init__(self, data, skipped=None):
+        list.__init__(self, data)
+        self.skipped = list(skipped or [])
+
+    @property
+    def complete(self):
+        return not self.skipped
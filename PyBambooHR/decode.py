@@ -0,0 +1,195 @@
+"""
+Typed decoding of employee records: turns the strings BambooHR returns into dates,
+integers, booleans and amounts according to the field types.
+"""
+
+import datetime
+
+from . import utils
+
+# Field types used by the meta/fields endpoint which mean the same as ours.
+TYPE_ALIASES = {
+    'int': 'integer',
+    'checkbox': 'bool',
+    'datetime': 'timestamp',
+}
+
+
+def _blank(value):
+    return value is None or value == '' or value == '0000-00-00'
+
+
+def decode_date(value):
+    """
+    Converts a YYYY-MM-DD string to a datetime.date. Blank dates become None.
+    """
+    if _blank(value):
+        return None
+    if isinstance(value, datetime.date):
+        return value
+    # Slicing is several times faster than strptime, which matters in bulk.
+    return datetime.date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+
+
+def decode_timestamp(value):
+    """
+    Converts a YYYY-MM-DDTHH:MM:SS(+00:00) string to a naive UTC datetime.datetime.
+    """
+    if _blank(value):
+        return None
+    if isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                             int(value[11:13]), int(value[14:16]), int(value[17:19]))
+
+
+def decode_integer(value):
+    if _blank(value):
+        return None
+    return int(value)
+
+
+def decode_bool(value):
+    if _blank(value):
+        return None
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ('true', 'yes', '1')
+
+
+def decode_currency(value):
+    """
+    Converts an amount like '8.25 USD' to a tuple of (Decimal amount, currency code or None).
+    """
+    if _blank(value):
+        return None
+    return utils.parse_currency(value)
+
+
+CONVERTERS = {
+    'date': decode_date,
+    'timestamp': decode_timestamp,
+    'integer': decode_integer,
+    'bool': decode_bool,
+    'currency': decode_currency,
+}
+
+
+class RecordDecoder(object):
+    """
+    Converts the values of employee records to Python types according to their field
+    types, e.g. built from PyBambooHR.employee_fields:
+
+        decoder = bamboo.record_decoder()
+        employees = decoder.decode_many(bamboo.get_all_employees())
+        employees['123']['hireDate']  # datetime.date(2010, 12, 15)
+
+    The schema is compiled once into a table of field name to converter (under both the
+    camelcase and the underscore name), and fields of types without a converter (text,
+    list, email...) are never looked at. decode_many() also works out the converters of
+    a set of keys only once for all records sharing it, and converts every distinct value
+    of a field only once per call, since dates, amounts and ids repeat a lot across a
+    company's employees.
+
+    Values which cannot be converted are left as they are.
+    """
+
+    def __init__(self, field_types):
+        """
+        @param field_types: Dictionary of field name to type, or to (type, description) as in PyBambooHR.employee_fields.
+        """
+        self._converters = {}
+        for name, field_type in field_types.items():
+            if isinstance(field_type, (tuple, list)):
+                field_type = field_type[0]
+            converter = CONVERTERS.get(TYPE_ALIASES.get(field_type, field_type))
+            if converter is not None:
+                self._converters[name] = converter
+                self._converters[utils.camelcase_to_underscore(name)] = converter
+        self._plans = {}
+
+    @classmethod
+    def from_client(cls, client, meta_fields=False):
+        """
+        Builds a decoder from a client's employee_fields.
+
+        @param client: PyBambooHR instance.
+        @param meta_fields: Boolean. True to also ask BambooHR for the company's fields (get_meta_fields), which adds the types of custom fields.
+        @return: RecordDecoder
+        """
+        field_types = dict((name, spec[0]) for name, spec in client.employee_fields.items())
+        if meta_fields:
+            for field in client.get_meta_fields():
+                if field.get('type'):
+                    field_types[str(field.get('alias') or field.get('id'))] = field['type']
+        return cls(field_types)
+
+    def convert(self, field, value):
+        """
+        Converts a single value of a field. Values which cannot be converted are returned as they are.
+
+        @param field: String of the field name.
+        @param value: The raw value.
+        """
+        converter = self._converters.get(field)
+        if converter is None:
+            return value
+        try:
+            return converter(value)
+        except (TypeError, ValueError):
+            return value
+
+    def decode(self, record):
+        """
+        Returns a copy of a record with its values converted.
+
+        @param record: Dictionary of field name to value.
+        @return: Dictionary.
+        """
+        return self._decode(record, self._plan(record), None)
+
+    def decode_many(self, records):
+        """
+        Decodes a batch of records in one pass.
+
+        @param records: List of records, or dictionary of employee id to record (as returned by get_all_employees).
+        @return: The decoded records, in the same shape.
+        """
+        seen = {}
+        if isinstance(records, dict):
+            return dict((k, self._decode(r, self._plan(r), seen)) for k, r in records.items())
+        return [self._decode(r, self._plan(r), seen) for r in records]
+
+    def _plan(self, record):
+        keys = tuple(record)
+        plan = self._plans.get(keys)
+        if plan is None:
+            converters = self._converters
+            plan = tuple((key, converters[key]) for key in keys if key in converters)
+            if len(self._plans) < 1024:
+                self._plans[keys] = plan
+        return plan
+
+    @staticmethod
+    def _decode(record, plan, seen):
+        decoded = dict(record)
+        for key, converter in plan:
+            value = record[key]
+            if seen is not None:
+                cache = seen.setdefault(converter, {})
+                try:
+                    decoded[key] = cache[value]
+                    continue
+                except (KeyError, TypeError):
+                    pass
+            try:
+                converted = converter(value)
+            except (TypeError, ValueError):
+                continue
+            decoded[key] = converted
+            if seen is not None:
+                try:
+                    cache[value] = converted
+                except TypeError:
+                    pass
+        return decoded
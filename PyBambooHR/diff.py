@@ -0,0 +1,128 @@
+"""
+Field level diffs between a desired employee record and a known copy of it, so that
+updates only send the fields which really changed.
+"""
+
+from . import utils
+from .decode import decode_timestamp
+
+
+def _blank(value):
+    return value is None or value == ''
+
+
+def _text(value):
+    if _blank(value):
+        return None
+    return value if isinstance(value, type(u'')) else str(value)
+
+
+def _date(value):
+    if _blank(value) or value == '0000-00-00':
+        return None
+    try:
+        return utils.resolve_date(value)
+    except ValueError:
+        return _text(value)
+
+
+def _integer(value):
+    if _blank(value):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return _text(value)
+
+
+def _timestamp(value):
+    if _blank(value):
+        return None
+    try:
+        return decode_timestamp(value)
+    except (TypeError, ValueError):
+        return _text(value)
+
+
+def _bool(value):
+    if _blank(value):
+        return None
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ('true', 'yes', '1')
+
+
+def _same_currency(a, b):
+    a, b = utils.parse_currency(a), utils.parse_currency(b)
+    if a is None or b is None:
+        return a == b
+    # A value sent without a currency code keeps the currency the employee already has.
+    return a[0] == b[0] and (a[1] is None or b[1] is None or a[1] == b[1])
+
+
+NORMALIZERS = {
+    'date': _date,
+    'integer': _integer,
+    'bool': _bool,
+    'timestamp': _timestamp,
+}
+
+
+def _comparator(field_type):
+    if field_type == 'currency':
+        return _same_currency
+    normalize = NORMALIZERS.get(field_type, _text)
+    return lambda a, b: normalize(a) == normalize(b)
+
+
+class RecordDiffer(object):
+    """
+    Compares employee records field by field using the field types of
+    PyBambooHR.employee_fields, so that e.g. '2014-01-01' and datetime.date(2014, 1, 1),
+    '8.25 USD' and '8.25', or 5 and '5' are not reported as changes.
+
+    The comparison function of every field is looked up once, which keeps bulk diffs of
+    thousands of records cheap.
+    """
+
+    def __init__(self, employee_fields):
+        """
+        @param employee_fields: Dictionary of field name to (type, description), as in PyBambooHR.employee_fields.
+        """
+        self._comparators = dict((name, _comparator(spec[0])) for name, spec in employee_fields.items())
+        self._default = _comparator('text')
+
+    def diff(self, desired, baseline):
+        """
+        Returns the fields of desired whose value differs from baseline.
+        Fields missing from desired are left alone (they are not deletions).
+
+        @param desired: Dictionary of the wanted field values (camelcase keys).
+        @param baseline: Dictionary of the known field values (camelcase keys), or None.
+        @return: Dictionary of the changed fields with their desired values.
+        """
+        if not baseline:
+            return dict(desired)
+
+        changes = {}
+        comparators = self._comparators
+        default = self._default
+        for field, value in desired.items():
+            if field not in baseline or not comparators.get(field, default)(value, baseline[field]):
+                changes[field] = value
+        return changes
+
+    def diff_many(self, desired, baselines):
+        """
+        Diffs many records at once.
+
+        @param desired: Dictionary of employee id to desired record.
+        @param baselines: Dictionary of employee id to known record.
+        @return: Dictionary of employee id to changed fields. Employees without changes are left out.
+        """
+        changes = {}
+        for employee_id, record in desired.items():
+            changed = self.diff(record, baselines.get(str(employee_id)))
+            if changed:
+                changes[employee_id] = changed
+        return changes
@@ -0,0 +1,256 @@
+"""
+pybamboohr-export: a command line exporter streaming BambooHR data as NDJSON or CSV.
+
+    pybamboohr-export employees --subdomain acme --api-key KEY --fields firstName,lastName
+    pybamboohr-export table --table jobInfo --table compensation --subdomain acme --format csv -o jobs.csv
+    pybamboohr-export time-off --start 2014-01-01 --end 2014-12-31 --subdomain acme --subdomain globex --stats
+
+The API key can also be given with the BAMBOOHR_API_KEY environment variable. With several
+subdomains give one --api-key per subdomain (in the same order) or a single key for all of them.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from . import utils
+from .PyBambooHR import PyBambooHR
+
+DATASETS = ('employees', 'table', 'time-off', 'whos-out')
+
+
+class Stats(object):
+    """
+    Counts records and times API calls for --stats.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.records = 0
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def count(self):
+        with self._lock:
+            self.records += 1
+
+    def timed(self, func, *args, **kwargs):
+        started = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.latencies.append(time.time() - started)
+
+    def report(self, stream):
+        elapsed = time.time() - self.started
+        latencies = sorted(self.latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+        stream.write('records: {0}\nrequests: {1}\nelapsed: {2:.2f}s\nthroughput: {3:.1f} records/s\n'
+                     'latency avg: {4:.3f}s p95: {5:.3f}s max: {6:.3f}s\n'.format(
+                         self.records, len(latencies), elapsed, self.records / elapsed if elapsed else 0.0,
+                         sum(latencies) / len(latencies) if latencies else 0.0, p95, latencies[-1] if latencies else 0.0))
+
+
+def open_output(path, output_format):
+    """
+    Opens an output file for writing. CSV files are opened without newline translation
+    (the csv module writes its own CRLF line endings, which would otherwise become
+    CR CR LF on Windows): binary on Python 2, newline='' on Python 3.
+    """
+    if output_format != 'csv':
+        return open(path, 'w')
+    if sys.version_info[0] < 3:
+        return open(path, 'wb')
+    return open(path, 'w', newline='')
+
+
+class RecordWriter(object):
+    """
+    Writes records one at a time, as NDJSON or CSV, from any number of threads.
+
+    With columns, CSV rows are written as they come and a record with a field outside
+    the columns raises UserWarning. Without them the header has to be the union of the
+    fields of every record, so records are spooled to a temporary file and the CSV is
+    written by close(). Nested values are written as JSON.
+    """
+
+    def __init__(self, stream, output_format='ndjson', columns=None, stats=None):
+        self.stream = stream
+        self.output_format = output_format
+        self.columns = columns
+        self.stats = stats
+        self._csv = None
+        self._spool = None
+        self._fields = []
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        with self._lock:
+            if self.output_format == 'csv' and self.columns:
+                if self._csv is None:
+                    self._csv = csv.DictWriter(self.stream, fieldnames=self.columns)
+                    self._csv.writeheader()
+                extra = [k for k in record if k not in self._csv.fieldnames]
+                if extra:
+                    raise UserWarning("Fields {0} are not among the CSV columns".format(', '.join(sorted(extra))))
+                self._csv.writerow(self._row(record))
+            elif self.output_format == 'csv':
+                if self._spool is None:
+                    self._spool = tempfile.TemporaryFile(mode='w+')
+                for k in record:
+                    if k not in self._fields:
+                        self._fields.append(k)
+                self._spool.write(json.dumps(self._row(record), default=str) + '\n')
+            else:
+                self.stream.write(json.dumps(record, default=str, sort_keys=True) + '\n')
+            if self.stats is not None:
+                self.stats.count()
+
+    def close(self):
+        """
+        Writes out spooled CSV records. The stream itself is left open.
+        """
+        with self._lock:
+            if self._spool is None:
+                return
+            spool, self._spool = self._spool, None
+            writer = csv.DictWriter(self.stream, fieldnames=self._fields)
+            writer.writeheader()
+            spool.seek(0)
+            for line in spool:
+                writer.writerow(json.loads(line))
+            spool.close()
+
+    @staticmethod
+    def _row(record):
+        return dict((k, json.dumps(v) if isinstance(v, (dict, list)) else v) for k, v in record.items())
+
+
+def bounded_map(executor, func, items, window):
+    """
+    Like executor.map, but keeps at most window calls submitted at once and yields
+    results in order as they become available, so results never pile up in memory.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def iter_records(client, args, executor, stats):
+    """
+    Yields the records of the requested dataset for one client.
+    """
+    if args.dataset == 'employees':
+        fields = args.fields.split(',') if args.fields else None
+        ids = stats.timed(client.get_employee_ids, disabledUsers=args.disabled)
+        fetch = lambda employee_id: stats.timed(client.get_employee, employee_id, field_list=fields)
+        for record in bounded_map(executor, fetch, ids, args.workers * 2):
+            yield record
+    elif args.dataset == 'table':
+        fetch = lambda table: (table, stats.timed(client.get_tabular_data, table))
+        for table, rows_by_employee in bounded_map(executor, fetch, args.table, args.workers * 2):
+            for employee_id, rows in rows_by_employee.items():
+                for row in rows:
+                    yield dict(row, employeeId=employee_id, table=table)
+    elif args.dataset == 'time-off':
+        for record in stats.timed(client.get_time_off_requests, args.start, args.end, status=args.status):
+            yield record
+    elif args.dataset == 'whos-out':
+        for record in stats.timed(client.get_whos_out, args.start, args.end):
+            yield record
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='pybamboohr-export', description='Export BambooHR data as NDJSON or CSV.')
+    parser.add_argument('dataset', choices=DATASETS)
+    parser.add_argument('--subdomain', action='append', required=True, help='Company subdomain (repeat for several).')
+    parser.add_argument('--api-key', action='append', help='API key (one per subdomain, or one for all). Defaults to $BAMBOOHR_API_KEY.')
+    parser.add_argument('--fields', help='Comma separated employee fields (employees only).')
+    parser.add_argument('--disabled', action='store_true', help='Include disabled employees (employees only).')
+    parser.add_argument('--table', action='append', help='Table name (table only, repeat for several).')
+    parser.add_argument('--start', help='Start date YYYY-MM-DD (time-off and whos-out).')
+    parser.add_argument('--end', help='End date YYYY-MM-DD (time-off and whos-out).')
+    parser.add_argument('--status', help='Time off request status (time-off only).')
+    parser.add_argument('--format', dest='output_format', choices=('ndjson', 'csv'), default='ndjson')
+    parser.add_argument('-o', '--output', help='Output file (default stdout). "{subdomain}" is replaced to write one file per subdomain.')
+    parser.add_argument('--workers', type=int, default=4, help='Maximum concurrent requests per subdomain.')
+    parser.add_argument('--timeout', type=int, default=60, help='Timeout of each request in seconds.')
+    parser.add_argument('--stats', action='store_true', help='Report throughput and latency on stderr.')
+    args = parser.parse_args(argv)
+
+    keys = args.api_key or [os.environ.get('BAMBOOHR_API_KEY', '')]
+    if len(keys) == 1:
+        keys = keys * len(args.subdomain)
+    if len(keys) != len(args.subdomain) or not all(keys):
+        parser.error('give one --api-key per --subdomain, a single --api-key, or set BAMBOOHR_API_KEY')
+    args.api_key = keys
+
+    if args.dataset == 'table' and not args.table:
+        parser.error('the table dataset needs at least one --table')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    stats = Stats()
+    several = len(args.subdomain) > 1
+    per_subdomain = bool(args.output and '{subdomain}' in args.output)
+    columns = None
+    if args.output_format == 'csv' and args.dataset == 'employees' and args.fields:
+        fields = [utils.underscore_to_camelcase(f) for f in args.fields.split(',')]
+        columns = ['id'] + [f for f in fields if f != 'id'] + (['subdomain'] if several else [])
+
+    handles = []
+    writers = []
+
+    def open_writer(subdomain):
+        if args.output:
+            handle = open_output(args.output.format(subdomain=subdomain), args.output_format)
+            handles.append(handle)
+        else:
+            handle = sys.stdout
+        writer = RecordWriter(handle, args.output_format, columns, stats)
+        writers.append(writer)
+        return writer
+
+    shared = None if per_subdomain else open_writer(None)
+
+    def export(tenant):
+        subdomain, api_key = tenant
+        writer = shared or open_writer(subdomain)
+        client = PyBambooHR(subdomain=subdomain, api_key=api_key, timeout=args.timeout)
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            for record in iter_records(client, args, executor, stats):
+                if several:
+                    record = dict(record, subdomain=subdomain)
+                writer.write(record)
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(args.subdomain)) as executor:
+            for _ in executor.map(export, zip(args.subdomain, args.api_key)):
+                pass
+    finally:
+        for writer in writers:
+            writer.close()
+        for handle in handles:
+            handle.close()
+        if args.stats:
+            stats.report(sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Helpers for moving employee files in bulk: checksums, listing the files returned by
+get_employee_files and a resumable progress log.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from . import utils
+
+
+def file_checksum(file_path, chunk_size=64 * 1024):
+    """
+    Returns the SHA-256 hex digest of a local file without reading it into memory at once.
+    @param file_path: String of the path of the file.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as handle:
+        for block in iter(lambda: handle.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def list_files(employee_files):
+    """
+    Flattens the categories returned by PyBambooHR.get_employee_files into a list of file
+    dictionaries, each one with an added 'category_id' key.
+    @param employee_files: Dictionary as returned by get_employee_files.
+    """
+    categories = employee_files.get('category') or []
+    if isinstance(categories, dict):
+        categories = [categories]
+
+    files = []
+    for category in categories:
+        category_files = category.get('file') or []
+        if isinstance(category_files, dict):
+            category_files = [category_files]
+        for f in category_files:
+            f = dict(f)
+            f['category_id'] = category.get('id')
+            files.append(f)
+    return files
+
+
+class TransferProgress(object):
+    """
+    A small JSON log of finished transfers. Bulk uploads and downloads record each file
+    they complete so that a run which is interrupted can be started again and skip
+    everything that was already moved.
+    """
+
+    def __init__(self, path=None):
+        """
+        @param path: String of the file the progress is kept in. With no path progress is only kept in memory.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._done = {}
+        if path and os.path.exists(path):
+            with open(path, 'rb') as handle:
+                self._done = json.loads(handle.read().decode('utf-8'))
+
+    def get(self, key):
+        """
+        Returns the recorded result for key if that transfer was completed, otherwise None.
+        """
+        with self._lock:
+            return self._done.get(key)
+
+    def complete(self, key, result):
+        """
+        Records a finished transfer and saves the log.
+        """
+        with self._lock:
+            self._done[key] = result
+            if self.path:
+                utils.atomic_write(self.path, json.dumps(self._done).encode('utf-8'))
+
+    def __len__(self):
+        return len(self._done)
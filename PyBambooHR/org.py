@@ -0,0 +1,217 @@
+"""
+An org chart built from the supervisor fields of employee records.
+"""
+
+import threading
+
+from . import utils
+
+
+class OrgChart(object):
+    """
+    The reporting hierarchy of a set of employees, built once from their supervisorEId
+    (or, failing that, supervisorId, which holds the supervisor's employeeNumber) fields:
+
+        employees = bamboo.get_all_employees(field_list=['id', 'employeeNumber', 'supervisorEId'])
+        org = OrgChart(employees)
+
+    The tree is laid out as an Euler tour: every employee gets the position it is entered
+    at in a depth first walk, and the position of the last employee of its subtree. That
+    makes "does X manage Y (directly or not)" an O(1) comparison and the list of all
+    reports of a manager an O(k) slice of the walk.
+
+    set_supervisor() and remove() only change the supervisor links, but they invalidate
+    the whole tour: the first tour based query after a change (is_ancestor(), reports(),
+    roots(), span_of_control()) relabels every employee, in O(n). Changes made between
+    two queries share a single relabel, so apply a batch of changes before querying.
+    """
+
+    def __init__(self, employees=None):
+        """
+        @param employees: Dictionary (optional) of employee id to record.
+        """
+        self._lock = threading.RLock()
+        self.rebuild(employees or {})
+
+    def rebuild(self, employees):
+        """
+        Drops everything and builds the hierarchy from the given records.
+
+        @param employees: Dictionary of employee id to record.
+        """
+        by_number = {}
+        for employee_id, record in employees.items():
+            number = self._field(record, 'employeeNumber')
+            if number:
+                by_number[str(number)] = str(employee_id)
+
+        with self._lock:
+            self._parent = {}
+            self._children = {}
+            for employee_id, record in employees.items():
+                self._children.setdefault(str(employee_id), [])
+            for employee_id, record in employees.items():
+                supervisor = self._field(record, 'supervisorEId')
+                if not supervisor and self._field(record, 'supervisorId'):
+                    supervisor = by_number.get(str(self._field(record, 'supervisorId')))
+                self._link(str(employee_id), str(supervisor) if supervisor else None)
+            self._stale = True
+
+    def set_supervisor(self, employee_id, supervisor_id):
+        """
+        Moves an employee (with everyone reporting to them) under another supervisor.
+
+        @param employee_id: String of the employee id.
+        @param supervisor_id: String of the new supervisor's id, or None for no supervisor.
+        @raise KeyError: If the supervisor is not in the chart.
+        """
+        employee_id = str(employee_id)
+        supervisor_id = str(supervisor_id) if supervisor_id else None
+        with self._lock:
+            if supervisor_id is not None and supervisor_id not in self._children:
+                raise KeyError("Unknown supervisor {0}".format(supervisor_id))
+            if supervisor_id is not None and (supervisor_id == employee_id or self.is_ancestor(employee_id, supervisor_id)):
+                raise UserWarning("Employee {0} cannot report to one of their own reports".format(employee_id))
+            self._unlink(employee_id)
+            self._children.setdefault(employee_id, [])
+            self._link(employee_id, supervisor_id)
+            self._stale = True
+
+    def remove(self, employee_id):
+        """
+        Removes an employee. Their direct reports move up to the employee's supervisor.
+        """
+        employee_id = str(employee_id)
+        with self._lock:
+            supervisor = self._parent.get(employee_id)
+            for child in list(self._children.get(employee_id, [])):
+                self._unlink(child)
+                self._link(child, supervisor)
+            self._unlink(employee_id)
+            self._children.pop(employee_id, None)
+            self._stale = True
+
+    def supervisor(self, employee_id):
+        """
+        Returns the id of the direct supervisor of an employee (None at the top).
+        """
+        return self._parent.get(str(employee_id))
+
+    def roots(self):
+        """
+        Returns the ids of the employees without a supervisor.
+        """
+        with self._lock:
+            self._relabel()
+            return list(self._roots)
+
+    def is_ancestor(self, manager_id, employee_id):
+        """
+        Returns True if employee_id reports to manager_id, directly or not.
+        """
+        with self._lock:
+            self._relabel()
+            entered, last = self._entered, self._last
+            manager_id, employee_id = str(manager_id), str(employee_id)
+            if manager_id not in entered or employee_id not in entered:
+                return False
+            return entered[manager_id] < entered[employee_id] <= last[manager_id]
+
+    def reports(self, manager_id, direct=False):
+        """
+        Returns the ids of the employees reporting to a manager, in depth first order.
+
+        @param direct: Boolean. True to only return direct reports.
+        """
+        manager_id = str(manager_id)
+        with self._lock:
+            if direct:
+                return list(self._children.get(manager_id, []))
+            self._relabel()
+            if manager_id not in self._entered:
+                return []
+            return self._tour[self._entered[manager_id] + 1:self._last[manager_id] + 1]
+
+    def chain(self, employee_id):
+        """
+        Returns the management chain of an employee: their supervisor, that person's
+        supervisor and so on up to the top. A supervisor cycle ends the chain at the
+        first employee seen twice.
+        """
+        chain = []
+        with self._lock:
+            seen = set([str(employee_id)])
+            current = self._parent.get(str(employee_id))
+            while current is not None and current not in seen:
+                seen.add(current)
+                chain.append(current)
+                current = self._parent.get(current)
+        return chain
+
+    def span_of_control(self, manager_id):
+        """
+        Returns a tuple of (number of direct reports, total number of reports) of a manager.
+        """
+        manager_id = str(manager_id)
+        with self._lock:
+            self._relabel()
+            if manager_id not in self._entered:
+                return 0, 0
+            return len(self._children.get(manager_id, [])), self._last[manager_id] - self._entered[manager_id]
+
+    def __contains__(self, employee_id):
+        return str(employee_id) in self._children
+
+    def __len__(self):
+        return len(self._children)
+
+    @staticmethod
+    def _field(record, name):
+        if name in record:
+            return record[name]
+        return record.get(utils.camelcase_to_underscore(name))
+
+    def _link(self, employee_id, supervisor_id):
+        if supervisor_id is not None and supervisor_id != employee_id and supervisor_id in self._children:
+            self._parent[employee_id] = supervisor_id
+            self._children[supervisor_id].append(employee_id)
+
+    def _unlink(self, employee_id):
+        supervisor = self._parent.pop(employee_id, None)
+        if supervisor is not None:
+            self._children[supervisor].remove(employee_id)
+
+    def _relabel(self):
+        if not self._stale:
+            return
+
+        tour, entered, last = [], {}, {}
+        roots = [e for e in self._children if e not in self._parent]
+        # Employees caught in a supervisor cycle are not reachable from any root,
+        # so the first one found of every cycle is treated as a root.
+        pending = list(roots)
+        unvisited = set(self._children)
+        while unvisited:
+            while pending:
+                start = pending.pop()
+                stack = [(start, False)]
+                while stack:
+                    employee_id, done = stack.pop()
+                    if done:
+                        last[employee_id] = len(tour) - 1
+                        continue
+                    entered[employee_id] = len(tour)
+                    tour.append(employee_id)
+                    unvisited.discard(employee_id)
+                    stack.append((employee_id, True))
+                    for child in reversed(self._children[employee_id]):
+                        if child not in entered:
+                            stack.append((child, False))
+            if unvisited:
+                cut = min(unvisited)
+                self._unlink(cut)
+                roots.append(cut)
+                pending.append(cut)
+
+        self._tour, self._entered, self._last, self._roots = tour, entered, last, roots
+        self._stale = False
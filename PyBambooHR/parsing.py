@@ -0,0 +1,66 @@
+"""
+An optional process pool for parsing large XML responses off the calling thread.
+"""
+
+import multiprocessing
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+
+
+class ParseExecutor(object):
+    """
+    Parses response bodies with the utils.transform_* functions in worker processes,
+    so parsing several large tables fetched concurrently is not serialised by the GIL:
+
+        parser = ParseExecutor(max_workers=4)
+        bamboo = PyBambooHR(subdomain='acme', api_key='...', parse_executor=parser)
+
+    Bodies smaller than threshold bytes are parsed on the calling thread, where the cost
+    of sending them to another process would outweigh the parsing itself. At most
+    max_pending bodies are queued for the pool at once; further callers block until a
+    slot is free, so a burst of responses cannot pile up in memory.
+
+    One ParseExecutor can be shared by any number of PyBambooHR instances and threads.
+    Use it as a context manager (or call shutdown()) to stop the worker processes.
+    """
+
+    def __init__(self, max_workers=None, threshold=256 * 1024, max_pending=None):
+        """
+        @param max_workers: Integer number of worker processes (defaults to the number of CPUs).
+        @param threshold: Integer size in bytes from which a body is parsed in a worker process.
+        @param max_pending: Integer number of bodies queued for the pool at once (defaults to twice the workers).
+        """
+        max_workers = max_workers or multiprocessing.cpu_count()
+        self.threshold = threshold
+        self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        if max_pending is None:
+            max_pending = 2 * max_workers
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._closed = False
+
+    def parse(self, func, data):
+        """
+        Returns func(data), computed in a worker process if data is large enough.
+
+        @param func: Module level function (so it can be pickled), e.g. utils.transform_tabular_data.
+        @param data: The response body (bytes or string).
+        """
+        if self._closed or len(data) < self.threshold:
+            return func(data)
+
+        with self._slots:
+            return self._executor.submit(func, data).result()
+
+    def shutdown(self, wait=True):
+        """
+        Stops the worker processes. Later parse() calls run on the calling thread.
+        """
+        self._closed = True
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
@@ -0,0 +1,200 @@
+"""
+A disk backed cache for employee photos fetched with PyBambooHR.get_employee_photo.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from . import utils
+
+
+class PhotoCache(object):
+    """
+    Caches employee photos on disk, keyed by employee id and photo size.
+
+    Image bytes are stored as content addressed blobs (named by their SHA-1), so the
+    same picture served for several sizes or employees is only kept once. The total
+    size of the blobs is bounded and the least recently used entries are evicted first.
+    Entries older than max_age are revalidated with a conditional request
+    (If-None-Match / If-Modified-Since) instead of being downloaded again.
+    """
+
+    def __init__(self, client, directory, max_bytes=50 * 1024 * 1024, max_age=24 * 60 * 60, max_workers=8):
+        """
+        @param client: PyBambooHR instance used to fetch photos.
+        @param directory: String of the directory in which blobs and the index are kept.
+        @param max_bytes: Integer upper bound on the total size of the cached blobs.
+        @param max_age: Number of seconds an entry is trusted before being revalidated.
+        @param max_workers: Integer number of concurrent downloads used by prefetch_photos.
+        """
+        self.client = client
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.max_workers = max_workers
+
+        self._lock = threading.RLock()
+        self._index_path = os.path.join(directory, 'index.json')
+        self._blob_dir = os.path.join(directory, 'blobs')
+        if not os.path.isdir(self._blob_dir):
+            os.makedirs(self._blob_dir)
+
+        self._entries = {}
+        self._blobs = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path, 'rb') as handle:
+                index = json.loads(handle.read().decode('utf-8'))
+            self._entries = index.get('entries', {})
+            self._blobs = index.get('blobs', {})
+
+    def get(self, employee_id, photo_size='small'):
+        """
+        Returns the photo of an employee from the cache, downloading or revalidating it if needed.
+
+        @param employee_id: String of the employee id.
+        @param photo_size: String of the size of photo to fetch. Default is 'small'.
+        @return A tuple whose first element is the photo data and second element
+        is the content type header.
+        """
+        key = self._key(employee_id, photo_size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry['accessed'] = time.time()
+                entry = dict(entry)
+
+        if entry is not None and time.time() - entry['checked'] < self.max_age:
+            data = self._read_blob(entry['digest'])
+            if data is not None:
+                return data, entry['content_type']
+
+        return self._fetch(employee_id, photo_size, entry)
+
+    def prefetch_photos(self, employee_ids, sizes=('small',)):
+        """
+        Warms the cache for every combination of employee id and photo size concurrently.
+
+        @param employee_ids: List of employee ids.
+        @param sizes: List of photo sizes to fetch for each employee.
+        @return: Dictionary keyed by (employee_id, size) with None on success or the raised exception.
+        """
+        jobs = [(employee_id, size) for employee_id in employee_ids for size in sizes]
+
+        def warm(job):
+            try:
+                self.get(job[0], job[1])
+            except Exception as e:
+                return job, e
+            return job, None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return dict(executor.map(warm, jobs))
+
+    def invalidate(self, employee_id, photo_size=None):
+        """
+        Drops the cached photo of an employee, for one size or for all of them.
+        """
+        with self._lock:
+            if photo_size is None:
+                prefix = '{0}/'.format(employee_id)
+                for key in [k for k in self._entries if k.startswith(prefix)]:
+                    del self._entries[key]
+            else:
+                self._entries.pop(self._key(employee_id, photo_size), None)
+            self._collect_blobs()
+            self._save_index()
+
+    def _fetch(self, employee_id, photo_size, entry):
+        extra_headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                extra_headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                extra_headers['If-Modified-Since'] = entry['last_modified']
+
+        r = self.client._get_employee_photo_response(employee_id, photo_size, extra_headers=extra_headers)
+        now = time.time()
+        key = self._key(employee_id, photo_size)
+
+        if r.status_code == 304 and entry is not None:
+            data = self._read_blob(entry['digest'])
+            if data is not None:
+                with self._lock:
+                    if key in self._entries:
+                        self._entries[key]['checked'] = now
+                        self._save_index()
+                return data, entry['content_type']
+            # The blob went missing, ask again without validators.
+            return self._fetch(employee_id, photo_size, None)
+
+        data = r.content
+        content_type = r.headers.get('content-type', '')
+        digest = hashlib.sha1(data).hexdigest()
+        self._write_blob(digest, data)
+
+        with self._lock:
+            self._blobs[digest] = len(data)
+            self._entries[key] = {
+                'digest': digest,
+                'content_type': content_type,
+                'etag': r.headers.get('etag'),
+                'last_modified': r.headers.get('last-modified'),
+                'checked': now,
+                'accessed': now,
+            }
+            self._evict()
+            self._save_index()
+
+        return data, content_type
+
+    def _evict(self):
+        self._collect_blobs()
+        total = sum(self._blobs.values())
+        if total <= self.max_bytes:
+            return
+
+        for key in sorted(self._entries, key=lambda k: self._entries[k]['accessed']):
+            if total <= self.max_bytes:
+                break
+            digest = self._entries.pop(key)['digest']
+            if not any(e['digest'] == digest for e in self._entries.values()):
+                total -= self._blobs.get(digest, 0)
+        self._collect_blobs()
+
+    def _collect_blobs(self):
+        referenced = set(e['digest'] for e in self._entries.values())
+        for digest in list(self._blobs):
+            if digest not in referenced:
+                del self._blobs[digest]
+                try:
+                    os.remove(self._blob_path(digest))
+                except OSError:
+                    pass
+
+    def _save_index(self):
+        index = {'entries': self._entries, 'blobs': self._blobs}
+        utils.atomic_write(self._index_path, json.dumps(index).encode('utf-8'))
+
+    def _read_blob(self, digest):
+        try:
+            with open(self._blob_path(digest), 'rb') as handle:
+                return handle.read()
+        except IOError:
+            return None
+
+    def _write_blob(self, digest, data):
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            utils.atomic_write(path, data)
+
+    def _blob_path(self, digest):
+        return os.path.join(self._blob_dir, digest)
+
+    @staticmethod
+    def _key(employee_id, photo_size):
+        return '{0}/{1}'.format(employee_id, photo_size or '')
@@ -0,0 +1,324 @@
+"""
+A pool of PyBambooHR clients, one per tenant (company subdomain), sharing one
+connection pool and one set of worker threads.
+"""
+
+import threading
+import time
+
+from collections import deque
+from concurrent.futures import Future
+
+import requests
+
+from .PyBambooHR import PyBambooHR
+
+
+class _Tenant(object):
+    """
+    Book keeping for one tenant of a BambooClientPool: its client, pending jobs,
+    concurrency and rate caps and metrics.
+
+    The rate is a token bucket spent by every HTTP request of the tenant (see
+    _TenantSession), since one job such as get_all_employees makes many of them.
+    on_wait is called with the number of seconds to wait for a token (time.sleep by default).
+    """
+
+    def __init__(self, name, max_concurrency, rate, on_wait=None):
+        self.name = name
+        self.on_wait = on_wait or time.sleep
+        self.client = None
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.tokens = float(max(1, rate or 1))
+        self.refilled = time.time()
+        self.jobs = deque()
+        self.active = 0
+        self.metrics = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'requests': 0,
+            'total_latency': 0.0,
+            'max_latency': 0.0,
+            'total_wait': 0.0,
+        }
+        self._bucket = threading.Lock()
+
+    def refill(self, now):
+        if self.rate:
+            self.tokens = min(float(max(1, self.rate)), self.tokens + (now - self.refilled) * self.rate)
+        self.refilled = now
+
+    def take(self):
+        """
+        Blocks until the tenant may send one more request, and spends its token.
+        """
+        while True:
+            with self._bucket:
+                self.refill(time.time())
+                if not self.rate or self.tokens >= 1:
+                    if self.rate:
+                        self.tokens -= 1
+                    self.metrics['requests'] += 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.on_wait(wait)
+
+    def can_run(self):
+        with self._bucket:
+            self.refill(time.time())
+            return self.jobs and self.active < self.max_concurrency and (not self.rate or self.tokens >= 1)
+
+
+class _TenantSession(object):
+    """
+    The session of a tenant's client: every request waits for the tenant's rate and is
+    then sent by the wrapped session. Anything else (mount, meters_calls...) is the
+    wrapped session's.
+    """
+
+    def __init__(self, tenant, session):
+        self.tenant = tenant
+        self.session = session
+
+    def request(self, method, url, *args, **kwargs):
+        self.tenant.take()
+        return self.session.request(method, url, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+class BambooClientPool(object):
+    """
+    Manages many tenants over shared transport resources.
+
+    Every tenant gets its own PyBambooHR instance (so credentials and cookies stay
+    separate) but all of them mount the same HTTPAdapter, so connections are pooled
+    together. Work is submitted per tenant and run by a shared set of worker threads
+    which pick tenants round robin, skipping those at their concurrency or rate cap.
+    A tenant with thousands of queued calls therefore only ever gets its fair turn.
+
+    The rate cap counts HTTP requests, not jobs: every request a tenant's client sends
+    waits for a token, and jobs of a tenant out of tokens are not started meanwhile.
+    A worker whose job waits for a token steps aside: another worker thread is started
+    so the other tenants keep max_workers threads, and the surplus thread retires once
+    it is idle again.
+
+    A tenant given its own session (a ResilientSession, a Cassette...) keeps it, wrapped
+    for the rate cap; only the sessions the pool creates use the shared connection pool.
+    """
+
+    def __init__(self, max_workers=16, pool_maxsize=64, max_concurrency=4, rate=None):
+        """
+        @param max_workers: Integer number of worker threads shared by all tenants.
+        @param pool_maxsize: Integer number of connections kept in the shared connection pool.
+        @param max_concurrency: Default integer cap of calls running at once for a tenant.
+        @param rate: Default cap of HTTP requests per second for a tenant (None for no cap).
+        """
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=pool_maxsize)
+
+        self._tenants = {}
+        self._order = []
+        self._cursor = 0
+        self._condition = threading.Condition()
+        self._workers = []
+        self._throttled = 0
+        self._shutdown = False
+        self._local = threading.local()
+
+    def add_tenant(self, name, subdomain, api_key, max_concurrency=None, rate=None, **kwargs):
+        """
+        Registers a tenant and creates its client.
+
+        @param name: String naming the tenant in submit() and metrics().
+        @param subdomain: String containing the company subdomain of the tenant.
+        @param api_key: String containing the API key of the tenant.
+        @param max_concurrency: Integer (optional) override of the pool's per-tenant concurrency cap.
+        @param rate: Number (optional) override of the pool's per-tenant requests per second cap.
+        @param kwargs: Any other PyBambooHR argument (underscore_keys, timeout, session...).
+        @return: The PyBambooHR instance of the tenant.
+        """
+        tenant = _Tenant(name, max_concurrency or self.max_concurrency, rate if rate is not None else self.rate,
+                         on_wait=self._wait_for_token)
+        session = kwargs.get('session')
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', self.adapter)
+            session.mount('http://', self.adapter)
+        kwargs['session'] = _TenantSession(tenant, session)
+        client = tenant.client = PyBambooHR(subdomain=subdomain, api_key=api_key, **kwargs)
+
+        with self._condition:
+            if name in self._tenants:
+                raise UserWarning("A tenant named {0} is already registered".format(name))
+            self._tenants[name] = tenant
+            self._order.append(name)
+        return client
+
+    def remove_tenant(self, name):
+        """
+        Unregisters a tenant. Calls already queued for it are cancelled.
+        """
+        with self._condition:
+            tenant = self._tenants.pop(name)
+            self._order.remove(name)
+            for future, _, _, _, _ in tenant.jobs:
+                future.cancel()
+
+    def client(self, name):
+        """
+        Returns the PyBambooHR instance of a tenant.
+        """
+        return self._tenants[name].client
+
+    def submit(self, name, method, *args, **kwargs):
+        """
+        Queues a call for a tenant.
+
+        @param name: String of the tenant name.
+        @param method: String naming a PyBambooHR method (e.g. 'get_employee'), or a callable
+        which is called with the tenant's client as its first argument.
+        @return: A concurrent.futures.Future with the result of the call.
+        """
+        future = Future()
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit to a pool which has been shut down")
+            tenant = self._tenants[name]
+            tenant.jobs.append((future, method, args, kwargs, time.time()))
+            tenant.metrics['submitted'] += 1
+            self._start_workers()
+            self._condition.notify()
+        return future
+
+    def map(self, name, method, iterable):
+        """
+        Submits method once per item of iterable for a tenant and returns the results in order.
+        """
+        futures = [self.submit(name, method, item) for item in iterable]
+        return [future.result() for future in futures]
+
+    def metrics(self, name=None):
+        """
+        Returns the metrics of one tenant, or a dictionary of the metrics of every tenant.
+        Each contains submitted, completed, failed, requests (HTTP requests sent), queued, active, average and max latency
+        and the average time calls waited in the queue (in seconds).
+        """
+        with self._condition:
+            if name is not None:
+                return self._tenant_metrics(self._tenants[name])
+            return dict((n, self._tenant_metrics(t)) for n, t in self._tenants.items())
+
+    def shutdown(self, wait=True):
+        """
+        Stops the workers once the queued calls are done.
+        """
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            for worker in list(self._workers):
+                worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def _tenant_metrics(self, tenant):
+        m = dict(tenant.metrics)
+        finished = m['completed'] + m['failed']
+        m['queued'] = len(tenant.jobs)
+        m['active'] = tenant.active
+        m['avg_latency'] = m['total_latency'] / finished if finished else 0.0
+        m['avg_wait'] = m['total_wait'] / finished if finished else 0.0
+        return m
+
+    def _start_workers(self):
+        # Workers waiting for a token do not count against max_workers.
+        while len(self._workers) - self._throttled < self.max_workers:
+            worker = threading.Thread(target=self._work, name='BambooClientPool-{0}'.format(len(self._workers)))
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def _wait_for_token(self, seconds):
+        if not getattr(self._local, 'worker', False):
+            time.sleep(seconds)
+            return
+        with self._condition:
+            self._throttled += 1
+            self._start_workers()
+        try:
+            time.sleep(seconds)
+        finally:
+            with self._condition:
+                self._throttled -= 1
+
+    def _next_job(self):
+        """
+        Picks the next runnable job, visiting tenants round robin. Must hold the condition.
+        Returns (tenant, job) or (None, seconds to wait before trying again).
+        """
+        wait = None
+        count = len(self._order)
+        for step in range(count):
+            index = (self._cursor + step) % count
+            tenant = self._tenants[self._order[index]]
+            if tenant.can_run():
+                self._cursor = (index + 1) % count
+                tenant.active += 1
+                return tenant, tenant.jobs.popleft()
+            if tenant.jobs and tenant.active < tenant.max_concurrency and tenant.rate:
+                until_token = (1 - tenant.tokens) / tenant.rate
+                wait = until_token if wait is None else min(wait, until_token)
+        return None, wait
+
+    def _work(self):
+        self._local.worker = True
+        while True:
+            with self._condition:
+                while True:
+                    if len(self._workers) - self._throttled > self.max_workers:
+                        # Started while another worker waited for a token, which is back now.
+                        self._workers.remove(threading.current_thread())
+                        return
+                    tenant, job = self._next_job()
+                    if tenant is not None:
+                        break
+                    if self._shutdown and not any(t.jobs for t in self._tenants.values()):
+                        return
+                    self._condition.wait(job)
+
+            future, method, args, kwargs, queued_at = job
+            started = time.time()
+            if future.set_running_or_notify_cancel():
+                try:
+                    if callable(method):
+                        result = method(tenant.client, *args, **kwargs)
+                    else:
+                        result = getattr(tenant.client, method)(*args, **kwargs)
+                except Exception as e:
+                    failed = True
+                    future.set_exception(e)
+                else:
+                    failed = False
+                    future.set_result(result)
+            else:
+                failed = None
+
+            latency = time.time() - started
+            with self._condition:
+                tenant.active -= 1
+                if failed is not None:
+                    tenant.metrics['failed' if failed else 'completed'] += 1
+                    tenant.metrics['total_latency'] += latency
+                    tenant.metrics['max_latency'] = max(tenant.metrics['max_latency'], latency)
+                    tenant.metrics['total_wait'] += started - queued_at
+                self._condition.notify_all()
@@ -0,0 +1,224 @@
+"""
+Secondary indexes and a small query API over cached employee records
+(e.g. PyBambooHR.employees after get_all_employees).
+"""
+
+import bisect
+import threading
+
+from . import utils
+
+
+# Sorts after any employee id, used to find the end of a run of equal dates.
+_MAX_ID = u'\uffff'
+
+
+def _date_key(value):
+    if not value or value == '0000-00-00':
+        return None
+    try:
+        return utils.resolve_date(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _date_criterion(value):
+    """
+    Returns the date of a filter value, raising UserWarning when it is not a date.
+    """
+    key = _date_key(value)
+    if key is None:
+        raise UserWarning("Date filter values must be a date, datetime or YYYY-MM-DD string, not {0!r}".format(value))
+    return key
+
+
+class EmployeeIndex(object):
+    """
+    Hash indexes on chosen fields and sorted indexes on date fields over a set of
+    employee records, so that filters like department='Sales' or hireDate__gte='2014-01-01'
+    do not scan every record.
+
+    Filters are passed as keyword arguments and combined with AND:
+
+        field=value                 equality (hash or date field)
+        field__in=[values]          any of the values (hash field)
+        field__gte / __gt / __lte / __lt=date   range on a date field
+        field__between=(start, end) inclusive range on a date field
+
+    Criteria on fields which are not indexed are checked record by record, but only
+    on the candidates left by the indexed criteria. Field names can be given in camelcase
+    or with underscores, whichever way the records are keyed.
+    """
+
+    def __init__(self, employees=None, hash_fields=('department', 'division', 'location', 'employmentHistoryStatus', 'status'),
+                 date_fields=('hireDate', 'terminationDate')):
+        """
+        @param employees: Dictionary (optional) of employee id to record to index straight away.
+        @param hash_fields: List of fields with a hash index.
+        @param date_fields: List of date fields with a sorted index.
+        """
+        self.hash_fields = [utils.underscore_to_camelcase(f) for f in hash_fields]
+        self.date_fields = [utils.underscore_to_camelcase(f) for f in date_fields]
+        self._lock = threading.RLock()
+        self.rebuild(employees or {})
+
+    def rebuild(self, employees):
+        """
+        Drops everything and indexes the given records.
+
+        @param employees: Dictionary of employee id to record.
+        """
+        with self._lock:
+            self._records = {}
+            self._hashes = dict((f, {}) for f in self.hash_fields)
+            self._dates = dict((f, []) for f in self.date_fields)
+            for employee_id, record in employees.items():
+                self._add(str(employee_id), record)
+
+    def upsert(self, employee_id, record):
+        """
+        Adds or replaces the record of an employee.
+        """
+        with self._lock:
+            self.remove(employee_id)
+            self._add(str(employee_id), record)
+
+    def update(self, employee_id, fields):
+        """
+        Merges changed fields into the record of an employee (adding it if unknown).
+        """
+        with self._lock:
+            record = dict(self._records.get(str(employee_id), {}))
+            record.update(fields)
+            self.upsert(employee_id, record)
+
+    def remove(self, employee_id):
+        """
+        Removes an employee from the index. Unknown ids are ignored.
+        """
+        employee_id = str(employee_id)
+        with self._lock:
+            record = self._records.pop(employee_id, None)
+            if record is None:
+                return
+            for field, index in self._hashes.items():
+                ids = index.get(self._value(record, field))
+                if ids is not None:
+                    ids.discard(employee_id)
+            for field, index in self._dates.items():
+                key = _date_key(self._value(record, field))
+                if key is not None:
+                    position = bisect.bisect_left(index, (key, employee_id))
+                    if position < len(index) and index[position] == (key, employee_id):
+                        del index[position]
+
+    def get(self, employee_id):
+        return self._records.get(str(employee_id))
+
+    def __len__(self):
+        return len(self._records)
+
+    def ids(self, **criteria):
+        """
+        Returns the set of employee ids matching every criterion.
+        """
+        with self._lock:
+            candidates = None
+            remaining = []
+            # Indexed criteria narrow the candidates down, the others are checked on what is left.
+            for name, value in criteria.items():
+                field, operator = self._split(name)
+                ids = self._lookup(field, operator, value)
+                if ids is None:
+                    remaining.append((field, operator, value))
+                    continue
+                candidates = ids if candidates is None else candidates & ids
+                if not candidates:
+                    return set()
+
+            if candidates is None:
+                candidates = set(self._records)
+            for field, operator, value in remaining:
+                candidates = set(i for i in candidates if self._matches(self._records[i], field, operator, value))
+            return candidates
+
+    def filter(self, **criteria):
+        """
+        Returns the list of records matching every criterion, sorted by employee id.
+        """
+        with self._lock:
+            return [self._records[i] for i in sorted(self.ids(**criteria), key=lambda i: (len(i), i))]
+
+    def _add(self, employee_id, record):
+        self._records[employee_id] = record
+        for field, index in self._hashes.items():
+            index.setdefault(self._value(record, field), set()).add(employee_id)
+        for field, index in self._dates.items():
+            key = _date_key(self._value(record, field))
+            if key is not None:
+                bisect.insort(index, (key, employee_id))
+
+    @staticmethod
+    def _value(record, field):
+        if field in record:
+            return record[field]
+        return record.get(utils.camelcase_to_underscore(field))
+
+    @staticmethod
+    def _split(name):
+        field, _, operator = name.partition('__')
+        return utils.underscore_to_camelcase(field), operator or 'eq'
+
+    def _lookup(self, field, operator, value):
+        if field in self._hashes:
+            index = self._hashes[field]
+            if operator == 'eq':
+                return set(index.get(value, ()))
+            if operator == 'in':
+                found = set()
+                for v in value:
+                    found |= index.get(v, set())
+                return found
+        if field in self._dates:
+            return self._date_range(self._dates[field], operator, value)
+        return None
+
+    def _date_range(self, index, operator, value):
+        if operator == 'between':
+            low, high = _date_criterion(value[0]), _date_criterion(value[1])
+            lo = bisect.bisect_left(index, (low,))
+            hi = bisect.bisect_right(index, (high, _MAX_ID))
+        else:
+            day = _date_criterion(value)
+            if operator == 'eq':
+                lo, hi = bisect.bisect_left(index, (day,)), bisect.bisect_right(index, (day, _MAX_ID))
+            elif operator == 'gte':
+                lo, hi = bisect.bisect_left(index, (day,)), len(index)
+            elif operator == 'gt':
+                lo, hi = bisect.bisect_right(index, (day, _MAX_ID)), len(index)
+            elif operator == 'lte':
+                lo, hi = 0, bisect.bisect_right(index, (day, _MAX_ID))
+            elif operator == 'lt':
+                lo, hi = 0, bisect.bisect_left(index, (day,))
+            else:
+                raise UserWarning("Unsupported date filter: {0}".format(operator))
+        return set(employee_id for _, employee_id in index[lo:hi])
+
+    def _matches(self, record, field, operator, value):
+        actual = self._value(record, field)
+        if operator == 'eq':
+            return actual == value
+        if operator == 'in':
+            return actual in value
+        if operator in ('gte', 'gt', 'lte', 'lt', 'between'):
+            if operator == 'between':
+                low, high = _date_criterion(value[0]), _date_criterion(value[1])
+            else:
+                bound = _date_criterion(value)
+            actual = _date_key(actual)
+            if actual is None:
+                return False
+            if operator == 'between':
+                return low <= actual <= high
+            return {'gte': actual >= bound, 'gt': actual > bound, 'lte': actual <= bound, 'lt': actual < bound}[operator]
+        raise UserWarning("Unsupported filter: {0}".format(operator))
@@ -0,0 +1,186 @@
+"""
+Accounting of the API calls made by a client: counts and bytes per endpoint, per-job
+scopes and hard call budgets.
+"""
+
+import threading
+
+from .resilience import endpoint_key
+
+
+class CallBudgetExceeded(UserWarning):
+    """
+    Raised instead of sending a request once a call budget is used up.
+    """
+
+
+class CallStats(object):
+    """
+    Counters of API calls: the number of calls and the bytes sent and received, in
+    total and per endpoint (see endpoint_key), with an optional limit on the number
+    of calls.
+
+    A call is counted when it is sent (whether it succeeds or not, since BambooHR
+    counts it either way) and its bytes once the response arrives.
+    """
+
+    def __init__(self, name=None, limit=None):
+        """
+        @param name: String (optional) naming the job the calls belong to.
+        @param limit: Integer (optional) number of calls after which further calls raise CallBudgetExceeded.
+        """
+        self.name = name
+        self.limit = limit
+        self.calls = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        """
+        Returns the number of calls left, or None when there is no limit.
+        """
+        if self.limit is None:
+            return None
+        with self._lock:
+            return max(0, self.limit - self.calls)
+
+    def start(self, key):
+        """
+        Counts a call to an endpoint about to be sent. Raises CallBudgetExceeded (without
+        counting it) when the limit is reached.
+        """
+        with self._lock:
+            if self.limit is not None and self.calls >= self.limit:
+                raise CallBudgetExceeded("The call budget{0} of {1} calls is used up".format(
+                    " of '{0}'".format(self.name) if self.name else '', self.limit))
+            self.calls += 1
+            self._endpoint(key)['calls'] += 1
+
+    def cancel(self, key):
+        """
+        Takes back a call counted by start which was not sent after all.
+        """
+        with self._lock:
+            self.calls -= 1
+            self._endpoint(key)['calls'] -= 1
+
+    def transferred(self, key, sent, received):
+        """
+        Adds the bytes of a call to an endpoint.
+        """
+        with self._lock:
+            self.bytes_sent += sent
+            self.bytes_received += received
+            endpoint = self._endpoint(key)
+            endpoint['bytes_sent'] += sent
+            endpoint['bytes_received'] += received
+
+    def reset(self):
+        with self._lock:
+            self.calls = self.bytes_sent = self.bytes_received = 0
+            self.endpoints = {}
+
+    def to_dict(self):
+        """
+        Returns the counters as a dictionary (e.g. to log at the end of a job).
+        """
+        with self._lock:
+            return {
+                'name': self.name,
+                'limit': self.limit,
+                'calls': self.calls,
+                'bytes_sent': self.bytes_sent,
+                'bytes_received': self.bytes_received,
+                'endpoints': dict((k, dict(v)) for k, v in self.endpoints.items()),
+            }
+
+    def __repr__(self):
+        return 'CallStats({0!r}, calls={1}, limit={2})'.format(self.name, self.calls, self.limit)
+
+    def _endpoint(self, key):
+        endpoint = self.endpoints.get(key)
+        if endpoint is None:
+            endpoint = self.endpoints[key] = {'calls': 0, 'bytes_sent': 0, 'bytes_received': 0}
+        return endpoint
+
+
+class CallMeter(object):
+    """
+    The accounting of the HTTP requests behind one PyBambooHR._request call. Sessions
+    which may send a call more than once (ResilientSession's hedged GETs) set meters_calls
+    and take it as the call_meter keyword: they call send() before every request they
+    actually send and received() with its response. For other sessions _request does it
+    for the one request.
+    """
+
+    def __init__(self, stats, method, url, sent=0):
+        """
+        @param stats: List of the CallStats to count in.
+        @param method: String of the HTTP method.
+        @param url: String of the full url.
+        @param sent: Number of bytes of the request body.
+        """
+        self.stats = stats
+        self.method = method
+        self.url = url
+        self.sent = sent
+        self.key = endpoint_key(method, url)
+
+    def send(self):
+        """
+        Counts a request about to be sent. Raises CallBudgetExceeded when a budget is used up.
+        """
+        start_calls(self.stats, self.method, self.url)
+
+    def cancel(self):
+        """
+        Takes back a request counted by send() which was not sent after all.
+        """
+        for s in self.stats:
+            s.cancel(self.key)
+
+    def received(self, response, stream=False):
+        """
+        Adds the bytes of a request and its response.
+        """
+        if stream:
+            size = int(response.headers.get('Content-Length') or 0)
+        else:
+            size = len(response.content or b'')
+        for s in self.stats:
+            s.transferred(self.key, self.sent, size)
+
+
+def start_calls(stats, method, url):
+    """
+    Counts a call in every CallStats of stats, or in none of them if one is out of budget.
+
+    @return: The endpoint key of the call.
+    """
+    key = endpoint_key(method, url)
+    started = []
+    try:
+        for s in stats:
+            s.start(key)
+            started.append(s)
+    except CallBudgetExceeded:
+        for s in started:
+            s.cancel(key)
+        raise
+    return key
+
+
+def body_size(body):
+    """
+    Returns the size in bytes of a request or response body, 0 when it is not known
+    (streamed files, generators).
+    """
+    if body is None:
+        return 0
+    if isinstance(body, bytes):
+        return len(body)
+    if isinstance(body, type(u'')):
+        return len(body.encode('utf-8'))
+    return 0
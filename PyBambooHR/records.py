@@ -0,0 +1,131 @@
+"""
+Lazy employee records which only translate key names and decode values of the fields
+which are actually read.
+"""
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # Python 2
+    from collections import MutableMapping
+
+from . import utils
+
+# Field names repeat across every record, so their translations are shared.
+_underscore_names = {}
+_camelcase_names = {}
+
+
+def _underscore(name):
+    try:
+        return _underscore_names[name]
+    except KeyError:
+        translated = _underscore_names[name] = utils.camelcase_to_underscore(name)
+        return translated
+
+
+def _camelcase(name):
+    try:
+        return _camelcase_names[name]
+    except KeyError:
+        translated = _camelcase_names[name] = utils.underscore_to_camelcase(name)
+        return translated
+
+
+class LazyRecord(MutableMapping):
+    """
+    A dictionary-like view of an employee record as returned by the API.
+
+    With underscore_keys the record is keyed like utils.underscore_keys would key it,
+    and with a RecordDecoder its values are typed, but nothing is translated or decoded
+    until a field is read. Results are cached on the record, so each field is converted
+    at most once. Fields can be read by their camelcase name as well.
+
+    It compares equal to the dictionary it stands for; to_dict() makes a real dictionary
+    (e.g. for json.dumps).
+    """
+
+    __slots__ = ('_raw', '_underscore', '_decoder', '_values', '_names')
+
+    def __init__(self, raw, underscore_keys=False, decoder=None):
+        """
+        @param raw: Dictionary of the record as returned by the API (camelcase keys).
+        @param underscore_keys: Boolean. True to key the record with underscores.
+        @param decoder: RecordDecoder (optional) used to type the values.
+        """
+        self._raw = raw
+        self._underscore = underscore_keys
+        self._decoder = decoder
+        self._values = {}
+        self._names = None
+
+    def __getitem__(self, key):
+        raw_key = self._raw_key(key)
+        try:
+            return self._values[raw_key]
+        except KeyError:
+            pass
+        value = self._raw[raw_key]
+        if isinstance(value, dict):
+            value = LazyRecord(value, self._underscore)
+        elif self._decoder is not None:
+            value = self._decoder.convert(raw_key, value)
+        self._values[raw_key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        raw_key = self._raw_key(key, missing=True)
+        if raw_key not in self._raw:
+            self._raw[raw_key] = None
+            if self._names is not None:
+                self._names[self._public_key(raw_key)] = raw_key
+        self._values[raw_key] = value
+
+    def __delitem__(self, key):
+        raw_key = self._raw_key(key)
+        del self._raw[raw_key]
+        self._values.pop(raw_key, None)
+        if self._names is not None:
+            self._names.pop(self._public_key(raw_key), None)
+
+    def __iter__(self):
+        return (self._public_key(k) for k in list(self._raw))
+
+    def __len__(self):
+        return len(self._raw)
+
+    def __contains__(self, key):
+        try:
+            self._raw_key(key)
+            return True
+        except KeyError:
+            return False
+
+    def __repr__(self):
+        return 'LazyRecord({0!r})'.format(self.to_dict())
+
+    def to_dict(self):
+        """
+        Returns the record as a plain dictionary, translating and decoding every field.
+        """
+        return dict((k, v.to_dict() if isinstance(v, LazyRecord) else v) for k, v in self.items())
+
+    def _public_key(self, raw_key):
+        return _underscore(raw_key) if self._underscore else raw_key
+
+    def _raw_key(self, key, missing=False):
+        if key in self._raw:
+            return key
+        if self._underscore:
+            candidate = _camelcase(key)
+            if candidate in self._raw:
+                return candidate
+            # Translations which do not round trip (e.g. 'address1' <-> 'address_1') need the full map.
+            if self._names is None:
+                self._names = dict((_underscore(k), k) for k in self._raw)
+            if key in self._names:
+                return self._names[key]
+            if missing:
+                return candidate
+        elif missing:
+            return key
+        raise KeyError(key)
@@ -0,0 +1,127 @@
+"""
+Helpers for custom reports: splitting wide field lists into several narrower reports,
+joining their results back together and keeping a report incrementally up to date.
+"""
+
+import datetime
+import hashlib
+import threading
+
+
+def split_fields(field_list, chunk_width):
+    """
+    Splits a list of report fields into chunks of at most chunk_width fields.
+    Every chunk also asks for 'id' so the results can be joined afterwards.
+
+    @param field_list: List of report fields.
+    @param chunk_width: Integer maximum number of fields per chunk (not counting 'id').
+    @return: List of lists of fields.
+    """
+    if chunk_width < 1:
+        raise UserWarning("chunk_width must be at least 1")
+
+    fields = []
+    for field in field_list:
+        if field != 'id' and field not in fields:
+            fields.append(field)
+
+    chunks = [['id'] + fields[i:i + chunk_width] for i in range(0, len(fields), chunk_width)]
+    return chunks or [['id']]
+
+
+def merge_reports(reports, title=None):
+    """
+    Joins JSON custom reports covering different fields for the same employees into one
+    report, with one record per employee id.
+
+    @param reports: List of JSON report results (dictionaries with 'fields' and 'employees').
+    @param title: String (optional) title of the merged report. Defaults to the first report's title.
+    @return: Dictionary shaped like a JSON custom report.
+    """
+    fields = []
+    seen_fields = set()
+    employees = {}
+    order = []
+    for report in reports:
+        for field in report.get('fields', []):
+            if field.get('id') not in seen_fields:
+                seen_fields.add(field.get('id'))
+                fields.append(field)
+        for record in report.get('employees', []):
+            employee_id = str(record.get('id'))
+            if employee_id not in employees:
+                employees[employee_id] = {}
+                order.append(employee_id)
+            employees[employee_id].update(record)
+
+    if title is None:
+        title = reports[0].get('title') if reports else None
+    return {'title': title, 'fields': fields, 'employees': [employees[i] for i in order]}
+
+
+def field_set_key(field_list):
+    """
+    Returns a stable hash of a set of report fields (order and duplicates do not matter).
+    """
+    return hashlib.sha1(','.join(sorted(set(field_list))).encode('utf-8')).hexdigest()
+
+
+class IncrementalReport(object):
+    """
+    A locally cached custom report which is kept up to date with the lastChanged filter.
+
+    The first refresh() downloads the full report. Later calls only ask for rows of
+    employees changed since the previous fetch and merge them in. Every
+    reconcile_interval seconds the full report is downloaded again instead, which is
+    how employees deleted in BambooHR disappear from the cache.
+    """
+
+    def __init__(self, client, field_list, reconcile_interval=24 * 60 * 60, title="My Custom Report"):
+        """
+        @param client: PyBambooHR instance used to request the report.
+        @param field_list: List of report fields.
+        @param reconcile_interval: Number of seconds between full downloads.
+        @param title: String title of the report.
+        """
+        self.client = client
+        self.fields = split_fields(field_list, max(1, len(field_list)))[0]
+        self.key = field_set_key(self.fields)
+        self.reconcile_interval = reconcile_interval
+        self.title = title
+
+        self.employees = {}
+        self.report_fields = []
+        self.last_fetched = None
+        self.last_reconciled = None
+        self._lock = threading.Lock()
+
+    def refresh(self, full=False):
+        """
+        Brings the cache up to date and returns a copy of it.
+
+        @param full: Boolean. True to force a full download.
+        @return: Dictionary of employee id to record (a copy, later refreshes do not change it).
+        """
+        with self._lock:
+            now = datetime.datetime.utcnow()
+            full = full or self.last_reconciled is None or \
+                (now - self.last_reconciled).total_seconds() >= self.reconcile_interval
+
+            # Ask for changes since just before the previous request went out, so nothing
+            # changed while it was running is missed.
+            result = self.client.request_custom_report(
+                self.fields, report_format='json', title=self.title,
+                last_changed=None if full else self.last_fetched, cached=False)
+
+            rows = dict((str(r.get('id')), r) for r in result.get('employees', []))
+            if full:
+                self.employees = rows
+                self.last_reconciled = now
+            else:
+                self.employees.update(rows)
+            self.report_fields = result.get('fields', self.report_fields)
+            self.last_fetched = now
+            return dict(self.employees)
+
+    def __len__(self):
+        return len(self.employees)
@@ -0,0 +1,272 @@
+"""
+Per-endpoint circuit breaking and hedged GET requests, applied at the session boundary.
+"""
+
+import re
+import threading
+import time
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:  # Python 2
+    from urlparse import urlsplit
+
+_id_segment_regex = re.compile(r'/\d+(?=/|$)')
+
+
+def endpoint_key(method, url):
+    """
+    Returns the endpoint a request belongs to, with employee, row and file ids replaced,
+    e.g. 'GET /api/gateway.php/acme/v1/employees/{id}'.
+    """
+    return '{0} {1}'.format(method.upper(), _id_segment_regex.sub('/{id}', urlsplit(url).path))
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """
+    Raised instead of sending a request to an endpoint whose circuit is open.
+    """
+
+
+class _Circuit(object):
+    """
+    State of one endpoint: its recent outcomes, latencies and breaker state.
+    """
+
+    def __init__(self, window):
+        self.state = 'closed'
+        self.outcomes = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+        self.opened = None
+        self.trials = 0
+
+
+class ResilientSession(object):
+    """
+    A requests.Session stand-in which stops calling endpoints that are failing, and
+    optionally hedges slow GETs. Pass it as the session of a PyBambooHR instance:
+
+        session = ResilientSession(hedge=True)
+        bamboo = PyBambooHR(subdomain='yoursub', api_key='yourapikeyhere', session=session)
+
+    Circuit breaker: the last window calls of every endpoint (see endpoint_key) are kept.
+    Once there are at least min_calls of them and the share of failed calls (connection
+    errors, timeouts, 429 and 5xx responses) reaches error_rate, or the share of calls
+    slower than slow_call seconds reaches slow_rate, the circuit opens: calls fail at once
+    with CircuitOpenError for reset_timeout seconds. Then it is half open: up to
+    half_open_calls trial calls go through, and the circuit closes again if they succeed
+    or reopens if one fails.
+
+    Hedging: a GET which has not answered after the hedge_quantile (p95 by default) of
+    the endpoint's recent latencies is sent a second time, and whichever answers first
+    is returned. Until an endpoint has min_calls latencies, hedge_delay seconds is used.
+    Only methods in hedge_methods are hedged, since the request may reach BambooHR twice.
+    Both requests are counted by the client's call accounting, and no second request is
+    sent when a call budget is used up.
+
+    Hedged GETs run on max_workers threads and their duplicates on a separate pool of
+    max_hedges threads, so duplicates never queue behind first requests. When either
+    pool is busy the request is sent without a hedge rather than waiting for a thread.
+    """
+
+    # PyBambooHR passes a CallMeter, and every request actually sent is counted with it.
+    meters_calls = True
+
+    def __init__(self, session=None, window=20, min_calls=10, error_rate=0.5, slow_call=None, slow_rate=0.5,
+                 reset_timeout=30, half_open_calls=1, hedge=False, hedge_quantile=0.95, hedge_delay=1.0,
+                 hedge_methods=('GET',), max_workers=32, max_hedges=8):
+        """
+        @param session: requests.Session (optional) used to make the calls.
+        @param window: Integer number of recent calls per endpoint the decisions are based on.
+        @param min_calls: Integer number of calls needed before the circuit can open or hedging uses measured latencies.
+        @param error_rate: Share (0-1) of failed calls which opens the circuit.
+        @param slow_call: Number of seconds (optional) above which a call counts as slow.
+        @param slow_rate: Share (0-1) of slow calls which opens the circuit.
+        @param reset_timeout: Number of seconds the circuit stays open.
+        @param half_open_calls: Integer number of trial calls let through when half open.
+        @param hedge: Boolean. True to hedge requests of hedge_methods.
+        @param hedge_quantile: Quantile (0-1) of the endpoint's latencies after which the second request is sent.
+        @param hedge_delay: Number of seconds to wait before hedging while there are too few latencies.
+        @param hedge_methods: Tuple of the HTTP methods which may be hedged.
+        @param max_workers: Integer number of hedgeable requests sent at once through the hedging threads.
+        @param max_hedges: Integer number of duplicate requests in flight at once.
+        """
+        self.session = session or requests.Session()
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_delay = hedge_delay
+        self.hedge_methods = tuple(m.upper() for m in hedge_methods)
+
+        self._circuits = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers) if hedge else None
+        self._hedge_executor = ThreadPoolExecutor(max_workers=max_hedges) if hedge else None
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._hedge_slots = threading.BoundedSemaphore(max_hedges)
+
+    def request(self, method, url, call_meter=None, **kwargs):
+        """
+        Same signature as requests.Session.request, plus the CallMeter (optional) of the call.
+        """
+        key = endpoint_key(method, url)
+        if call_meter is not None:
+            call_meter.send()
+        try:
+            self._before(key)
+        except CircuitOpenError:
+            if call_meter is not None:
+                call_meter.cancel()
+            raise
+
+        started = time.time()
+        try:
+            if self.hedge and method.upper() in self.hedge_methods:
+                r = self._hedged(key, call_meter, method, url, **kwargs)
+            else:
+                r = self._send(call_meter, method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            self._after(key, False, time.time() - started)
+            raise
+
+        self._after(key, r.status_code < 500 and r.status_code != 429, time.time() - started)
+        return r
+
+    def state(self, method, url):
+        """
+        Returns the circuit state ('closed', 'open' or 'half-open') of the endpoint of a request.
+        """
+        with self._lock:
+            circuit = self._circuits.get(endpoint_key(method, url))
+            if circuit is None:
+                return 'closed'
+            self._refresh(circuit)
+            return circuit.state
+
+    def reset(self):
+        """
+        Closes every circuit and forgets all recorded calls.
+        """
+        with self._lock:
+            self._circuits = {}
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._hedge_executor.shutdown(wait=False)
+        self.session.close()
+
+    def _circuit(self, key):
+        circuit = self._circuits.get(key)
+        if circuit is None:
+            circuit = self._circuits[key] = _Circuit(self.window)
+        return circuit
+
+    def _refresh(self, circuit):
+        if circuit.state == 'open' and time.time() - circuit.opened >= self.reset_timeout:
+            circuit.state = 'half-open'
+            circuit.trials = 0
+
+    def _before(self, key):
+        with self._lock:
+            circuit = self._circuit(key)
+            self._refresh(circuit)
+            if circuit.state == 'closed':
+                return
+            if circuit.state == 'half-open' and circuit.trials < self.half_open_calls:
+                circuit.trials += 1
+                return
+        raise CircuitOpenError("The circuit of {0} is open".format(key))
+
+    def _after(self, key, success, latency):
+        slow = self.slow_call is not None and latency > self.slow_call
+        with self._lock:
+            circuit = self._circuit(key)
+            if success:
+                circuit.latencies.append(latency)
+
+            if circuit.state == 'half-open':
+                if success and not slow:
+                    circuit.state = 'closed'
+                    circuit.outcomes.clear()
+                else:
+                    self._open(circuit)
+                return
+
+            circuit.outcomes.append((success, slow))
+            calls = len(circuit.outcomes)
+            if calls >= self.min_calls:
+                failed = sum(1 for s, _ in circuit.outcomes if not s)
+                slowed = sum(1 for _, s in circuit.outcomes if s)
+                if failed >= self.error_rate * calls or (self.slow_call is not None and slowed >= self.slow_rate * calls):
+                    self._open(circuit)
+
+    @staticmethod
+    def _open(circuit):
+        circuit.state = 'open'
+        circuit.opened = time.time()
+        circuit.outcomes.clear()
+
+    def _delay(self, key):
+        with self._lock:
+            latencies = sorted(self._circuit(key).latencies)
+        if len(latencies) < self.min_calls:
+            return self.hedge_delay
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.hedge_quantile))]
+
+    def _send(self, call_meter, method, url, **kwargs):
+        r = self.session.request(method, url, **kwargs)
+        if call_meter is not None:
+            call_meter.received(r, kwargs.get('stream'))
+        return r
+
+    def _hedged(self, key, call_meter, method, url, **kwargs):
+        if not self._slots.acquire(False):
+            # Every hedging thread is busy: send it on this thread, without a hedge.
+            return self._send(call_meter, method, url, **kwargs)
+        first = self._executor.submit(self._send, call_meter, method, url, **kwargs)
+        first.add_done_callback(lambda f: self._slots.release())
+        done, _ = wait([first], timeout=self._delay(key))
+        if done:
+            return first.result()
+
+        if not self._hedge_slots.acquire(False):
+            # Too many duplicates in flight already: wait for the first request.
+            return first.result()
+        if call_meter is not None:
+            from .quota import CallBudgetExceeded  # quota imports this module
+            try:
+                call_meter.send()
+            except CallBudgetExceeded:
+                # No budget for a duplicate: wait for the first request.
+                self._hedge_slots.release()
+                return first.result()
+        second = self._hedge_executor.submit(self._send, call_meter, method, url, **kwargs)
+        second.add_done_callback(lambda f: self._hedge_slots.release())
+        pending = set([first, second])
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winners = [f for f in done if f.exception() is None]
+            if winners:
+                for loser in winners[1:] + list(pending):
+                    loser.add_done_callback(_close_response)
+                return winners[0].result()
+            error = list(done)[0].exception()
+        raise error
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
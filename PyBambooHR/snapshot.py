@@ -0,0 +1,267 @@
+"""
+A binary, memory-mapped snapshot format for a set of employee records.
+"""
+
+import bisect
+import json
+import mmap
+import os
+import struct
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
+
+from . import utils
+
+MAGIC = b'PBHRSNAP'
+VERSION = 1
+
+# magic, version, field count, record count, string count, then the offsets of the
+# field names, record keys, key index, record slots and string table.
+_HEADER = struct.Struct('<8sIIIIQQQQQ')
+_MISSING = 0xFFFFFFFF
+
+# Strings are stored with a one byte tag: text as UTF-8, bytes which are not UTF-8 as
+# is, anything else as JSON.
+_TEXT = b's'
+_BYTES = b'b'
+_JSON = b'j'
+
+
+def _encode(value):
+    if isinstance(value, type(u'')):
+        return _TEXT + value.encode('utf-8')
+    if isinstance(value, bytes):  # Python 2 str too
+        try:
+            value.decode('utf-8')
+        except UnicodeDecodeError:
+            return _BYTES + value
+        return _TEXT + value
+    return _JSON + json.dumps(value, sort_keys=True, default=str).encode('utf-8')
+
+
+class Snapshot(Mapping):
+    """
+    A read-only mapping of employee id to record backed by a snapshot file, opened with
+    mmap so every process reading the same file shares its pages, and opening it costs
+    the same for 10 or 100k employees:
+
+        Snapshot.write('/var/cache/myapp/employees.snap', bamboo.get_all_employees())
+        ...
+        employees = Snapshot('/var/cache/myapp/employees.snap')
+        employees['123']['department']
+
+    The file holds a table of the distinct strings (each department, location or date is
+    stored once), the list of field names, and for every record a fixed size slot with
+    the string number of each field. Records are found by binary search over their ids
+    and are SnapshotRecord views which decode a field each time it is read.
+
+    Text values come back as text, as do bytes which are UTF-8 (other bytes come back
+    as bytes); numbers, booleans, None and nested values come back
+    as their JSON round trip (dates become strings).
+    """
+
+    def __init__(self, path):
+        """
+        @param path: String of the snapshot file.
+        """
+        self.path = path
+        with open(path, 'rb') as handle:
+            if os.fstat(handle.fileno()).st_size < _HEADER.size:
+                raise UserWarning("{0} is not an employee snapshot".format(path))
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = _HEADER.unpack_from(self._map, 0)
+        if header[0] != MAGIC or header[1] != VERSION:
+            self._map.close()
+            raise UserWarning("{0} is not a version {1} employee snapshot".format(path, VERSION))
+        (_, _, self._field_count, self._record_count, self._string_count,
+         fields_offset, self._keys_offset, self._index_offset, self._records_offset, self._strings_offset) = header
+
+        self._blob_offset = self._strings_offset + 8 * (self._string_count + 1)
+        try:
+            self._check_sections(fields_offset)
+            self.fields = [self._string(sid) for sid in struct.unpack_from('<{0}I'.format(self._field_count), self._map, fields_offset)]
+        except (struct.error, ValueError):
+            # ValueError also covers text which is not UTF-8.
+            self._map.close()
+            raise UserWarning("{0} is a truncated or damaged employee snapshot".format(path))
+        self._columns = dict((name, column) for column, name in enumerate(self.fields))
+        self._slot = struct.Struct('<{0}I'.format(self._field_count))
+        self._sorted_keys = _SortedKeys(self)
+
+    @staticmethod
+    def write(path, employees):
+        """
+        Writes a snapshot of a set of employee records (atomically replacing path).
+
+        @param path: String of the snapshot file.
+        @param employees: Dictionary of employee id to record.
+        """
+        strings = {}
+        blobs = []
+
+        def sid(value):
+            data = _encode(value)
+            number = strings.get(data)
+            if number is None:
+                number = strings[data] = len(blobs)
+                blobs.append(data)
+            return number
+
+        fields = sorted(set(field for record in employees.values() for field in record))
+        columns = dict((name, column) for column, name in enumerate(fields))
+        keys = [str(k) for k in employees]
+        field_ids = [sid(name) for name in fields]
+        key_ids = [sid(k) for k in keys]
+        index = sorted(range(len(keys)), key=lambda i: keys[i])
+
+        slots = []
+        for record in employees.values():
+            slot = [_MISSING] * len(fields)
+            for name, value in record.items():
+                slot[columns[name]] = sid(value)
+            slots.extend(slot)
+
+        offsets, position = [], 0
+        for data in blobs:
+            offsets.append(position)
+            position += len(data)
+        offsets.append(position)
+
+        fields_offset = _HEADER.size
+        keys_offset = fields_offset + 4 * len(fields)
+        index_offset = keys_offset + 4 * len(keys)
+        records_offset = index_offset + 4 * len(keys)
+        strings_offset = records_offset + 4 * len(slots)
+
+        parts = [
+            _HEADER.pack(MAGIC, VERSION, len(fields), len(keys), len(blobs),
+                         fields_offset, keys_offset, index_offset, records_offset, strings_offset),
+            struct.pack('<{0}I'.format(len(field_ids)), *field_ids),
+            struct.pack('<{0}I'.format(len(key_ids)), *key_ids),
+            struct.pack('<{0}I'.format(len(index)), *index),
+            struct.pack('<{0}I'.format(len(slots)), *slots),
+            struct.pack('<{0}Q'.format(len(offsets)), *offsets),
+        ]
+        parts.extend(blobs)
+        utils.atomic_write(path, b''.join(parts))
+
+    def __getitem__(self, employee_id):
+        employee_id = str(employee_id)
+        position = bisect.bisect_left(self._sorted_keys, employee_id)
+        if position < self._record_count and self._sorted_keys[position] == employee_id:
+            return SnapshotRecord(self, self._index(position))
+        raise KeyError(employee_id)
+
+    def __iter__(self):
+        for record in range(self._record_count):
+            yield self._key(record)
+
+    def __len__(self):
+        return self._record_count
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _check_sections(self, fields_offset):
+        # Every section has to lie within the file, so a truncated file fails here and
+        # not on some later read.
+        size = len(self._map)
+        sections = [
+            (fields_offset, 4 * self._field_count),
+            (self._keys_offset, 4 * self._record_count),
+            (self._index_offset, 4 * self._record_count),
+            (self._records_offset, 4 * self._field_count * self._record_count),
+            (self._strings_offset, 8 * (self._string_count + 1)),
+        ]
+        for offset, length in sections:
+            if offset < _HEADER.size or offset + length > size:
+                raise ValueError('section out of bounds')
+        end = struct.unpack_from('<Q', self._map, self._strings_offset + 8 * self._string_count)[0]
+        if self._blob_offset + end > size:
+            raise ValueError('strings out of bounds')
+
+    def _index(self, position):
+        return struct.unpack_from('<I', self._map, self._index_offset + 4 * position)[0]
+
+    def _key(self, record):
+        return self._string(struct.unpack_from('<I', self._map, self._keys_offset + 4 * record)[0])
+
+    def _slot_values(self, record):
+        return self._slot.unpack_from(self._map, self._records_offset + self._slot.size * record)
+
+    def _value(self, record, column):
+        return struct.unpack_from('<I', self._map, self._records_offset + self._slot.size * record + 4 * column)[0]
+
+    def _raw(self, sid):
+        start, end = struct.unpack_from('<QQ', self._map, self._strings_offset + 8 * sid)
+        return self._map[self._blob_offset + start:self._blob_offset + end]
+
+    def _string(self, sid):
+        return self._raw(sid)[1:].decode('utf-8')
+
+    def _decode(self, sid):
+        data = self._raw(sid)
+        if data[:1] == _TEXT:
+            return data[1:].decode('utf-8')
+        if data[:1] == _BYTES:
+            return bytes(data[1:])
+        return json.loads(data[1:].decode('utf-8'))
+
+
+class _SortedKeys(object):
+    """
+    The record keys in sorted order, read from the key index on access (for bisect).
+    """
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+
+    def __getitem__(self, position):
+        return self._snapshot._key(self._snapshot._index(position))
+
+    def __len__(self):
+        return self._snapshot._record_count
+
+
+class SnapshotRecord(Mapping):
+    """
+    A read-only view of one record of a Snapshot. Fields are decoded when read.
+    """
+
+    __slots__ = ('_snapshot', '_record')
+
+    def __init__(self, snapshot, record):
+        self._snapshot = snapshot
+        self._record = record
+
+    def __getitem__(self, field):
+        column = self._snapshot._columns.get(field)
+        if column is None:
+            raise KeyError(field)
+        sid = self._snapshot._value(self._record, column)
+        if sid == _MISSING:
+            raise KeyError(field)
+        return self._snapshot._decode(sid)
+
+    def __iter__(self):
+        fields = self._snapshot.fields
+        return iter([fields[c] for c, sid in enumerate(self._snapshot._slot_values(self._record)) if sid != _MISSING])
+
+    def __len__(self):
+        return sum(1 for sid in self._snapshot._slot_values(self._record) if sid != _MISSING)
+
+    def __repr__(self):
+        return 'SnapshotRecord({0!r})'.format(self.to_dict())
+
+    def to_dict(self):
+        return dict(self.items())
@@ -0,0 +1,186 @@
+"""
+A local mirror of employee tables (jobInfo, compensation...) kept current with the
+changed tables endpoint.
+"""
+
+import datetime
+import json
+import os
+import threading
+
+from . import utils
+from .changes import parse_timestamp
+
+
+def changed_table_rows(data):
+    """
+    Normalizes a get_employee_changed_table response into a dictionary of employee id to
+    a dictionary with 'lastChanged' and 'rows' keys. Row ids, when present, are moved to
+    'row_id' as in get_tabular_data.
+    """
+    changed = {}
+    for employee_id, change in ((data or {}).get('employees') or {}).items():
+        rows = []
+        for row in change.get('rows') or []:
+            row = dict(row)
+            if 'id' in row:
+                row['row_id'] = str(row.pop('id'))
+            rows.append(row)
+        changed[str(employee_id)] = {'lastChanged': change.get('lastChanged'), 'rows': rows}
+    return changed
+
+
+class TableMirror(object):
+    """
+    Local copies of employee tables:
+
+        mirror = TableMirror(bamboo, ['jobInfo', 'compensation'], state_path='/var/lib/myapp/tables.json')
+        mirror.sync()
+        mirror.rows('jobInfo', '123')
+
+    The first sync() of a table downloads it whole with get_tabular_data. Later syncs
+    ask get_employee_changed_table for the employees whose rows changed since the table's
+    checkpoint and replace their rows. Rows are kept per employee keyed by row_id; rows
+    of a change which come without an id take over the row_id of a known row with the
+    same date (each known row at most once). The checkpoint only moves forward once the changes are applied, and applying
+    the same change twice is harmless.
+
+    With state_path the rows and checkpoints are saved after every sync and loaded when
+    the mirror is created, so a restarted process picks up from where it stopped.
+    """
+
+    def __init__(self, client, tables, state_path=None):
+        """
+        @param client: PyBambooHR instance used to fetch the tables.
+        @param tables: List of table names.
+        @param state_path: String (optional) path of the JSON file the mirror is saved in.
+        """
+        self.client = client
+        self.tables = list(tables)
+        self.state_path = state_path
+
+        self._rows = dict((table, {}) for table in self.tables)
+        self._since = dict((table, None) for table in self.tables)
+        self._lock = threading.Lock()
+        self._load_state()
+
+    def sync(self, full=False):
+        """
+        Brings every table up to date.
+
+        @param full: Boolean. True to download every table whole again.
+        @return: Dictionary of table name to the list of employee ids whose rows changed.
+        """
+        changed = {}
+        for table in self.tables:
+            changed[table] = self.sync_table(table, full=full)
+        self._save_state()
+        return changed
+
+    def sync_table(self, table, full=False):
+        """
+        Brings one table up to date (without saving the state).
+
+        @return: List of the employee ids whose rows changed.
+        """
+        started = datetime.datetime.utcnow().replace(microsecond=0)
+        since = self._since[table]
+        if full or since is None:
+            data = self.client.get_tabular_data(table)
+            rows = dict((str(k), self._keyed(v, {})) for k, v in data.items())
+            with self._lock:
+                self._rows[table] = rows
+                self._since[table] = started
+            return sorted(rows)
+
+        data = self.client.get_employee_changed_table(table_name=table, since=since)
+        changes = changed_table_rows(data)
+        stamps = [parse_timestamp(c['lastChanged']) for c in changes.values() if c.get('lastChanged')]
+        if (data or {}).get('latest'):
+            stamps.append(parse_timestamp(data['latest']))
+        with self._lock:
+            current = self._rows[table]
+            for employee_id, change in changes.items():
+                current[employee_id] = self._keyed(change['rows'], current.get(employee_id, {}))
+            if stamps and max(stamps) > since:
+                self._since[table] = max(stamps)
+        return sorted(changes)
+
+    def since(self, table):
+        """
+        Returns the checkpoint (naive UTC datetime) of a table, None before its first sync.
+        """
+        return self._since[table]
+
+    def rows(self, table, employee_id):
+        """
+        Returns the rows of an employee in a table, sorted by date (copies).
+        """
+        with self._lock:
+            rows = [dict(r) for r in self._rows[table].get(str(employee_id), {}).values()]
+        return sorted(rows, key=lambda r: r.get('date') or '')
+
+    def row(self, table, employee_id, row_id):
+        """
+        Returns one row of an employee (a copy), or None.
+        """
+        with self._lock:
+            row = self._rows[table].get(str(employee_id), {}).get(str(row_id))
+        return dict(row) if row is not None else None
+
+    def current(self, table, employee_id, on=None):
+        """
+        Returns the row in effect for an employee on a date (today by default): the
+        latest row whose date is not after it. None if there is none.
+        """
+        on = utils.resolve_date_argument(on or datetime.date.today())
+        effective = [r for r in self.rows(table, employee_id) if (r.get('date') or '') <= on]
+        return effective[-1] if effective else None
+
+    def table(self, table):
+        """
+        Returns the whole table, shaped like get_tabular_data: employee id to list of rows.
+        """
+        with self._lock:
+            employees = list(self._rows[table])
+        return dict((employee_id, self.rows(table, employee_id)) for employee_id in employees)
+
+    @staticmethod
+    def _keyed(rows, previous):
+        # Row ids of the known rows per date, each handed to at most one row without an id.
+        by_date = {}
+        for row_id in sorted(previous):
+            if previous[row_id].get('date'):
+                by_date.setdefault(previous[row_id]['date'], []).append(row_id)
+        taken = set(r['row_id'] for r in rows if r.get('row_id'))
+
+        keyed = {}
+        for position, row in enumerate(rows):
+            row = dict(row)
+            row_id = row.get('row_id')
+            if not row_id:
+                free = [i for i in by_date.get(row.get('date'), []) if i not in taken and i not in keyed]
+                row_id = free[0] if free else 'date:{0}:{1}'.format(row.get('date'), position)
+            row['row_id'] = str(row_id)
+            keyed[row['row_id']] = row
+        return keyed
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        with open(self.state_path, 'rb') as handle:
+            saved = json.loads(handle.read().decode('utf-8'))
+        for table, state in saved.items():
+            if table in self._rows and state.get('since'):
+                self._since[table] = parse_timestamp(state['since'])
+                self._rows[table] = state['rows']
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        with self._lock:
+            saved = dict((table, {'since': self._since[table].strftime('%Y-%m-%dT%H:%M:%S+00:00') if self._since[table] else None,
+                                  'rows': self._rows[table]})
+                         for table in self.tables)
+            data = json.dumps(saved, sort_keys=True).encode('utf-8')
+        utils.atomic_write(self.state_path, data)
@@ -0,0 +1,244 @@
+"""
+Local indexes and caches over BambooHR time off data so that repeated date queries
+do not have to scan (or re-download) the results of get_whos_out and get_time_off_requests.
+"""
+
+import bisect
+import threading
+
+from . import utils
+
+
+class _IntervalNode(object):
+    """
+    A node of a centered interval tree. Every interval stored in the node contains
+    the node's center; intervals entirely to the left or right live in the children.
+    """
+
+    def __init__(self, intervals):
+        points = sorted([i[0] for i in intervals] + [i[1] for i in intervals])
+        self.center = points[len(points) // 2]
+
+        here, left, right = [], [], []
+        for interval in intervals:
+            if interval[1] < self.center:
+                left.append(interval)
+            elif interval[0] > self.center:
+                right.append(interval)
+            else:
+                here.append(interval)
+
+        self.by_start = sorted(here, key=lambda i: i[0])
+        self.by_end = sorted(here, key=lambda i: i[1], reverse=True)
+        self.left = _IntervalNode(left) if left else None
+        self.right = _IntervalNode(right) if right else None
+
+    def stab(self, point, found):
+        """
+        Appends every interval containing point to found.
+        """
+        node = self
+        while node is not None:
+            if point < node.center:
+                for interval in node.by_start:
+                    if interval[0] > point:
+                        break
+                    found.append(interval)
+                node = node.left
+            elif point > node.center:
+                for interval in node.by_end:
+                    if interval[1] < point:
+                        break
+                    found.append(interval)
+                node = node.right
+            else:
+                found.extend(node.by_start)
+                break
+        return found
+
+
+class WhosOutIndex(object):
+    """
+    An interval index over the entries returned by PyBambooHR.get_whos_out.
+
+    Date and range lookups cost O(log n + k) and per-employee lookups only look at that
+    employee's entries. When created with a client, any date window which has not been
+    loaded yet is fetched (only the missing part of it) the first time it is queried.
+    """
+
+    def __init__(self, client=None, entries=None, start_date=None, end_date=None):
+        """
+        @param client: PyBambooHR instance used to fetch windows which are not covered yet.
+        @param entries: Optional list of who's out entries to load straight away.
+        @param start_date: First day covered by entries (date, datetime or YYYY-MM-DD string).
+        @param end_date: Last day covered by entries (date, datetime or YYYY-MM-DD string).
+        """
+        self.client = client
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._covered = []
+        self._state = (None, [], [], {})
+
+        if entries is not None:
+            self.load(entries, start_date, end_date)
+
+    def load(self, entries, start_date=None, end_date=None):
+        """
+        Adds who's out entries to the index. Entries are deduplicated by their id.
+
+        @param entries: List of who's out dictionaries (each with at least 'start' and 'end').
+        @param start_date: Optional first day of the window the entries were fetched for.
+        @param end_date: Optional last day of the window the entries were fetched for.
+        """
+        with self._lock:
+            for entry in entries:
+                key = entry.get('id')
+                if key is None:
+                    key = (entry.get('type'), entry.get('employeeId'), entry.get('start'), entry.get('end'))
+                self._entries[key] = (utils.resolve_date(entry['start']), utils.resolve_date(entry['end']), entry)
+
+            if start_date is not None and end_date is not None:
+                window = (utils.resolve_date(start_date), utils.resolve_date(end_date))
+                self._covered = utils.merge_date_ranges(self._covered + [window])
+
+            self._rebuild()
+
+    def ensure(self, start_date, end_date):
+        """
+        Makes sure every day from start_date to end_date is loaded, fetching only the
+        parts of the window which have not been fetched before.
+        """
+        start = utils.resolve_date(start_date)
+        end = utils.resolve_date(end_date)
+        if self.client is None or not utils.missing_date_ranges(self._covered, start, end):
+            return
+
+        with self._lock:
+            for missing_start, missing_end in utils.missing_date_ranges(self._covered, start, end):
+                entries = self.client.get_whos_out(missing_start, missing_end)
+                self.load(entries, missing_start, missing_end)
+
+    def on(self, date):
+        """
+        Returns the list of entries (time off and holidays) which include the given date.
+        """
+        day = utils.resolve_date(date)
+        self.ensure(day, day)
+        tree = self._state[0]
+        if tree is None:
+            return []
+        return [interval[2] for interval in tree.stab(day, [])]
+
+    def between(self, start_date, end_date):
+        """
+        Returns the list of entries which overlap the inclusive range start_date to end_date.
+        """
+        start = utils.resolve_date(start_date)
+        end = utils.resolve_date(end_date)
+        self.ensure(start, end)
+
+        tree, starts, by_start, _ = self._state
+        if tree is None:
+            return []
+        found = tree.stab(start, [])
+        lo = bisect.bisect_right(starts, start)
+        hi = bisect.bisect_right(starts, end)
+        found.extend(by_start[lo:hi])
+        return [interval[2] for interval in found]
+
+    def for_employee(self, employee_id, start_date=None, end_date=None):
+        """
+        Returns the time off entries of one employee, optionally limited to those overlapping
+        start_date to end_date.
+        """
+        if start_date is not None and end_date is not None:
+            start = utils.resolve_date(start_date)
+            end = utils.resolve_date(end_date)
+            self.ensure(start, end)
+        else:
+            start = end = None
+
+        intervals = self._state[3].get(str(employee_id), [])
+        if start is None:
+            return [interval[2] for interval in intervals]
+        return [interval[2] for interval in intervals if interval[0] <= end and interval[1] >= start]
+
+    def is_out(self, employee_id, date):
+        """
+        Returns True if the employee has time off which includes the given date.
+        """
+        return bool(self.for_employee(employee_id, date, date))
+
+    def _rebuild(self):
+        intervals = list(self._entries.values())
+        by_start = sorted(intervals, key=lambda i: i[0])
+        by_employee = {}
+        for interval in by_start:
+            employee_id = interval[2].get('employeeId')
+            if employee_id is not None:
+                by_employee.setdefault(str(employee_id), []).append(interval)
+
+        # Swap in the new structures all at once so that readers never see a half built index.
+        tree = _IntervalNode(intervals) if intervals else None
+        self._state = (tree, [i[0] for i in by_start], by_start, by_employee)
+
+
+class TimeOffRequestCache(object):
+    """
+    A range aware cache in front of PyBambooHR.get_time_off_requests.
+
+    For every combination of status, type and employee filters the cache remembers which
+    date windows have already been downloaded. A query only asks the API for the parts
+    of its window which are not covered yet and merges the answers, deduplicated by the
+    request id, into the local copy.
+    """
+
+    def __init__(self, client):
+        """
+        @param client: PyBambooHR instance used to fetch time off requests.
+        """
+        self.client = client
+        self._lock = threading.RLock()
+        self._filters = {}
+
+    def get(self, start_date, end_date, status=None, type=None, employee_id=None):
+        """
+        Returns the time off requests overlapping start_date to end_date (inclusive) for the
+        given filters, sorted by their start date. Takes the same filters as get_time_off_requests.
+        """
+        if start_date is None or end_date is None:
+            raise ValueError("Both start_date and end_date are required to use the time off request cache")
+
+        start = utils.resolve_date(start_date)
+        end = utils.resolve_date(end_date)
+        key = (status, type, str(employee_id) if employee_id is not None else None)
+
+        with self._lock:
+            covered, by_id = self._filters.setdefault(key, ([], {}))
+            missing = utils.missing_date_ranges(covered, start, end)
+            for missing_start, missing_end in missing:
+                requests = self.client.get_time_off_requests(missing_start, missing_end, status=status, type=type, employee_id=employee_id)
+                for request in requests:
+                    by_id[request['id']] = (utils.resolve_date(request['start']), utils.resolve_date(request['end']), request)
+            if missing:
+                covered[:] = utils.merge_date_ranges(covered + missing)
+            cached = list(by_id.values())
+
+        found = [r for r in cached if r[0] <= end and r[1] >= start]
+        found.sort(key=lambda r: r[0])
+        return [r[2] for r in found]
+
+    def invalidate(self, status=None, type=None, employee_id=None):
+        """
+        Forgets everything cached for one combination of filters.
+        """
+        key = (status, type, str(employee_id) if employee_id is not None else None)
+        with self._lock:
+            self._filters.pop(key, None)
+
+    def clear(self):
+        """
+        Forgets everything cached for every combination of filters.
+        """
+        with self._lock:
+            self._filters = {}
@@ -3,10 +3,14 @@ A collection of misc. utilities that are used in the main class.
 """
 
 import datetime
+import os
 import re
+import threading
 import xmltodict
 import json
 
+from decimal import Decimal, InvalidOperation
+
 def camelcase_keys(data):
     """
     Converts all the keys in a dict to camelcase. It works recursively to convert any nested dicts as well.
@@ -54,14 +58,31 @@ _date_regex = re.compile(r"^\d{4}-\d{2}-\d{2}")
 
 def make_field_xml(id, value=None, pre='', post=''):
     id = escape(str(id))
-    if value:
-        value = escape(str(value))
+    if value or value is False or value == 0:
+        value = escape(format_field_value(value))
         tag = '<field id="{}">{}</field>'.format(id, value)
     else:
         tag = '<field id="{}" />'.format(id)
     return '{0}{1}{2}'.format(pre, tag, post)
 
 
+def format_field_value(value):
+    """
+    Converts a field value into the text BambooHR expects, including the typed values of
+    typed_records: dates, timestamps (naive UTC), booleans and (amount, currency code) tuples.
+    @param value: The value to convert.
+    """
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+    if isinstance(value, datetime.date):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, tuple) and len(value) == 2:
+        return ' '.join(str(part) for part in value if part is not None)
+    return str(value)
+
+
 def resolve_date_argument(arg):
     # basestring is undefined: We are running Python 3
     try:
@@ -77,6 +98,110 @@ def resolve_date_argument(arg):
         return None
     raise ValueError("Date argument {} must be either datetime, date, or string in form YYYY-MM-DD".format(arg))
 
+def resolve_date(arg):
+    """
+    Converts a date argument (datetime, date or YYYY-MM-DD string) into a datetime.date.
+    @param arg: The date to convert.
+    """
+    if isinstance(arg, datetime.datetime):
+        return arg.date()
+    elif isinstance(arg, datetime.date):
+        return arg
+    return datetime.datetime.strptime(resolve_date_argument(arg)[:10], '%Y-%m-%d').date()
+
+_number_regex = re.compile(r'-?\d+(?:\.\d+)?')
+_currency_code_regex = re.compile(r'[A-Za-z]{3}')
+
+def parse_currency(value):
+    """
+    Converts an amount like '8.25 USD' into a tuple of (Decimal amount or None, currency code or None).
+    Amounts already parsed (such tuples, as typed_records gives) and numbers are taken as they are.
+    Blank values (None or '') become None.
+    @param value: The amount to convert.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, tuple) and len(value) == 2:
+        amount, code = value
+        if amount is not None and not isinstance(amount, Decimal):
+            amount = parse_currency(amount)[0]
+        return (amount, code.upper() if code else None)
+    if isinstance(value, Decimal):
+        return (value, None)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (Decimal(str(value)), None)
+    text = str(value).replace(',', '')
+    number = _number_regex.search(text)
+    code = _currency_code_regex.search(text)
+    try:
+        amount = Decimal(number.group(0)) if number else None
+    except InvalidOperation:
+        amount = None
+    return (amount, code.group(0).upper() if code else None)
+
+def merge_date_ranges(ranges):
+    """
+    Merges a list of inclusive (start, end) date tuples so that overlapping or adjacent
+    ranges become a single range. The result is sorted by start date.
+    @param ranges: Iterable of (datetime.date, datetime.date) tuples.
+    """
+    merged = []
+    one_day = datetime.timedelta(days=1)
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + one_day:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def missing_date_ranges(covered, start, end):
+    """
+    Returns the inclusive (start, end) sub-ranges of start..end which are not part of covered.
+    @param covered: List of merged (start, end) date tuples, as returned by merge_date_ranges.
+    @param start: datetime.date of the first day wanted.
+    @param end: datetime.date of the last day wanted.
+    """
+    missing = []
+    one_day = datetime.timedelta(days=1)
+    cursor = start
+    for c_start, c_end in covered:
+        if c_end < cursor:
+            continue
+        if c_start > end:
+            break
+        if c_start > cursor:
+            missing.append((cursor, c_start - one_day))
+        cursor = c_end + one_day
+        if cursor > end:
+            return missing
+    if cursor <= end:
+        missing.append((cursor, end))
+    return missing
+
+def atomic_write(path, data):
+    """
+    Writes data (bytes) to path through a temporary file so readers never see a partial file.
+    @param path: The file to write.
+    @param data: The bytes to write.
+    """
+    tmp_path = '{0}.{1}.{2}.tmp'.format(path, os.getpid(), threading.current_thread().ident)
+    with open(tmp_path, 'wb') as handle:
+        handle.write(data)
+    replace_file(tmp_path, path)
+
+def replace_file(src, dst):
+    """
+    Renames src to dst, replacing dst if it exists (also on Windows).
+    @param src: The file to rename.
+    @param dst: The file to replace.
+    """
+    try:
+        os.replace(src, dst)
+    except AttributeError:
+        # Python 2 has no os.replace, rename is atomic on POSIX.
+        os.rename(src, dst)
+
 def transform_tabular_data(xml_input):
     """
     Converts table data (xml) from BambooHR into a dictionary with employee
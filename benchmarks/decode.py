@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Compares RecordDecoder.decode_many with naive per-field parsing (strptime / int / Decimal
+on every value of every record) on synthetic employee records.
+
+    python benchmarks/decode.py [number of records]
+"""
+
+import datetime
+import os
+import random
+import sys
+import timeit
+
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import PyBambooHR
+
+
+def make_records(count):
+    random.seed(0)
+    days = ['20{0:02d}-{1:02d}-{2:02d}'.format(y, m, d) for y in range(5, 20) for m in range(1, 13) for d in (1, 15)]
+    records = []
+    for i in range(count):
+        records.append({
+            'id': str(1000 + i),
+            'firstName': 'First{0}'.format(i),
+            'lastName': 'Last{0}'.format(i),
+            'department': random.choice(['Sales', 'Engineering', 'Support']),
+            'hireDate': random.choice(days),
+            'dateOfBirth': random.choice(days),
+            'terminationDate': '0000-00-00',
+            'lastChanged': '2014-01-02T03:04:05+00:00',
+            'age': str(random.randint(20, 65)),
+            'supervisorEId': str(random.randint(1000, 1000 + count)),
+            'payRate': '{0}.00 USD'.format(random.randint(30, 90) * 1000),
+            'photoUploaded': random.choice(['true', 'false']),
+        })
+    return records
+
+
+def naive(records, employee_fields):
+    decoded = []
+    for record in records:
+        out = {}
+        for key, value in record.items():
+            field_type = employee_fields.get(key, ('text',))[0]
+            if not value or value == '0000-00-00':
+                out[key] = value
+            elif field_type == 'date':
+                out[key] = datetime.datetime.strptime(value, '%Y-%m-%d').date()
+            elif field_type == 'timestamp':
+                out[key] = datetime.datetime.strptime(value[:19], '%Y-%m-%dT%H:%M:%S')
+            elif field_type == 'integer':
+                out[key] = int(value)
+            elif field_type == 'bool':
+                out[key] = value == 'true'
+            elif field_type == 'currency':
+                amount, _, code = value.partition(' ')
+                out[key] = (Decimal(amount), code or None)
+            else:
+                out[key] = value
+        decoded.append(out)
+    return decoded
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    records = make_records(count)
+    bamboo = PyBambooHR(subdomain='benchmark', api_key='benchmark')
+    decoder = bamboo.record_decoder()
+
+    for name, func in (('naive', lambda: naive(records, bamboo.employee_fields)),
+                       ('RecordDecoder.decode_many', lambda: decoder.decode_many(records))):
+        best = min(timeit.repeat(func, number=1, repeat=5))
+        print('{0:<28}{1:8.1f} ms  {2:10.0f} records/s'.format(name, best * 1000, count / best))
+
+
+if __name__ == '__main__':
+    main()
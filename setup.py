@@ -57,7 +57,10 @@ setup(
     platforms='OS Independent',
     packages=['PyBambooHR'],
     include_package_data=True,
-    install_requires=['requests', 'xmltodict'],
+    install_requires=['requests', 'xmltodict', 'futures; python_version < "3"'],
+    entry_points={
+        'console_scripts': ['pybamboohr-export=PyBambooHR.export:main'],
+    },
     keywords=['Bamboo', 'HR', 'BambooHR', 'API'],
     classifiers=[
         "Development Status :: 3 - Alpha",
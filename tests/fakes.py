@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Fake API session shared by the tests
+"""
+
+import io
+import json
+import random
+import re
+import threading
+import time
+
+import requests
+
+
+def make_response(content, status_code=200):
+    """
+    Builds a requests.Response with the given body (bytes, or anything JSON serializable).
+    """
+    if not isinstance(content, bytes):
+        content = json.dumps(content).encode('utf-8')
+    r = requests.Response()
+    r.status_code = status_code
+    r._content = content
+    r.raw = io.BytesIO()
+    return r
+
+
+def _employee_path(path):
+    return path.startswith('employees/') and path[10:].isdigit()
+
+
+class FakeBambooSession(object):
+    """
+    A thread-safe stand-in for the API, for tests whose requests are made from several
+    threads (httpretty is not reliable with concurrent requests).
+
+    It answers meta/users/, employees/directory, employees/{id} (with the fields asked
+    for), custom reports and, when given tables, meta/tables/ from a dictionary of
+    employee id to record. Other requests get an empty 200 response. Every request is
+    counted by kind ('employee' for employees/{id}, the path otherwise) and its url and
+    timeout are recorded. With a gate, employees/{id} requests wait until it is set.
+    """
+
+    def __init__(self, employees, delay=0, jitter=0, tables=None, gate=None):
+        """
+        @param employees: Dictionary of employee id (string) to record.
+        @param delay: Number of seconds to wait before answering.
+        @param jitter: Number of seconds (at most) of random wait added to delay.
+        @param tables: Bytes (optional) of the meta/tables/ XML.
+        @param gate: threading.Event (optional) holding employees/{id} requests until it is set.
+        """
+        self.employees = employees
+        self.delay = delay
+        self.jitter = jitter
+        self.tables = tables
+        self.gate = gate
+        self.urls = []
+        self.timeouts = []
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    @property
+    def calls(self):
+        return len(self.urls)
+
+    def request(self, method, url, data=None, params=None, **kwargs):
+        path = url.split('/v1/', 1)[1].split('?')[0]
+        kind = 'employee' if method == 'GET' and _employee_path(path) else path
+        with self._lock:
+            self.urls.append(url)
+            self.timeouts.append(kwargs.get('timeout'))
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+        if self.gate is not None and kind == 'employee':
+            self.gate.wait(5)
+        wait = self.delay + random.random() * self.jitter
+        if wait:
+            time.sleep(wait)
+        return make_response(self.answer(method, path, data, params))
+
+    def answer(self, method, path, data=None, params=None):
+        if path == 'meta/users/':
+            return dict((i, {'employeeId': i, 'status': 'enabled'}) for i in self.employees)
+        if path == 'employees/directory':
+            return {'employees': []}
+        if path == 'meta/tables/' and self.tables is not None:
+            return self.tables
+        if path.startswith('reports/custom'):
+            if isinstance(data, bytes):
+                data = data.decode('utf-8')
+            fields = [f for f in re.findall(r'<field id="([^"]+)"', data or '') if f != 'id']
+            rows = [dict([('id', i)] + [(f, record.get(f)) for f in fields]) for i, record in sorted(self.employees.items())]
+            return {'fields': [{'id': f} for f in fields], 'employees': rows}
+        if method == 'GET' and _employee_path(path):
+            employee_id = path[10:]
+            record = dict(self.employees.get(employee_id) or {}, id=employee_id)
+            fields = (params or {}).get('fields')
+            if fields:
+                record = dict((f, record.get(f)) for f in ['id'] + fields.split(','))
+            return record
+        return b''
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for the write-behind buffer
+"""
+
+import httpretty
+import os
+import sys
+import threading
+import time
+import unittest
+
+from requests import HTTPError
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import PyBambooHR, WriteBehindBuffer
+
+
+class SlowClient(object):
+    """
+    Records the updates it is sent; the first one is slow.
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def update_employee(self, id, employee):
+        with self._lock:
+            self.calls += 1
+            first = self.calls == 1
+        if first:
+            time.sleep(0.2)
+        with self._lock:
+            self.sent.append((id, employee['firstName']))
+        return True
+
+    def add_row(self, table_name, employee_id, row):
+        with self._lock:
+            self.sent.append((employee_id, table_name))
+        return True
+
+
+class test_buffer(unittest.TestCase):
+    # Used to store the cached instance of PyBambooHR
+    bamboo = None
+
+    def setUp(self):
+        if self.bamboo is None:
+            self.bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey')
+
+    @httpretty.activate
+    def test_updates_are_merged(self):
+        httpretty.register_uri(httpretty.POST, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/333", body='', status='200')
+
+        with self.bamboo.write_behind(flush_interval=None) as buffer:
+            first = buffer.update_employee(333, {'first_name': 'Test'})
+            second = buffer.update_employee('333', {'lastName': 'Person', 'firstName': 'Another'})
+            self.assertEqual(2, len(buffer))
+            buffer.flush()
+
+        self.assertTrue(first.result())
+        self.assertTrue(second.result())
+        body = httpretty.last_request().body
+        self.assertIn(b'<field id="firstName">Another</field>', body)
+        self.assertIn(b'<field id="lastName">Person</field>', body)
+        self.assertNotIn(b'Test', body)
+        self.assertRaises(UserWarning, buffer.update_employee, 333, {})
+
+    @httpretty.activate
+    def test_rows_are_merged_by_date(self):
+        httpretty.register_uri(httpretty.POST, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/333/tables/jobInfo/",
+                               body='', status='200')
+
+        buffer = self.bamboo.write_behind(flush_interval=None)
+        futures = [buffer.add_row('jobInfo', 333, {'date': '2014-01-01', 'jobTitle': 'Boss'}),
+                   buffer.add_row('jobInfo', 333, {'date': '2014-01-01', 'location': 'Here'}),
+                   buffer.add_row('jobInfo', 333, {'date': '2014-02-01', 'location': 'There'})]
+        buffer.close()
+
+        self.assertEqual([True, True, True], [f.result() for f in futures])
+        bodies = [r.body for r in httpretty.latest_requests() if b'2014-01-01' in r.body]
+        self.assertIn(b'<field id="jobTitle">Boss</field>', bodies[-1])
+        self.assertIn(b'<field id="location">Here</field>', bodies[-1])
+
+    @httpretty.activate
+    def test_size_flush_and_errors(self):
+        httpretty.register_uri(httpretty.POST, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/333", body='', status='403')
+
+        buffer = self.bamboo.write_behind(max_pending=2, flush_interval=None)
+        first = buffer.update_employee(333, {'firstName': 'Test'})
+        second = buffer.update_employee(333, {'lastName': 'Person'})
+
+        # The second call filled the buffer, both callers get the failure of the merged write
+        self.assertIsInstance(first.exception(timeout=5), HTTPError)
+        self.assertIsInstance(second.exception(timeout=5), HTTPError)
+        self.assertEqual(0, len(buffer))
+        buffer.close()
+
+    def test_flushes_for_one_employee_stay_in_order(self):
+        client = SlowClient()
+        with WriteBehindBuffer(client, flush_interval=None, max_workers=4) as buffer:
+            first = buffer.update_employee(333, {'firstName': 'Old'})
+            buffer._dispatch()
+            second = buffer.update_employee(333, {'firstName': 'New'})
+            buffer.flush()
+            first.result(timeout=5)
+            second.result(timeout=5)
+        self.assertEqual([('333', 'Old'), ('333', 'New')], client.sent)
+
+    def test_writes_keep_call_order(self):
+        client = SlowClient()
+        with WriteBehindBuffer(client, flush_interval=None) as buffer:
+            buffer.update_employee(333, {'firstName': 'Slow'})
+            buffer.add_row('jobInfo', 334, {'date': '2014-01-01'})
+            buffer.update_employee(334, {'firstName': 'After'})
+        self.assertEqual([('334', 'jobInfo'), ('334', 'After')], [s for s in client.sent if s[0] == '334'])
+
+    def test_close_waits_for_periodic_flush(self):
+        client = SlowClient()
+        buffer = WriteBehindBuffer(client, flush_interval=0.001)
+        futures = []
+        for i in range(50):
+            futures.append(buffer.update_employee(i, {'firstName': 'Test'}))
+            time.sleep(0.001)
+        buffer.close()
+        # Every write went out, none was submitted to a stopped executor
+        self.assertEqual([True] * 50, [f.result(timeout=5) for f in futures])
+        self.assertFalse(buffer._timer.is_alive())
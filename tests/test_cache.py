@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for the cache backends
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import PyBambooHR, MemoryCache, SQLiteCache
+from fakes import FakeBambooSession
+
+
+def counting_session():
+    return FakeBambooSession({'1': {'firstName': 'Test'}, '2': {'firstName': 'Test'}})
+
+
+class test_cache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'cache.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_backends(self):
+        for cache in (MemoryCache(), SQLiteCache(self.path)):
+            self.assertIsNone(cache.get('ns', 'key'))
+            cache.set('ns', 'key', {'a': [1, 2]})
+            cache.set('ns', 'short', 1, ttl=0.01)
+            cache.set('other', 'key', 2)
+            self.assertEqual({'a': [1, 2]}, cache.get('ns', 'key'))
+            time.sleep(0.02)
+            self.assertIsNone(cache.get('ns', 'short'))
+            cache.clear('ns')
+            self.assertIsNone(cache.get('ns', 'key'))
+            self.assertEqual(2, cache.get('other', 'key'))
+            cache.delete('other', 'key')
+            self.assertIsNone(cache.get('other', 'key'))
+
+    def test_one_refresh_at_a_time(self):
+        fetches = []
+
+        def fetch():
+            fetches.append(1)
+            time.sleep(0.1)
+            return 'value'
+
+        for cache in (MemoryCache(), SQLiteCache(self.path)):
+            del fetches[:]
+            results = []
+            # One backend instance per thread, like one per worker process
+            caches = [cache] * 2 if isinstance(cache, MemoryCache) else [cache, SQLiteCache(self.path)] * 2
+            threads = [threading.Thread(target=lambda c=c: results.append(c.get_or_refresh('ns', 'key', fetch, force=True)))
+                       for c in caches]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(['value'] * len(caches), results)
+            self.assertEqual(1, len(fetches))
+
+    def test_waiters_outlast_a_slow_refresh(self):
+        fetches = []
+
+        def fetch():
+            fetches.append(1)
+            time.sleep(0.3)
+            return 'value'
+
+        for cache in (MemoryCache(), SQLiteCache(self.path, poll_interval=0.01)):
+            del fetches[:]
+            results = []
+            caches = [cache] * 3 if isinstance(cache, MemoryCache) else [cache, SQLiteCache(self.path, poll_interval=0.01)] * 2
+            # The waiters give up on the lock long before the fetch is done, but still do not fetch
+            threads = [threading.Thread(target=lambda c=c: results.append(c.get_or_refresh('ns', 'slow', fetch, wait=0.05)))
+                       for c in caches]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(['value'] * len(caches), results)
+            self.assertEqual(1, len(fetches))
+
+    def test_refresh_longer_than_the_lease(self):
+        fetches = []
+
+        def fetch():
+            fetches.append(1)
+            time.sleep(0.4)
+            return 'value'
+
+        results = []
+        caches = [SQLiteCache(self.path, lock_lease=0.1, poll_interval=0.01) for _ in range(3)]
+        # The holder renews its lease, so the others never take the lock over and fetch again
+        threads = [threading.Thread(target=lambda c=c: results.append(c.get_or_refresh('ns', 'long', fetch, wait=0.05)))
+                   for c in caches]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(['value'] * 3, results)
+        self.assertEqual(1, len(fetches))
+        self.assertEqual(0o600, os.stat(self.path).st_mode & 0o777)
+
+    def test_clients_share_employees_and_metadata(self):
+        first, second = counting_session(), counting_session()
+        a = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=first, cache=SQLiteCache(self.path))
+        b = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=second, cache=SQLiteCache(self.path))
+
+        self.assertEqual(['1', '2'], sorted(a.get_all_employees(field_list=['firstName'])))
+        self.assertEqual(4, first.calls)
+        self.assertEqual('Test', b.get_all_employees(field_list=['firstName'])['2']['firstName'])
+        self.assertEqual(0, second.calls)
+        b.get_meta_users()
+        self.assertEqual(0, second.calls)
+
+        # Another subdomain has its own entries
+        c = PyBambooHR(subdomain='other', api_key='testingnotrealapikey', session=second, cache=SQLiteCache(self.path))
+        c.get_meta_users()
+        self.assertEqual(1, second.calls)
+
+        # So does another API key, which may see other fields
+        d = PyBambooHR(subdomain='test', api_key='anotherkey', session=second, cache=SQLiteCache(self.path))
+        d.get_meta_users()
+        self.assertEqual(2, second.calls)
+
+        b.get_all_employees(field_list=['firstName'], reloadEmployees=True)
+        # Metadata stays cached, the directory and the employees are fetched again
+        self.assertEqual(5, second.calls)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for record/replay cassettes
+"""
+
+import httpretty
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+from json import dumps
+from requests import HTTPError
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import PyBambooHR, Cassette
+
+
+class test_cassette(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'session.cassette')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @httpretty.activate
+    def record(self):
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/meta/lists/",
+                               responses=[httpretty.Response(body=dumps([{"alias": "first"}]), content_type="application/json"),
+                                          httpretty.Response(body=dumps([{"alias": "second"}]), content_type="application/json")])
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/123/photo/small",
+                               body=b'\xff\xd8\xff\xe0', content_type="image/jpeg")
+        httpretty.register_uri(httpretty.POST, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/333", body='', status=403)
+
+        with Cassette(self.path, mode='record') as cassette:
+            bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=cassette)
+            bamboo.get_meta_lists()
+            bamboo.get_meta_lists()
+            bamboo.get_employee_photo(123)
+            self.assertRaises(HTTPError, bamboo.update_employee, 333, {'firstName': 'Test'})
+        return cassette
+
+    def test_record_and_replay(self):
+        self.assertEqual(4, len(self.record()))
+
+        # Replay happens with httpretty disabled: nothing reaches the network
+        cassette = Cassette(self.path, mode='replay')
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=cassette)
+        self.assertEqual('first', bamboo.get_meta_lists()[0]['alias'])
+        self.assertEqual('second', bamboo.get_meta_lists()[0]['alias'])
+        self.assertEqual('second', bamboo.get_meta_lists()[0]['alias'])
+        self.assertEqual((b'\xff\xd8\xff\xe0', 'image/jpeg'), bamboo.get_employee_photo(123))
+        self.assertRaises(HTTPError, bamboo.update_employee, 333, {'firstName': 'Test'})
+
+        # A different body does not match
+        self.assertRaises(LookupError, bamboo.update_employee, 333, {'firstName': 'Other'})
+
+    def test_replay_latency(self):
+        self.record()
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=Cassette(self.path, latency=0.05))
+        started = time.time()
+        bamboo.get_meta_lists()
+        self.assertGreaterEqual(time.time() - started, 0.05)
+
+    def test_uploads_keyed_by_contents(self):
+        upload = "https://api.bamboohr.com/api/gateway.php/test/v1/employees/123/files/"
+        path = os.path.join(self.directory, 'a.txt')
+
+        def upload_file(bamboo, content):
+            with open(path, 'wb') as handle:
+                handle.write(content)
+            try:
+                bamboo.upload_employee_file(123, path, category_id=1, share=False)
+                return True
+            except HTTPError:
+                return False
+
+        with httpretty.enabled():
+            httpretty.register_uri(httpretty.POST, upload,
+                                   responses=[httpretty.Response(body='', status=201),
+                                              httpretty.Response(body='', status=400)])
+            with Cassette(self.path, mode='record') as cassette:
+                bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=cassette)
+                self.assertTrue(upload_file(bamboo, b'first'))
+                self.assertFalse(upload_file(bamboo, b'second'))
+        httpretty.reset()
+
+        # Each upload replays its own recording, whatever order they come in
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=Cassette(self.path, mode='replay'))
+        self.assertFalse(upload_file(bamboo, b'second'))
+        self.assertTrue(upload_file(bamboo, b'first'))
+        self.assertRaises(LookupError, upload_file, bamboo, b'third')
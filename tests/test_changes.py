@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for the change feed poller
+"""
+
+import datetime
+import httpretty
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+import requests
+
+from json import dumps
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import PyBambooHR, ChangeFeedPoller
+
+
+class test_changes(unittest.TestCase):
+    # Used to store the cached instance of PyBambooHR
+    bamboo = None
+
+    def setUp(self):
+        if self.bamboo is None:
+            self.bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey')
+        self.directory = tempfile.mkdtemp()
+        self.checkpoint = os.path.join(self.directory, 'checkpoint.json')
+
+        self.changes = {"latest": "2014-01-02T10:00:00+00:00", "employees": {
+            "1": {"id": "1", "action": "Inserted", "lastChanged": "2014-01-01T09:00:00+00:00"},
+            "2": {"id": "2", "action": "Updated", "lastChanged": "2014-01-02T10:00:00+00:00"},
+        }}
+        self.table_changes = {"table": "jobInfo", "employees": {
+            "2": {"lastChanged": "2014-01-02T10:00:00+00:00", "rows": [{"id": "7", "jobTitle": "Boss"}]},
+        }}
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @httpretty.activate
+    def test_poll_delivers_and_checkpoints(self):
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/changed/",
+                               body=dumps(self.changes), content_type="application/json")
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/changed/tables/jobInfo",
+                               body=dumps(self.table_changes), content_type="application/json")
+
+        batches = []
+        poller = ChangeFeedPoller(self.bamboo, checkpoint_path=self.checkpoint, since=datetime.datetime(2014, 1, 1),
+                                  tables=['jobInfo'], batch_size=2)
+        poller.subscribe(batches.append)
+
+        self.assertEqual(3, poller.poll_once())
+        self.assertEqual([1, 2], sorted(len(b) for b in batches))
+        self.assertEqual(set([('employee', '1'), ('employee', '2'), ('table', '2')]),
+                         set((c['kind'], c['id']) for b in batches for c in b))
+        self.assertEqual(datetime.datetime(2014, 1, 2, 10), poller.since)
+
+        # A new poller resumes from the saved checkpoint and skips what was already delivered
+        poller = ChangeFeedPoller(self.bamboo, checkpoint_path=self.checkpoint, tables=['jobInfo'])
+        poller.subscribe(batches.append)
+        self.assertEqual(datetime.datetime(2014, 1, 2, 10), poller.since)
+        self.assertEqual(0, poller.poll_once())
+        self.assertEqual('2014-01-02T10:00:00Z', httpretty.last_request().querystring['since'][0])
+
+    @httpretty.activate
+    def test_failed_subscriber_keeps_checkpoint(self):
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/changed/",
+                               body=dumps(self.changes), content_type="application/json")
+
+        def broken(batch):
+            raise ValueError('boom')
+
+        poller = ChangeFeedPoller(self.bamboo, since=datetime.datetime(2014, 1, 1))
+        poller.subscribe(broken)
+        self.assertRaises(ValueError, poller.poll_once)
+        self.assertEqual(datetime.datetime(2014, 1, 1), poller.since)
+
+        errors = []
+        poller.on_error = lambda callback, batch, e: errors.append(e)
+        self.assertEqual(2, poller.poll_once())
+        self.assertEqual(1, len(errors))
+        self.assertEqual(datetime.datetime(2014, 1, 2, 10), poller.since)
+
+    @httpretty.activate
+    def test_subscriber_gets_batches_in_order(self):
+        changes = {"employees": dict((str(i), {"id": str(i), "action": "Updated", "lastChanged": "2014-01-01T10:00:{0:02d}+00:00".format(i)})
+                                     for i in range(8))}
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/changed/",
+                               body=dumps(changes), content_type="application/json")
+
+        received = {'slow': [], 'fast': []}
+
+        def slow(batch):
+            # Earlier batches take longer, so unordered delivery would show
+            time.sleep(0.01 * (8 - int(batch[0]['id'])))
+            received['slow'].append(batch[0]['id'])
+
+        poller = ChangeFeedPoller(self.bamboo, since=datetime.datetime(2014, 1, 1), batch_size=1, max_workers=4)
+        poller.subscribe(slow)
+        poller.subscribe(lambda batch: received['fast'].append(batch[0]['id']))
+        self.assertEqual(8, poller.poll_once())
+        expected = [str(i) for i in range(8)]
+        self.assertEqual({'slow': expected, 'fast': expected}, received)
+
+    @httpretty.activate
+    def test_hydrate_changes(self):
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/changed/",
+                               body=dumps(self.changes), content_type="application/json")
+        httpretty.register_uri(httpretty.POST, "https://api.bamboohr.com/api/gateway.php/test/v1/reports/custom/?format=json",
+                               body=dumps({"employees": [{"id": "1", "firstName": "Test"}, {"id": "2", "firstName": "Other"}, {"id": "3"}]}),
+                               content_type="application/json")
+
+        batches = []
+        poller = ChangeFeedPoller(self.bamboo, since=datetime.datetime(2014, 1, 1), hydrate_fields=['firstName'])
+        poller.subscribe(batches.append)
+        poller.poll_once()
+        self.assertEqual(['Test', 'Other'], [c['record']['firstName'] for c in batches[0]])
+        self.assertIn(b'<field id="firstName" />', httpretty.last_request().body)
+        self.assertIn(b'<lastChanged includeNull="no">2014-01-01T00:00:00Z</lastChanged>', httpretty.last_request().body)
+
+    def test_run_survives_failed_polls(self):
+        errors = []
+        poller = ChangeFeedPoller(self.bamboo, since=datetime.datetime(2014, 1, 1), interval=0.01, max_backoff=0.02,
+                                  on_error=lambda callback, batch, e: errors.append((callback, batch, e)))
+        polls = []
+
+        def poll_once():
+            polls.append(1)
+            if len(polls) < 3:
+                raise requests.exceptions.ConnectionError("down")
+            poller._stop.set()
+            return 0
+
+        poller.poll_once = poll_once
+        logger = logging.getLogger('PyBambooHR.changes')
+        logger.disabled = True
+        try:
+            poller.start().join(5)
+        finally:
+            logger.disabled = False
+        self.assertEqual(3, len(polls))
+        self.assertEqual(2, len(errors))
+        self.assertIsNone(errors[0][0])
+        self.assertIsInstance(errors[0][2], requests.exceptions.ConnectionError)
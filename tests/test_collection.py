@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for batched field loading
+"""
+
+import datetime
+import httpretty
+import os
+import sys
+import threading
+import time
+import unittest
+
+from json import dumps
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import PyBambooHR, EmployeeCollection
+from fakes import FakeBambooSession
+
+
+class test_collection(unittest.TestCase):
+    # Used to store the cached instance of PyBambooHR
+    bamboo = None
+
+    def setUp(self):
+        if self.bamboo is None:
+            self.bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey')
+        self.employees = dict((str(i), {'id': str(i), 'firstName': 'Test {0}'.format(i)}) for i in range(1, 4))
+
+    @httpretty.activate
+    def test_report_batch(self):
+        body = dumps({'title': 'My Custom Report', 'fields': [],
+                      'employees': [{'id': '1', 'department': 'Sales', 'location': 'Here'},
+                                    {'id': '2', 'department': 'Support', 'location': 'There'}]})
+        httpretty.register_uri(httpretty.POST, "https://api.bamboohr.com/api/gateway.php/test/v1/reports/custom/?format=json",
+                               body=body, content_type="application/json")
+
+        employees = EmployeeCollection(self.bamboo, self.employees, report_threshold=1)
+        employees.prefetch('location')
+        self.assertEqual('Test 1', employees['1']['firstName'])
+        self.assertEqual('Sales', employees['1']['department'])
+
+        # Both fields were loaded for everybody in one report
+        body = httpretty.last_request().body
+        self.assertIn(b'<field id="department" />', body)
+        self.assertIn(b'<field id="location" />', body)
+        httpretty.reset()
+        self.assertEqual('There', employees[2]['location'])
+        self.assertIsNone(employees['3']['department'])
+        self.assertIsNone(employees['3'].get('location'))
+        self.assertEqual(4, len(employees['1']))
+
+    @httpretty.activate
+    def test_employee_batch(self):
+        for i in range(1, 4):
+            httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/{0}".format(i),
+                                   body=dumps({'id': str(i), 'department': 'Dept {0}'.format(i)}), content_type="application/json")
+
+        employees = EmployeeCollection(self.bamboo, self.employees, max_workers=1)
+        self.assertEqual(['Dept 1', 'Dept 2', 'Dept 3'], [employees[str(i)]['department'] for i in range(1, 4)])
+        self.assertEqual(3, len([r for r in httpretty.latest_requests() if r.method == 'GET']))
+        self.assertRaises(KeyError, lambda: employees['4'])
+
+    def test_unknown_field_is_a_key_error(self):
+        employees = EmployeeCollection(self.bamboo, self.employees)
+        self.assertRaises(KeyError, lambda: employees['1']['notAField'])
+        self.assertEqual('default', employees['1'].get('notAField', 'default'))
+        self.assertNotIn('notAField', employees['1'])
+
+    @httpretty.activate
+    def test_report_rows_are_wrapped(self):
+        body = dumps({'title': 'My Custom Report', 'fields': [],
+                      'employees': [{'id': str(i), 'hireDate': '2014-01-0{0}'.format(i)} for i in range(1, 4)]})
+        httpretty.register_uri(httpretty.POST, "https://api.bamboohr.com/api/gateway.php/test/v1/reports/custom/?format=json",
+                               body=body, content_type="application/json")
+
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', underscore_keys=True, typed_records=True)
+        employees = EmployeeCollection(bamboo, self.employees, report_threshold=1)
+        self.assertEqual(datetime.date(2014, 1, 2), employees['2']['hire_date'])
+
+    def test_batches_load_outside_the_lock(self):
+        session = FakeBambooSession(dict((str(i), {'department': 'Dept {0}'.format(i)}) for i in range(1, 4)), gate=threading.Event())
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=session)
+        employees = EmployeeCollection(bamboo, self.employees)
+        results = []
+        readers = [threading.Thread(target=lambda: results.append(employees['1']['department'])) for _ in range(2)]
+        for thread in readers:
+            thread.start()
+        time.sleep(0.05)
+
+        # While the batch waits on the API the collection stays usable
+        started = time.time()
+        employees.prefetch('location')
+        self.assertEqual('Test 2', employees['2']['firstName'])
+        self.assertLess(time.time() - started, 1)
+
+        session.gate.set()
+        for thread in readers:
+            thread.join()
+        # Both readers got the field from one batch
+        self.assertEqual(['Dept 1', 'Dept 1'], results)
+        self.assertEqual(3, session.counts['employee'])
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for deadlines and budgets
+"""
+
+import os
+import sys
+import unittest
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import PyBambooHR, Deadline, DeadlineExceeded
+from fakes import FakeBambooSession
+
+
+def slow_session(delay):
+    return FakeBambooSession(dict((str(i), {}) for i in range(1, 6)), delay=delay)
+
+
+class test_deadline(unittest.TestCase):
+
+    def test_deadline(self):
+        deadline = Deadline(10)
+        self.assertEqual(5, deadline.timeout(5))
+        self.assertLessEqual(deadline.timeout(60), 10)
+        self.assertEqual((3, 5), deadline.timeout((3, 5)))
+        self.assertIs(deadline, deadline.earliest(Deadline(20)))
+        self.assertRaises(DeadlineExceeded, Deadline(-1).timeout, 5)
+
+    def test_requests_get_the_time_left(self):
+        session = slow_session(0)
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=session)
+        with bamboo.deadline(5):
+            bamboo.get_employee(1, field_list=['firstName'])
+            with bamboo.deadline(1):
+                bamboo.get_employee(1, field_list=['firstName'])
+        bamboo.get_employee(1, field_list=['firstName'])
+        self.assertTrue(4 < session.timeouts[0] <= 5)
+        self.assertTrue(0 < session.timeouts[1] <= 1)
+        self.assertEqual(60, session.timeouts[2])
+
+    def test_get_all_employees_budget(self):
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=slow_session(0.05))
+        employees = bamboo.get_all_employees(field_list=['firstName'], budget=0.22)
+        self.assertFalse(employees.complete)
+        self.assertEqual(5, len(employees) + len(employees.skipped))
+        self.assertEqual(employees.skipped, bamboo.employees_skipped)
+
+        # The next call picks up where the last one stopped
+        employees = bamboo.get_all_employees(field_list=['firstName'], budget=5)
+        self.assertTrue(employees.complete)
+        self.assertEqual(['1', '2', '3', '4', '5'], sorted(employees))
+
+    def test_collection_workers_keep_the_deadline(self):
+        session = slow_session(0)
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=session)
+        collection = bamboo.employee_collection()
+        with bamboo.deadline(5):
+            collection.load('firstName')
+        self.assertEqual(7, len(session.timeouts))
+        self.assertTrue(all(t <= 5 for t in session.timeouts[2:]))
+
+    def test_bulk_write_budget(self):
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=slow_session(0.05))
+        employees = dict((str(i), {'firstName': 'Test {0}'.format(i)}) for i in range(1, 5))
+        sent = bamboo.update_employees_changes(employees, baselines={}, max_workers=1, budget=0.08)
+        self.assertEqual(4, len(sent) + len(sent.skipped))
+        self.assertTrue(sent.skipped)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for typed record decoding
+"""
+
+import datetime
+import httpretty
+import os
+import sys
+import unittest
+
+from decimal import Decimal
+from json import dumps
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import PyBambooHR, RecordDecoder
+
+
+class test_decode(unittest.TestCase):
+    # Used to store the cached instance of PyBambooHR
+    bamboo = None
+
+    def setUp(self):
+        if self.bamboo is None:
+            self.bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey')
+
+    def test_decode(self):
+        decoder = self.bamboo.record_decoder()
+        record = decoder.decode({'id': '123', 'hireDate': '2010-12-15', 'terminationDate': '0000-00-00',
+                                 'lastChanged': '2014-01-02T03:04:05+00:00', 'payRate': '8.25 USD',
+                                 'photoUploaded': 'true', 'firstName': 'Test', 'age': 'unknown'})
+        self.assertEqual(123, record['id'])
+        self.assertEqual(datetime.date(2010, 12, 15), record['hireDate'])
+        self.assertIsNone(record['terminationDate'])
+        self.assertEqual(datetime.datetime(2014, 1, 2, 3, 4, 5), record['lastChanged'])
+        self.assertEqual((Decimal('8.25'), 'USD'), record['payRate'])
+        self.assertTrue(record['photoUploaded'])
+        self.assertEqual('Test', record['firstName'])
+        # Values which do not parse are kept
+        self.assertEqual('unknown', record['age'])
+
+    def test_decode_many(self):
+        decoder = RecordDecoder({'hireDate': 'date', 'supervisorEId': ('integer', '')})
+        records = decoder.decode_many({'1': {'hire_date': '2010-12-15', 'supervisor_e_id': '2'},
+                                       '2': {'hire_date': '2010-12-15', 'supervisor_e_id': None}})
+        self.assertEqual(datetime.date(2010, 12, 15), records['2']['hire_date'])
+        self.assertEqual(2, records['1']['supervisor_e_id'])
+        self.assertIsNone(records['2']['supervisor_e_id'])
+        self.assertEqual([{'hireDate': datetime.date(2011, 1, 1)}], decoder.decode_many([{'hireDate': '2011-01-01'}]))
+
+    @httpretty.activate
+    def test_meta_fields(self):
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/meta/fields/",
+                               body=dumps([{"id": 4001, "name": "Shirt size", "type": "int"},
+                                           {"id": 4002, "name": "Start", "type": "date", "alias": "customStart"}]),
+                               content_type="application/json")
+        decoder = self.bamboo.record_decoder(meta_fields=True)
+        record = decoder.decode({'4001': '42', 'customStart': '2014-01-01', 'hireDate': '2010-12-15'})
+        self.assertEqual({'4001': 42, 'customStart': datetime.date(2014, 1, 1), 'hireDate': datetime.date(2010, 12, 15)}, record)
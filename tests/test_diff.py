@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for field level diffs
+"""
+
+import datetime
+import httpretty
+import os
+import sys
+import unittest
+
+from decimal import Decimal
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import PyBambooHR
+from PyBambooHR.diff import RecordDiffer
+
+
+class test_diff(unittest.TestCase):
+    # Used to store the cached instance of PyBambooHR
+    bamboo = None
+
+    def setUp(self):
+        if self.bamboo is None:
+            self.bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey')
+        self.bamboo.employees = {'333': {'id': '333', 'firstName': 'Test', 'hireDate': '2010-12-15', 'payRate': '8.25 USD', 'age': '30'}}
+
+    def test_diff_uses_field_types(self):
+        differ = RecordDiffer(self.bamboo.employee_fields)
+        baseline = self.bamboo.employees['333']
+
+        self.assertEqual({}, differ.diff({'hireDate': datetime.date(2010, 12, 15), 'payRate': '8.25', 'age': 30}, baseline))
+        self.assertEqual({'payRate': '8.50 USD', 'lastName': 'Person'},
+                         differ.diff({'firstName': 'Test', 'payRate': '8.50 USD', 'lastName': 'Person'}, baseline))
+        self.assertEqual({'payRate': '8.25 EUR'}, differ.diff({'payRate': '8.25 EUR'}, baseline))
+        self.assertEqual({'firstName': 'Test'}, differ.diff({'firstName': 'Test'}, None))
+
+        changes = differ.diff_many({'333': {'age': '30'}, '334': {'age': '31'}}, {'333': baseline})
+        self.assertEqual({'334': {'age': '31'}}, changes)
+
+    @httpretty.activate
+    def test_update_employee_changes(self):
+        httpretty.register_uri(httpretty.POST, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/333", body='', status='200')
+
+        # No-op updates are skipped entirely
+        self.assertEqual({}, self.bamboo.update_employee_changes(333, {'first_name': 'Test', 'hire_date': '2010-12-15'}))
+        self.assertIsNone(httpretty.last_request().method)
+
+        changes = self.bamboo.update_employee_changes(333, {'firstName': 'Another', 'hireDate': '2010-12-15'})
+        self.assertEqual({'firstName': 'Another'}, changes)
+        self.assertIn(b'<field id="firstName">Another</field>', httpretty.last_request().body)
+        self.assertNotIn(b'hireDate', httpretty.last_request().body)
+
+        # The cached copy follows the update
+        self.assertEqual('Another', self.bamboo.employees['333']['firstName'])
+        self.assertEqual({}, self.bamboo.update_employee_changes(333, {'firstName': 'Another'}))
+
+    @httpretty.activate
+    def test_update_employees_changes(self):
+        httpretty.register_uri(httpretty.POST, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/333", body='', status='200')
+        httpretty.register_uri(httpretty.POST, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/334", body='', status='403')
+
+        results = self.bamboo.update_employees_changes({'333': {'firstName': 'Test', 'age': 31}, '334': {'firstName': 'New'}})
+        self.assertEqual({'age': 31}, results['333'])
+        self.assertIsInstance(results['334'], Exception)
+
+    @httpretty.activate
+    def test_typed_records(self):
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/333",
+                               body='{"id": "333", "hireDate": "2010-12-15", "payRate": "8.25 USD", "lastChanged": "2014-01-01T10:00:00+00:00"}',
+                               content_type="application/json")
+        httpretty.register_uri(httpretty.POST, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/333", body='', status='200')
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', typed_records=True)
+        typed = bamboo.get_employee(333, field_list=['hireDate', 'payRate', 'lastChanged'])
+        self.assertEqual((Decimal('8.25'), 'USD'), typed['payRate'])
+
+        # Typed and raw values of the same data are not changes, either way round
+        raw = {'hireDate': '2010-12-15', 'payRate': '8.25 USD', 'lastChanged': '2014-01-01T10:00:00+00:00'}
+        self.assertEqual({}, bamboo.diff_employee(333, raw, baseline=typed))
+        self.assertEqual({}, bamboo.diff_employee(333, dict((k, typed[k]) for k in raw), baseline=raw))
+        self.assertEqual({'payRate': '9.00 USD'}, bamboo.diff_employee(333, {'payRate': '9.00 USD'}, baseline=typed))
+
+        # Typed values are written back in the API's format
+        bamboo.update_employee(333, {'payRate': (Decimal('9.00'), 'USD'), 'hireDate': typed['hireDate']})
+        self.assertIn(b'<field id="payRate">9.00 USD</field>', httpretty.last_request().body)
+        self.assertIn(b'<field id="hireDate">2010-12-15</field>', httpretty.last_request().body)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for the command line exporter
+"""
+
+import httpretty
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import export
+
+
+class test_export(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_writers(self):
+        stream = io.StringIO()
+        writer = export.RecordWriter(stream, 'csv', columns=['id', 'name'])
+        writer.write({'id': '1', 'name': 'Test'})
+        writer.write({'id': '2', 'name': {'first': 'Some'}})
+        self.assertRaises(UserWarning, writer.write, {'id': '3', 'extra': 'not dropped'})
+        self.assertEqual(['id,name', '1,Test', '2,"{""first"": ""Some""}"'], stream.getvalue().splitlines())
+
+        # Without columns the header is the union of every record's fields
+        stream = io.StringIO()
+        writer = export.RecordWriter(stream, 'csv')
+        writer.write({'id': '1'})
+        writer.write({'id': '2', 'name': 'Later'})
+        self.assertEqual('', stream.getvalue())
+        writer.close()
+        self.assertEqual(['id,name', '1,', '2,Later'], stream.getvalue().splitlines())
+
+        stream = io.StringIO()
+        stats = export.Stats()
+        writer = export.RecordWriter(stream, stats=stats)
+        writer.write({'id': '1'})
+        self.assertEqual({'id': '1'}, json.loads(stream.getvalue()))
+        self.assertEqual(1, stats.records)
+
+    def test_bounded_map(self):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            self.assertEqual([0, 2, 4, 6, 8], list(export.bounded_map(executor, lambda x: x * 2, range(5), 2)))
+
+    def test_arguments(self):
+        os.environ['BAMBOOHR_API_KEY'] = 'fromenv'
+        try:
+            args = export.parse_args(['employees', '--subdomain', 'a', '--subdomain', 'b'])
+            self.assertEqual(['fromenv', 'fromenv'], args.api_key)
+        finally:
+            del os.environ['BAMBOOHR_API_KEY']
+        stderr, sys.stderr = sys.stderr, io.StringIO()
+        try:
+            self.assertRaises(SystemExit, export.parse_args, ['employees', '--subdomain', 'a'])
+            self.assertRaises(SystemExit, export.parse_args, ['table', '--subdomain', 'a', '--api-key', 'x'])
+        finally:
+            sys.stderr = stderr
+
+    @httpretty.activate
+    def test_export_whos_out(self):
+        body = json.dumps([{"id": 1, "type": "timeOff", "employeeId": 123, "name": "Test Person", "start": "2014-01-01", "end": "2014-01-02"},
+                           {"id": 2, "type": "holiday", "name": "New Year", "start": "2014-01-01", "end": "2014-01-01"}])
+        for subdomain in ('test', 'other'):
+            httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/{0}/v1/time_off/whos_out".format(subdomain),
+                                   body=body, content_type="application/json")
+
+        output = os.path.join(self.tmp, '{subdomain}.csv')
+        export.main(['whos-out', '--subdomain', 'test', '--subdomain', 'other', '--api-key', 'testingnotrealapikey',
+                     '--start', '2014-01-01', '--format', 'csv', '-o', output, '--workers', '1'])
+
+        for subdomain in ('test', 'other'):
+            with open(output.format(subdomain=subdomain)) as f:
+                lines = f.read().splitlines()
+            self.assertEqual(3, len(lines))
+            self.assertIn('subdomain', lines[0].split(','))
+            self.assertTrue(lines[1].endswith(subdomain))
+            with open(output.format(subdomain=subdomain), 'rb') as f:
+                self.assertNotIn(b'\r\r\n', f.read())
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for employee file transfers
+"""
+
+import hashlib
+import httpretty
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import PyBambooHR, files
+
+
+class test_files(unittest.TestCase):
+    # Used to store the cached instance of PyBambooHR
+    bamboo = None
+
+    def setUp(self):
+        if self.bamboo is None:
+            self.bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey')
+        self.directory = tempfile.mkdtemp()
+
+        self.files_xml = """<?xml version="1.0"?>
+            <employee id="123">
+                <category id="1">
+                    <name>Signed Documents</name>
+                    <file id="10">
+                        <name>Contract</name>
+                        <originalFileName>contract.pdf</originalFileName>
+                    </file>
+                    <file id="11">
+                        <name>Handbook</name>
+                        <originalFileName>handbook.pdf</originalFileName>
+                    </file>
+                </category>
+                <category id="2">
+                    <name>Other</name>
+                </category>
+            </employee>"""
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_list_files(self):
+        employee_files = {'category': [{'id': '1', 'file': {'id': '10', 'name': 'Contract'}}, {'id': '2'}]}
+        self.assertEqual([{'id': '10', 'name': 'Contract', 'category_id': '1'}], files.list_files(employee_files))
+
+    @httpretty.activate
+    def test_download_employee_file(self):
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/123/files/10",
+                               body=b'%PDF' * 1000, content_type="application/pdf")
+
+        path = os.path.join(self.directory, 'contract.pdf')
+        result = self.bamboo.download_employee_file(123, 10, path, chunk_size=100)
+        self.assertEqual(4000, result['bytes'])
+        self.assertEqual(hashlib.sha256(b'%PDF' * 1000).hexdigest(), result['sha256'])
+        self.assertEqual(result['sha256'], files.file_checksum(path))
+        self.assertFalse(os.path.exists(path + '.part'))
+
+    def test_download_employee_file_failure_leaves_no_part(self):
+        path = os.path.join(self.directory, 'contract.pdf')
+        with open(path, 'wb') as handle:
+            handle.write(b'old')
+
+        def broken(employee_id, file_id, chunk_size):
+            yield b'%PDF'
+            raise IOError('connection reset')
+
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey')
+        bamboo.iter_employee_file = broken
+        self.assertRaises(IOError, bamboo.download_employee_file, 123, 10, path)
+        self.assertFalse(os.path.exists(path + '.part'))
+
+        # A successful download replaces the existing file
+        bamboo.iter_employee_file = lambda employee_id, file_id, chunk_size: iter([b'new'])
+        bamboo.download_employee_file(123, 10, path)
+        with open(path, 'rb') as handle:
+            self.assertEqual(b'new', handle.read())
+
+    @httpretty.activate
+    def test_download_employee_files_resumes(self):
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/123/files/view/",
+                               body=self.files_xml, content_type="application/xml")
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/123/files/10",
+                               body=b'contract', content_type="application/pdf")
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/123/files/11",
+                               body=b'', status=500)
+
+        progress_file = os.path.join(self.directory, 'progress.json')
+        results = self.bamboo.download_employee_files(123, self.directory, progress_file=progress_file)
+        self.assertEqual([True, False], [r['ok'] for r in results])
+        self.assertIsNotNone(results[1]['error'])
+        self.assertTrue(os.path.exists(os.path.join(self.directory, '10-contract.pdf')))
+
+        # Second run only retries the failed file
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/123/files/11",
+                               body=b'handbook', content_type="application/pdf")
+        results = self.bamboo.download_employee_files(123, self.directory, progress_file=progress_file)
+        self.assertEqual([True, True], [r['ok'] for r in results])
+        self.assertTrue(results[0]['skipped'])
+        self.assertNotIn('skipped', results[1])
+
+    @httpretty.activate
+    def test_upload_employee_files(self):
+        httpretty.register_uri(httpretty.POST, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/123/files/",
+                               body='', status=201)
+
+        paths = []
+        for name in ('a.txt', 'b.txt'):
+            path = os.path.join(self.directory, name)
+            with open(path, 'wb') as handle:
+                handle.write(name.encode('utf-8'))
+            paths.append(path)
+
+        results = self.bamboo.upload_employee_files(123, paths, category_id=1, share=False)
+        self.assertEqual([True, True], [r['ok'] for r in results])
+        self.assertEqual(hashlib.sha256(b'a.txt').hexdigest(), results[0]['sha256'])
+
+    @httpretty.activate
+    def test_upload_employee_files_resumes(self):
+        httpretty.register_uri(httpretty.POST, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/123/files/",
+                               body='', status=201)
+        path = os.path.join(self.directory, 'a.txt')
+        progress_file = os.path.join(self.directory, 'progress.json')
+        with open(path, 'wb') as handle:
+            handle.write(b'first')
+        self.bamboo.upload_employee_files(123, [path], category_id=1, share=False, progress_file=progress_file)
+
+        results = self.bamboo.upload_employee_files(123, [path], category_id=1, share=False, progress_file=progress_file)
+        self.assertTrue(results[0]['skipped'])
+
+        # A file changed since it was uploaded is uploaded again
+        with open(path, 'wb') as handle:
+            handle.write(b'second')
+        results = self.bamboo.upload_employee_files(123, [path], category_id=1, share=False, progress_file=progress_file)
+        self.assertNotIn('skipped', results[0])
+        self.assertEqual(hashlib.sha256(b'second').hexdigest(), results[0]['sha256'])
+
+    def test_upload_employee_files_outer_deadline(self):
+        path = os.path.join(self.directory, 'a.txt')
+        with open(path, 'wb') as handle:
+            handle.write(b'a')
+        with self.bamboo.deadline(0):
+            results = self.bamboo.upload_employee_files(123, [path], category_id=1, share=False)
+        # Files not sent in time are listed as skipped, never as None
+        self.assertEqual([], list(results))
+        self.assertEqual([path], results.skipped)
@@ -12,6 +12,8 @@ import os
 import sys
 import unittest
 
+from decimal import Decimal
+
 # Force parent directory onto path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -80,6 +82,11 @@ class test_misc(unittest.TestCase):
         self.assertEqual('\t<field id="123" />\n', xml)
         pass
 
+    def test_parse_currency(self):
+        self.assertEqual((Decimal('1250.50'), 'USD'), utils.parse_currency('1,250.50 usd'))
+        self.assertEqual((Decimal('8'), None), utils.parse_currency(8))
+        self.assertIsNone(utils.parse_currency(''))
+
     def test__format_row_xml(self):
         row = {'f1': 'v1', 'f2': 'v2'}
         xml = self.bamboo._format_row_xml(row)
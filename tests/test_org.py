@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for the org chart
+"""
+
+import os
+import sys
+import unittest
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import OrgChart
+
+
+class test_org(unittest.TestCase):
+
+    def setUp(self):
+        # 1 manages 2 and 3, 2 manages 4 and 5 (5 only known by employee number), 6 is on their own
+        self.employees = {
+            '1': {'id': '1', 'employeeNumber': '001', 'supervisorEId': None},
+            '2': {'id': '2', 'employeeNumber': '002', 'supervisorEId': '1'},
+            '3': {'id': '3', 'employeeNumber': '003', 'supervisorEId': '1'},
+            '4': {'id': '4', 'employeeNumber': '004', 'supervisor_e_id': '2'},
+            '5': {'id': '5', 'employeeNumber': '005', 'supervisorId': '002'},
+            '6': {'id': '6', 'employeeNumber': '006'},
+        }
+
+    def test_queries(self):
+        org = OrgChart(self.employees)
+        self.assertEqual(['1', '6'], sorted(org.roots()))
+        self.assertTrue(org.is_ancestor(1, 5))
+        self.assertTrue(org.is_ancestor('2', '4'))
+        self.assertFalse(org.is_ancestor('3', '4'))
+        self.assertFalse(org.is_ancestor('4', '4'))
+        self.assertEqual(['2', '3', '4', '5'], sorted(org.reports('1')))
+        self.assertEqual(['2', '3'], sorted(org.reports('1', direct=True)))
+        self.assertEqual(['2', '1'], org.chain('5'))
+        self.assertEqual((2, 4), org.span_of_control('1'))
+        self.assertEqual((0, 0), org.span_of_control('6'))
+
+    def test_incremental_changes(self):
+        org = OrgChart(self.employees)
+        org.set_supervisor('2', '3')
+        self.assertEqual(['3', '1'], org.chain('2'))
+        self.assertTrue(org.is_ancestor('3', '5'))
+        self.assertEqual((1, 3), org.span_of_control('3'))
+        self.assertRaises(UserWarning, org.set_supervisor, '3', '4')
+
+        # An unknown supervisor is refused, leaving the employee where they were
+        self.assertRaises(KeyError, org.set_supervisor, '4', '99')
+        self.assertRaises(KeyError, org.set_supervisor, '7', '99')
+        self.assertEqual('2', org.supervisor('4'))
+        self.assertNotIn('7', org)
+
+        org.remove('2')
+        self.assertEqual(['3', '4', '5'], sorted(org.reports('1')))
+        self.assertEqual('3', org.supervisor('4'))
+        self.assertNotIn('2', org)
+
+    def test_cycles_are_cut(self):
+        org = OrgChart({'1': {'supervisorEId': '2'}, '2': {'supervisorEId': '1'}})
+        self.assertEqual(1, len(org.roots()))
+        self.assertEqual(2, len(org))
+
+    def test_chain_stops_at_cycle(self):
+        org = OrgChart({'1': {'supervisorEId': '2'}, '2': {'supervisorEId': '1'}})
+        self.assertEqual(['2'], org.chain('1'))
+        self.assertEqual(['1'], org.chain('2'))
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for the parse executor
+"""
+
+import httpretty
+import os
+import sys
+import unittest
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import PyBambooHR, ParseExecutor
+
+
+def parsed_in(data):
+    return os.getpid()
+
+
+class test_parsing(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.parser = ParseExecutor(max_workers=1, threshold=100)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.parser.shutdown()
+
+    def test_threshold(self):
+        self.assertEqual(os.getpid(), self.parser.parse(parsed_in, b'small'))
+        self.assertNotEqual(os.getpid(), self.parser.parse(parsed_in, b'x' * 100))
+
+    @httpretty.activate
+    def test_get_tabular_data(self):
+        xml = """<?xml version="1.0"?>
+                 <table>
+                     <row id="321" employeeId="123">
+                         <field id="customTypeA">Value A</field>
+                         <field id="customTypeB">Value B</field>
+                     </row>
+                 </table>"""
+        httpretty.register_uri(httpretty.GET,
+                               "https://api.bamboohr.com/api/gateway.php/test/v1/employees/123/tables/customTable",
+                               body=xml,
+                               content_type="application/xml")
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', parse_executor=self.parser)
+        table = bamboo.get_tabular_data('customTable', 123)
+        self.assertEqual({'123': [{'customTypeA': 'Value A', 'customTypeB': 'Value B', 'row_id': '321'}]}, table)
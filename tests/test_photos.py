@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for the photo cache
+"""
+
+import httpretty
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import PyBambooHR, PhotoCache
+
+
+class test_photos(unittest.TestCase):
+    # Used to store the cached instance of PyBambooHR
+    bamboo = None
+
+    def setUp(self):
+        if self.bamboo is None:
+            self.bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey')
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @httpretty.activate
+    def test_photo_cache_hit(self):
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/123/photo/small",
+                               body=b'JPEGDATA', content_type="image/jpeg", adding_headers={'ETag': '"abc"'})
+
+        cache = PhotoCache(self.bamboo, self.directory)
+        self.assertEqual((b'JPEGDATA', 'image/jpeg'), cache.get(123))
+        self.assertEqual((b'JPEGDATA', 'image/jpeg'), cache.get(123))
+        self.assertEqual(1, len(httpretty.latest_requests()))
+
+        # The index survives a new cache instance
+        cache = PhotoCache(self.bamboo, self.directory)
+        self.assertEqual((b'JPEGDATA', 'image/jpeg'), cache.get(123))
+        self.assertEqual(1, len(httpretty.latest_requests()))
+
+    @httpretty.activate
+    def test_photo_cache_revalidation(self):
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/123/photo/small",
+                               responses=[httpretty.Response(body='JPEGDATA', content_type="image/jpeg", adding_headers={'ETag': '"abc"'}),
+                                          httpretty.Response(body='', status=304)])
+
+        cache = PhotoCache(self.bamboo, self.directory, max_age=0)
+        cache.get(123)
+        self.assertEqual((b'JPEGDATA', 'image/jpeg'), cache.get(123))
+        self.assertEqual(2, len(httpretty.latest_requests()))
+        self.assertEqual('"abc"', httpretty.last_request().headers['If-None-Match'])
+
+    @httpretty.activate
+    def test_photo_cache_eviction_and_prefetch(self):
+        for employee_id in (1, 2, 3):
+            httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/{0}/photo/small".format(employee_id),
+                                   body='PHOTO{0}'.format(employee_id), content_type="image/png")
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/4/photo/small",
+                               body='', status=404)
+
+        cache = PhotoCache(self.bamboo, self.directory, max_bytes=12, max_workers=2)
+        results = cache.prefetch_photos([1, 2, 3, 4])
+        self.assertIsNone(results[(1, 'small')])
+        self.assertIsNotNone(results[(4, 'small')])
+
+        # Only two 6 byte photos fit
+        self.assertEqual(2, len(cache._entries))
+        self.assertEqual(2, len(os.listdir(os.path.join(self.directory, 'blobs'))))
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for the multi-tenant client pool
+"""
+
+import httpretty
+import io
+import os
+import sys
+import threading
+import time
+import unittest
+
+from json import dumps
+
+import requests
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import BambooClientPool
+
+
+class FakeSession(object):
+    """
+    A session answering every request with an empty JSON list.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        r = requests.Response()
+        r.status_code = 200
+        r._content = b'[]'
+        r.raw = io.BytesIO()
+        return r
+
+
+class test_pool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = BambooClientPool(max_workers=1)
+        self.pool.add_tenant('big', 'big', 'testingnotrealapikey')
+        self.pool.add_tenant('small', 'small', 'testingnotrealapikey')
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_clients_share_connection_pool(self):
+        big, small = self.pool.client('big'), self.pool.client('small')
+        self.assertEqual('https://api.bamboohr.com/api/gateway.php/small/v1/', small.base_url)
+        self.assertIsNot(big.session, small.session)
+        self.assertIs(big.session.get_adapter('https://api.bamboohr.com/'), small.session.get_adapter('https://api.bamboohr.com/'))
+        self.assertRaises(UserWarning, self.pool.add_tenant, 'big', 'big', 'testingnotrealapikey')
+
+    def test_fair_scheduling(self):
+        order = []
+        gate = threading.Event()
+
+        def job(client, label):
+            gate.wait()
+            order.append(label)
+
+        futures = [self.pool.submit('big', job, 'big{0}'.format(i)) for i in range(6)]
+        futures += [self.pool.submit('small', job, 'small{0}'.format(i)) for i in range(2)]
+        gate.set()
+        for future in futures:
+            future.result()
+
+        # The small tenant does not wait behind the whole backlog of the big one
+        self.assertLess(order.index('small1'), 5)
+
+        metrics = self.pool.metrics()
+        self.assertEqual(6, metrics['big']['completed'])
+        self.assertEqual(0, metrics['small']['queued'])
+
+    def test_concurrency_cap_and_errors(self):
+        pool = BambooClientPool(max_workers=4, max_concurrency=2)
+        pool.add_tenant('tenant', 'tenant', 'testingnotrealapikey')
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def job(client):
+            with lock:
+                running[0] += 1
+                running[1] = max(running[1], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+        def fail(client):
+            raise ValueError('boom')
+
+        futures = [pool.submit('tenant', job) for i in range(8)]
+        failed = pool.submit('tenant', fail)
+        for future in futures:
+            future.result()
+        self.assertRaises(ValueError, failed.result)
+        pool.shutdown()
+
+        self.assertEqual(2, running[1])
+        self.assertEqual(1, pool.metrics('tenant')['failed'])
+
+    @httpretty.activate
+    def test_submit_client_method(self):
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/small/v1/meta/lists/",
+                               body=dumps([{"fieldId": 1, "alias": "department"}]), content_type="application/json")
+
+        result = self.pool.submit('small', 'get_meta_lists').result()
+        self.assertEqual('department', result[0]['alias'])
+
+    @httpretty.activate
+    def test_rate_counts_requests(self):
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/limited/v1/meta/lists/",
+                               body=dumps([]), content_type="application/json")
+        pool = BambooClientPool(max_workers=1)
+        pool.add_tenant('limited', 'limited', 'testingnotrealapikey', rate=10)
+
+        def job(client):
+            for _ in range(13):
+                client.get_meta_lists()
+
+        started = time.time()
+        pool.submit('limited', job).result()
+        pool.shutdown()
+        # A burst of 10 requests, then the 3 others at 10 per second
+        self.assertGreaterEqual(time.time() - started, 0.25)
+        self.assertEqual(13, pool.metrics('limited')['requests'])
+
+    def test_own_session_and_throttled_jobs_step_aside(self):
+        pool = BambooClientPool(max_workers=1)
+        session = FakeSession()
+        client = pool.add_tenant('limited', 'limited', 'testingnotrealapikey', rate=4, session=session)
+        pool.add_tenant('other', 'other', 'testingnotrealapikey')
+        self.assertIs(session, client.session.session)
+
+        def job(client):
+            for _ in range(8):
+                client.get_meta_lists()
+
+        limited = pool.submit('limited', job)
+        time.sleep(0.1)
+        # The only worker is waiting for tokens of the limited tenant, the other one is not held up
+        self.assertEqual('done', pool.submit('other', lambda client: 'done').result(timeout=0.5))
+        self.assertFalse(limited.done())
+        limited.result()
+        pool.shutdown()
+        self.assertEqual(8, session.calls)
+        self.assertEqual(8, pool.metrics('limited')['requests'])
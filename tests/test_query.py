@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for employee indexes
+"""
+
+import datetime
+import httpretty
+import os
+import sys
+import unittest
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import PyBambooHR, EmployeeIndex
+
+
+class test_query(unittest.TestCase):
+
+    def setUp(self):
+        self.employees = {
+            '1': {'id': '1', 'department': 'Sales', 'location': 'Here', 'hireDate': '2010-12-15', 'terminationDate': '0000-00-00'},
+            '2': {'id': '2', 'department': 'Sales', 'location': 'There', 'hireDate': '2014-01-01', 'terminationDate': '2015-01-01'},
+            '3': {'id': '3', 'department': 'IT', 'location': 'Here', 'hireDate': '2014-06-01', 'terminationDate': None},
+        }
+
+    def test_filters(self):
+        index = EmployeeIndex(self.employees)
+        self.assertEqual(['1', '2'], [e['id'] for e in index.filter(department='Sales')])
+        self.assertEqual(set(['1', '3']), index.ids(location='Here'))
+        self.assertEqual(set(['1', '2', '3']), index.ids(department__in=['Sales', 'IT']))
+        self.assertEqual(set(['2', '3']), index.ids(hire_date__gte='2014-01-01'))
+        self.assertEqual(set(['3']), index.ids(hireDate__gt=datetime.date(2014, 1, 1)))
+        self.assertEqual(set(['1']), index.ids(hireDate__lt='2014-01-01'))
+        self.assertEqual(set(['2']), index.ids(department='Sales', hireDate__between=('2013-01-01', '2014-12-31')))
+        self.assertEqual(set(['2']), index.ids(terminationDate__lte='2020-01-01'))
+
+        # Fields which are not indexed still work
+        self.assertEqual(set(['3']), index.ids(location='Here', id='3'))
+        self.assertEqual(set(), index.ids(department='Nobody'))
+
+    def test_invalid_date_criteria(self):
+        index = EmployeeIndex(self.employees, date_fields=['hireDate'])
+        self.assertRaises(UserWarning, index.ids, hireDate__gte=None)
+        self.assertRaises(UserWarning, index.ids, hireDate='not a date')
+        self.assertRaises(UserWarning, index.ids, hireDate__between=('2014-01-01', None))
+        # Date criteria on fields without an index are checked the same way
+        self.assertRaises(UserWarning, index.ids, terminationDate__lt='2014-13-45')
+
+    def test_incremental_updates(self):
+        index = EmployeeIndex(self.employees)
+        index.update('1', {'department': 'IT', 'hireDate': '2015-01-01'})
+        self.assertEqual(set(['1', '3']), index.ids(department='IT'))
+        self.assertEqual(set(['1']), index.ids(hireDate__gte='2015-01-01'))
+
+        index.remove('3')
+        self.assertEqual(set(['1']), index.ids(department='IT'))
+        self.assertEqual(2, len(index))
+
+    @httpretty.activate
+    def test_client_keeps_index_in_sync(self):
+        httpretty.register_uri(httpretty.POST, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/3", body='', status='200')
+
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey')
+        bamboo.employees = self.employees
+        index = bamboo.index_employees(hash_fields=['department'])
+        bamboo.update_employee(3, {'department': 'Sales'})
+        self.assertEqual(set(['1', '2', '3']), index.ids(department='Sales'))
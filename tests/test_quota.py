@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for call accounting and call budgets
+"""
+
+import os
+import sys
+import time
+import unittest
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import PyBambooHR, CallBudgetExceeded, CallStats, CircuitOpenError, ResilientSession
+from fakes import FakeBambooSession
+
+
+def fake_session():
+    return FakeBambooSession(dict((str(i), {'firstName': 'Name {0}'.format(i)}) for i in range(1, 6)))
+
+
+class SlowFirstSession(FakeBambooSession):
+    """
+    Takes a second to answer the first request, so ResilientSession hedges it.
+    """
+
+    def __init__(self):
+        FakeBambooSession.__init__(self, {'1': {'firstName': 'Name'}})
+
+    def request(self, method, url, **kwargs):
+        first = not self.urls
+        r = FakeBambooSession.request(self, method, url, **kwargs)
+        if first:
+            time.sleep(1)
+        return r
+
+
+class test_quota(unittest.TestCase):
+
+    def setUp(self):
+        self.session = fake_session()
+        self.bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=self.session)
+
+    def test_calls_are_counted_per_endpoint(self):
+        self.bamboo.get_employee(1, field_list=['firstName'])
+        self.bamboo.get_employee(2, field_list=['firstName'])
+
+        stats = self.bamboo.call_stats.to_dict()
+        self.assertEqual(2, stats['calls'])
+        endpoint = stats['endpoints']['GET /api/gateway.php/test/v1/employees/{id}']
+        self.assertEqual(2, endpoint['calls'])
+        self.assertEqual(stats['bytes_received'], endpoint['bytes_received'])
+        self.assertTrue(stats['bytes_received'] > 0)
+        self.assertIsNone(self.bamboo.remaining_calls())
+
+    def test_scopes_nest(self):
+        with self.bamboo.call_scope('job') as job:
+            self.bamboo.get_employee(1, field_list=['firstName'])
+            with self.bamboo.call_scope('step') as step:
+                self.bamboo.get_all_employees(field_list=['firstName'])
+        self.bamboo.get_employee(1, field_list=['firstName'])
+
+        self.assertEqual(7, step.calls)
+        self.assertEqual(8, job.calls)
+        self.assertEqual(9, self.bamboo.call_stats.calls)
+
+    def test_budget_fails_fast(self):
+        with self.bamboo.call_scope('job', budget=2) as job:
+            self.bamboo.get_employee(1, field_list=['firstName'])
+            self.assertEqual(1, self.bamboo.remaining_calls())
+            self.bamboo.get_employee(2, field_list=['firstName'])
+            self.assertRaises(CallBudgetExceeded, self.bamboo.get_employee, 3, field_list=['firstName'])
+        self.assertEqual(2, job.calls)
+        self.assertEqual(2, len(self.session.urls))
+        self.assertEqual(2, self.bamboo.call_stats.calls)
+
+    def test_client_budget(self):
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=self.session, call_budget=1)
+        bamboo.get_employee(1, field_list=['firstName'])
+        self.assertRaises(CallBudgetExceeded, bamboo.get_employee, 1, field_list=['firstName'])
+        self.assertEqual(0, bamboo.remaining_calls())
+
+    def test_get_all_employees_uses_report_when_budget_is_short(self):
+        with self.bamboo.call_scope(budget=5) as job:
+            employees = self.bamboo.get_all_employees(field_list=['firstName'])
+        self.assertEqual(3, job.calls)
+        self.assertEqual(['1', '2', '3', '4', '5'], sorted(employees))
+        self.assertEqual('Name 3', employees['3']['firstName'])
+        self.assertIn('reports/custom', self.session.urls[-1])
+
+    def test_collection_uses_report_when_budget_is_short(self):
+        collection = self.bamboo.employee_collection()
+        with self.bamboo.call_scope(budget=2) as job:
+            self.assertEqual('Name 1', collection['1']['firstName'])
+        self.assertEqual(1, job.calls)
+
+    def test_worker_threads_count_in_scope(self):
+        collection = self.bamboo.employee_collection(report_threshold=10)
+        with self.bamboo.call_scope() as job:
+            collection.load('firstName')
+        self.assertEqual(5, job.calls)
+
+    def test_hedged_requests_are_counted(self):
+        session = SlowFirstSession()
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey',
+                            session=ResilientSession(session, hedge=True, hedge_delay=0.05))
+        bamboo.get_employee(1, field_list=['firstName'])
+        self.assertEqual(2, len(session.urls))
+        self.assertEqual(2, bamboo.call_stats.calls)
+
+    def test_budget_stops_hedging(self):
+        session = SlowFirstSession()
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey',
+                            session=ResilientSession(session, hedge=True, hedge_delay=0.05))
+        with bamboo.call_scope(budget=1) as job:
+            bamboo.get_employee(1, field_list=['firstName'])
+        self.assertEqual(1, len(session.urls))
+        self.assertEqual(1, job.calls)
+
+    def test_open_circuit_is_not_counted(self):
+        session = ResilientSession(fake_session())
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=session)
+        url = bamboo.base_url + 'employees/1'
+        session._open(session._circuit('GET /api/gateway.php/test/v1/employees/{id}'))
+        self.assertRaises(CircuitOpenError, bamboo.get_employee, 1)
+        self.assertEqual(0, bamboo.call_stats.calls)
+        self.assertEqual('open', session.state('GET', url))
+
+    def test_cancelled_call_is_not_counted(self):
+        stats = CallStats(limit=1)
+        stats.start('GET /x')
+        self.assertRaises(CallBudgetExceeded, stats.start, 'GET /x')
+        stats.cancel('GET /x')
+        self.assertEqual(0, stats.calls)
+        self.assertEqual(1, stats.remaining())
+
+
+if __name__ == "__main__":
+    unittest.main()
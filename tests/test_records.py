@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for lazy employee records
+"""
+
+import datetime
+import httpretty
+import json
+import os
+import sys
+import unittest
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import PyBambooHR, LazyRecord, utils
+
+
+class test_records(unittest.TestCase):
+
+    def setUp(self):
+        self.raw = {'id': '123', 'firstName': 'Test', 'supervisorEId': '2', 'address1': 'Here',
+                    'hireDate': '2010-12-15', 'nested': {'customField': 'x'}}
+
+    def test_underscore_keys(self):
+        record = LazyRecord(dict(self.raw), underscore_keys=True)
+        self.assertEqual(utils.underscore_keys(self.raw), record)
+        self.assertEqual('Test', record['first_name'])
+        self.assertEqual('Test', record['firstName'])
+        self.assertEqual('2', record['supervisor_e_id'])
+        self.assertEqual('x', record['nested']['custom_field'])
+        self.assertNotIn('last_name', record)
+        self.assertRaises(KeyError, lambda: record['last_name'])
+
+        record.update({'last_name': 'Person', 'first_name': 'Another'})
+        self.assertEqual('Person', record['last_name'])
+        self.assertEqual('Another', record['first_name'])
+        del record['address1']
+        self.assertNotIn('address1', record)
+        self.assertEqual(6, len(record))
+        self.assertEqual(record.to_dict(), json.loads(json.dumps(record.to_dict())))
+
+    def test_values_are_decoded_once(self):
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey')
+        record = LazyRecord(self.raw, decoder=bamboo.record_decoder())
+        self.assertEqual(datetime.date(2010, 12, 15), record['hireDate'])
+        self.assertIs(record['hireDate'], record['hireDate'])
+        self.assertEqual(123, record['id'])
+        # Nothing is decoded in the wrapped record
+        self.assertEqual('2010-12-15', self.raw['hireDate'])
+
+    @httpretty.activate
+    def test_get_employee(self):
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/employees/123",
+                               body=json.dumps(self.raw), content_type="application/json")
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', underscore_keys=True,
+                            lazy_records=True, typed_records=True)
+        employee = bamboo.get_employee(123)
+        self.assertIsInstance(employee, LazyRecord)
+        self.assertEqual(datetime.date(2010, 12, 15), employee['hire_date'])
+        self.assertEqual(2, employee['supervisor_e_id'])
+
+        bamboo.lazy_records = False
+        employee = bamboo.get_employee(123)
+        self.assertIsInstance(employee, dict)
+        self.assertEqual(datetime.date(2010, 12, 15), employee['hire_date'])
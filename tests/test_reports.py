@@ -18,7 +18,8 @@ from json import dumps
 # Force parent directory onto path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from PyBambooHR import PyBambooHR
+from PyBambooHR import PyBambooHR, reports
+from fakes import FakeBambooSession
 
 class test_reports(unittest.TestCase):
     # Used to store the cached instance of PyBambooHR
@@ -72,3 +73,45 @@ class test_reports(unittest.TestCase):
 
         self.assertRaises(UserWarning, self.bamboo.request_custom_report, 1, report_format='gif')
 
+
+    def test_split_fields(self):
+        self.assertEqual([['id', 'a', 'b'], ['id', 'c']], reports.split_fields(['a', 'id', 'b', 'c', 'a'], 2))
+        self.assertEqual([['id']], reports.split_fields([], 2))
+        self.assertRaises(UserWarning, reports.split_fields, ['a'], 0)
+
+    def test_request_chunked_custom_report(self):
+        # The chunks are requested concurrently, so the fake session stands in for httpretty
+        rows = {"123": {"firstName": "Test", "lastName": "Person", "hireDate": "2010-12-15"},
+                "124": {"firstName": "Someother", "lastName": "Guy", "hireDate": "2008-10-13"}}
+
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=FakeBambooSession(rows))
+        result = bamboo.request_chunked_custom_report(['firstName', 'last_name', 'hireDate'], chunk_width=2, title='Wide')
+        self.assertEqual(['firstName', 'lastName', 'hireDate'], [f['id'] for f in result['fields']])
+        self.assertEqual([dict(rows['123'], id='123'), dict(rows['124'], id='124')], result['employees'])
+
+    @httpretty.activate
+    def test_get_cached_custom_report(self):
+        full = {"fields": [{"id": "firstName"}], "employees": [{"id": "123", "firstName": "Test"}, {"id": "124", "firstName": "Other"}]}
+        changed = {"fields": [{"id": "firstName"}], "employees": [{"id": "124", "firstName": "Changed"}]}
+        reconciled = {"fields": [{"id": "firstName"}], "employees": [{"id": "124", "firstName": "Changed"}]}
+        httpretty.register_uri(httpretty.POST, "https://api.bamboohr.com/api/gateway.php/test/v1/reports/custom/?format=json",
+                               responses=[httpretty.Response(body=dumps(full)), httpretty.Response(body=dumps(changed)),
+                                          httpretty.Response(body=dumps(reconciled))],
+                               content_type="application/json")
+
+        rows = self.bamboo.get_cached_custom_report(['firstName'])
+        self.assertEqual(['123', '124'], sorted(rows))
+        self.assertNotIn(b'lastChanged', httpretty.last_request().body)
+
+        # Only changed rows are requested and merged in
+        first = rows
+        rows = self.bamboo.get_cached_custom_report(['first_name', 'id'])
+        self.assertIn(b'<lastChanged includeNull="no">', httpretty.last_request().body)
+        self.assertEqual('Other', first['124']['firstName'])
+        self.assertEqual('Test', rows['123']['firstName'])
+        self.assertEqual('Changed', rows['124']['firstName'])
+        self.assertEqual(1, len(self.bamboo.cached_reports))
+
+        # A full reconcile drops deleted employees
+        rows = self.bamboo.get_cached_custom_report(['firstName'], full=True)
+        self.assertEqual(['124'], sorted(rows))
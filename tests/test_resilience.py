@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for the circuit breaker and hedged requests
+"""
+
+import io
+import os
+import sys
+import threading
+import time
+import unittest
+
+import requests
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import PyBambooHR, CircuitOpenError, ResilientSession
+from PyBambooHR.resilience import endpoint_key
+
+
+class FakeSession(object):
+    """
+    Answers every request with the next (status, delay) of a script, repeating the last one.
+    """
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        with self._lock:
+            status, delay = self.script[min(self.calls, len(self.script) - 1)]
+            self.calls += 1
+        time.sleep(delay)
+        if status is None:
+            raise requests.exceptions.ConnectTimeout("timed out")
+        r = requests.Response()
+        r.status_code = status
+        r._content = b'{"id": "123"}'
+        r.raw = io.BytesIO()
+        r.url = url
+        return r
+
+    def close(self):
+        pass
+
+
+class test_resilience(unittest.TestCase):
+
+    def test_endpoint_key(self):
+        self.assertEqual('GET /api/gateway.php/test/v1/employees/{id}/tables/jobInfo',
+                         endpoint_key('get', 'https://api.bamboohr.com/api/gateway.php/test/v1/employees/123/tables/jobInfo'))
+
+    def test_circuit_breaker(self):
+        url = 'https://api.bamboohr.com/api/gateway.php/test/v1/employees/123'
+        fake = FakeSession([(503, 0), (None, 0), (200, 0)])
+        session = ResilientSession(fake, min_calls=2, error_rate=0.5, reset_timeout=0.05)
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=session)
+
+        self.assertRaises(requests.HTTPError, bamboo.get_employee, 123)
+        self.assertRaises(requests.ConnectTimeout, bamboo.get_employee, 123)
+        self.assertEqual('open', session.state('GET', url))
+        self.assertRaises(CircuitOpenError, bamboo.get_employee, 456)
+        self.assertEqual(2, fake.calls)
+        # Other endpoints are not affected
+        self.assertEqual('closed', session.state('GET', url + '/tables/jobInfo'))
+
+        time.sleep(0.06)
+        self.assertEqual('half-open', session.state('GET', url))
+        self.assertEqual('123', bamboo.get_employee(123)['id'])
+        self.assertEqual('closed', session.state('GET', url))
+
+    def test_slow_calls_open_the_circuit(self):
+        url = 'https://api.bamboohr.com/api/gateway.php/test/v1/meta/users/'
+        session = ResilientSession(FakeSession([(200, 0.02)]), min_calls=2, slow_call=0.01)
+        session.request('GET', url)
+        session.request('GET', url)
+        self.assertRaises(CircuitOpenError, session.request, 'GET', url)
+
+    def test_hedged_request(self):
+        url = 'https://api.bamboohr.com/api/gateway.php/test/v1/employees/123'
+        fake = FakeSession([(200, 1.0), (200, 0)])
+        session = ResilientSession(fake, hedge=True, hedge_delay=0.05)
+        started = time.time()
+        self.assertEqual(200, session.request('GET', url).status_code)
+        self.assertLess(time.time() - started, 0.5)
+        self.assertEqual(2, fake.calls)
+
+    def test_busy_pools_skip_hedging(self):
+        url = 'https://api.bamboohr.com/api/gateway.php/test/v1/employees/123'
+        for kwargs in ({'max_workers': 4, 'max_hedges': 1}, {'max_workers': 1, 'max_hedges': 4}):
+            fake = FakeSession([(200, 0.3)])
+            session = ResilientSession(fake, hedge=True, hedge_delay=0.05, **kwargs)
+            threads = [threading.Thread(target=session.request, args=('GET', url)) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            # Only one of the two requests could be hedged
+            self.assertEqual(3, fake.calls)
+            session.close()
+
+    def test_writes_are_not_hedged(self):
+        url = 'https://api.bamboohr.com/api/gateway.php/test/v1/employees/123'
+        # Writes are never hedged
+        fake = FakeSession([(200, 0.1)])
+        session = ResilientSession(fake, hedge=True, hedge_delay=0.01)
+        session.request('POST', url)
+        self.assertEqual(1, fake.calls)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for employee snapshots
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import Snapshot
+
+
+class test_snapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'employees.snap')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_round_trip(self):
+        employees = dict((str(i), {'id': str(i), 'firstName': u'T\xe9st {0}'.format(i), 'department': 'Sales',
+                                   'age': i, 'photoUploaded': i % 2 == 0, 'division': None, 'workEmail': ''})
+                         for i in range(1, 200))
+        employees['5']['custom'] = {'nested': [1, 2]}
+        del employees['7']['department']
+        Snapshot.write(self.path, employees)
+
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(199, len(snapshot))
+            self.assertEqual(sorted(employees), sorted(snapshot))
+            self.assertEqual(employees['123'], snapshot['123'])
+            self.assertEqual(employees['123'], snapshot[123].to_dict())
+            self.assertEqual(u'T\xe9st 42', snapshot['42']['firstName'])
+            self.assertEqual({'nested': [1, 2]}, snapshot['5']['custom'])
+            self.assertIsNone(snapshot['5']['division'])
+            self.assertEqual('', snapshot['5']['workEmail'])
+            self.assertTrue(snapshot['2']['photoUploaded'])
+            self.assertNotIn('department', snapshot['7'])
+            self.assertNotIn('custom', snapshot['6'])
+            self.assertRaises(KeyError, lambda: snapshot['7']['department'])
+            self.assertNotIn('1000', snapshot)
+
+    def test_bytes_values(self):
+        Snapshot.write(self.path, {'1': {'note': u'caf\xe9'.encode('utf-8'), 'photo': b'\xff\xd8\xff\xe0'}})
+        with Snapshot(self.path) as snapshot:
+            # UTF-8 bytes come back as text, anything else as the same bytes
+            self.assertEqual(u'caf\xe9', snapshot['1']['note'])
+            self.assertEqual(b'\xff\xd8\xff\xe0', snapshot['1']['photo'])
+
+    def test_not_a_snapshot(self):
+        with open(self.path, 'wb') as handle:
+            handle.write(b'x' * 100)
+        self.assertRaises(UserWarning, Snapshot, self.path)
+        with open(self.path, 'wb') as handle:
+            handle.write(b'x')
+        self.assertRaises(UserWarning, Snapshot, self.path)
+
+    def test_truncated_snapshot(self):
+        Snapshot.write(self.path, {'1': {'id': '1', 'firstName': 'Test'}, '2': {'id': '2', 'firstName': 'Other'}})
+        with open(self.path, 'rb') as handle:
+            data = handle.read()
+        for size in (len(data) - 1, len(data) // 2, 70):
+            with open(self.path, 'wb') as handle:
+                handle.write(data[:size])
+            self.assertRaises(UserWarning, Snapshot, self.path)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for the table mirror
+"""
+
+import datetime
+import httpretty
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from json import dumps
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import PyBambooHR, TableMirror
+
+TABLE_URL = "https://api.bamboohr.com/api/gateway.php/test/v1/employees/all/tables/jobInfo"
+CHANGED_URL = "https://api.bamboohr.com/api/gateway.php/test/v1/employees/changed/tables/jobInfo"
+
+TABLE_XML = """<?xml version="1.0"?>
+<table>
+  <row id="1" employeeId="100">
+    <field id="date">2010-06-01</field>
+    <field id="jobTitle">Developer</field>
+  </row>
+  <row id="2" employeeId="100">
+    <field id="date">2012-01-01</field>
+    <field id="jobTitle">Lead</field>
+  </row>
+  <row id="3" employeeId="200">
+    <field id="date">2011-02-01</field>
+    <field id="jobTitle">Designer</field>
+  </row>
+</table>"""
+
+
+class test_tables(unittest.TestCase):
+    # Used to store the cached instance of PyBambooHR
+    bamboo = None
+
+    def setUp(self):
+        if self.bamboo is None:
+            self.bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey')
+        self.directory = tempfile.mkdtemp()
+        self.state = os.path.join(self.directory, 'tables.json')
+
+        self.changes = {"latest": "2014-01-02T10:00:00+00:00", "employees": {
+            "100": {"lastChanged": "2014-01-02T10:00:00+00:00", "rows": [
+                {"id": "1", "date": "2010-06-01", "jobTitle": "Developer"},
+                {"id": "2", "date": "2012-01-01", "jobTitle": "Lead"},
+                {"id": "4", "date": "2014-01-01", "jobTitle": "Manager"},
+            ]},
+        }}
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @httpretty.activate
+    def test_first_sync_loads_table(self):
+        httpretty.register_uri(httpretty.GET, TABLE_URL, body=TABLE_XML, content_type="application/xml")
+
+        mirror = self.bamboo.table_mirror(['jobInfo'])
+        self.assertIsNone(mirror.since('jobInfo'))
+        self.assertEqual({'jobInfo': ['100', '200']}, mirror.sync())
+
+        self.assertEqual(['1', '2'], [r['row_id'] for r in mirror.rows('jobInfo', 100)])
+        self.assertEqual('Designer', mirror.row('jobInfo', '200', '3')['jobTitle'])
+        self.assertEqual('Developer', mirror.current('jobInfo', '100', on='2011-01-01')['jobTitle'])
+        self.assertEqual('Lead', mirror.current('jobInfo', '100')['jobTitle'])
+        self.assertIsNone(mirror.current('jobInfo', '200', on=datetime.date(2000, 1, 1)))
+        self.assertIsNotNone(mirror.since('jobInfo'))
+
+    @httpretty.activate
+    def test_sync_applies_changes(self):
+        httpretty.register_uri(httpretty.GET, TABLE_URL, body=TABLE_XML, content_type="application/xml")
+        httpretty.register_uri(httpretty.GET, CHANGED_URL, body=dumps(self.changes), content_type="application/json")
+
+        mirror = TableMirror(self.bamboo, ['jobInfo'])
+        mirror.sync()
+        mirror._since['jobInfo'] = datetime.datetime(2014, 1, 1)
+
+        self.assertEqual({'jobInfo': ['100']}, mirror.sync())
+        self.assertEqual(['1', '2', '4'], [r['row_id'] for r in mirror.rows('jobInfo', '100')])
+        self.assertEqual('Manager', mirror.current('jobInfo', '100')['jobTitle'])
+        self.assertEqual(['3'], [r['row_id'] for r in mirror.rows('jobInfo', '200')])
+        self.assertEqual(datetime.datetime(2014, 1, 2, 10), mirror.since('jobInfo'))
+        self.assertEqual('2014-01-01T00:00:00Z', httpretty.last_request().querystring['since'][0])
+
+        # Applying the same change again changes nothing
+        mirror._since['jobInfo'] = datetime.datetime(2014, 1, 1)
+        mirror.sync()
+        self.assertEqual(3, len(mirror.table('jobInfo')['100']))
+
+    @httpretty.activate
+    def test_rows_without_id_keep_row_id_by_date(self):
+        httpretty.register_uri(httpretty.GET, TABLE_URL, body=TABLE_XML, content_type="application/xml")
+        changes = {"employees": {"200": {"lastChanged": "2014-01-03T00:00:00+00:00", "rows": [
+            {"date": "2011-02-01", "jobTitle": "Senior Designer"},
+        ]}}}
+        httpretty.register_uri(httpretty.GET, CHANGED_URL, body=dumps(changes), content_type="application/json")
+
+        mirror = TableMirror(self.bamboo, ['jobInfo'])
+        mirror.sync()
+        mirror._since['jobInfo'] = datetime.datetime(2014, 1, 1)
+        mirror.sync()
+
+        self.assertEqual('Senior Designer', mirror.row('jobInfo', '200', '3')['jobTitle'])
+        self.assertEqual(datetime.datetime(2014, 1, 3), mirror.since('jobInfo'))
+
+    def test_rows_without_id_on_the_same_date(self):
+        previous = {'5': {'row_id': '5', 'date': '2020-01-01', 'rate': 'a'}}
+        keyed = TableMirror._keyed([{'date': '2020-01-01', 'rate': 'b'}, {'date': '2020-01-01', 'rate': 'c'}], previous)
+        self.assertEqual(2, len(keyed))
+        self.assertEqual('b', keyed['5']['rate'])
+        self.assertEqual(['b', 'c'], sorted(r['rate'] for r in keyed.values()))
+
+    @httpretty.activate
+    def test_state_is_saved_and_resumed(self):
+        httpretty.register_uri(httpretty.GET, TABLE_URL, body=TABLE_XML, content_type="application/xml")
+        httpretty.register_uri(httpretty.GET, CHANGED_URL, body=dumps(self.changes), content_type="application/json")
+
+        mirror = TableMirror(self.bamboo, ['jobInfo'], state_path=self.state)
+        mirror.sync()
+        since = mirror.since('jobInfo')
+
+        resumed = TableMirror(self.bamboo, ['jobInfo'], state_path=self.state)
+        self.assertEqual(since, resumed.since('jobInfo'))
+        self.assertEqual(mirror.table('jobInfo'), resumed.table('jobInfo'))
+
+        resumed.sync()
+        # The second mirror only asked for the changes, it did not download the table again
+        self.assertEqual(CHANGED_URL.split('gateway.php')[1], httpretty.last_request().path.split('?')[0].split('gateway.php')[1])
+        self.assertEqual('Manager', resumed.current('jobInfo', '100')['jobTitle'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Stress test of one PyBambooHR instance shared by many threads
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+import unittest
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import PyBambooHR
+from fakes import FakeBambooSession
+
+EMPLOYEES = 50
+
+TABLES = b"""<?xml version="1.0"?>
+<tables>
+    <table alias="customTable1"><field id="5908" alias="custom1" type="date">Date</field></table>
+    <table alias="customTable2"><field id="5909" alias="custom2" type="text">Text</field></table>
+</tables>"""
+
+
+RECORDS = dict((str(i), {'department': 'Dept {0}'.format(i % 3)}) for i in range(EMPLOYEES))
+
+
+def fake_session():
+    return FakeBambooSession(RECORDS, jitter=0.002, tables=TABLES)
+
+
+def gated_session():
+    # get_employee calls wait until session.gate is set.
+    return FakeBambooSession(RECORDS, jitter=0.002, gate=threading.Event())
+
+
+class test_threadsafety(unittest.TestCase):
+
+    def test_reload_does_not_block_readers(self):
+        session = gated_session()
+        session.gate.set()
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=session)
+        bamboo.get_all_employees(field_list=['department'])
+        session.gate.clear()
+
+        reload = threading.Thread(target=bamboo.get_all_employees, kwargs={'field_list': ['department'], 'reloadEmployees': True})
+        reload.start()
+        time.sleep(0.05)
+
+        # Readers, writers and new indexes go on while the reload waits on the API
+        started = time.time()
+        self.assertEqual(EMPLOYEES, len(bamboo.get_all_employees(field_list=['department'])))
+        bamboo.update_employee('1', {'department': 'Moved'})
+        bamboo.index_employees(hash_fields=['department'])
+        self.assertLess(time.time() - started, 1)
+
+        session.gate.set()
+        reload.join()
+        # The update made meanwhile was kept
+        self.assertEqual(2 * EMPLOYEES, session.counts['employee'])
+        self.assertEqual('Moved', bamboo.employees['1']['department'])
+
+    def test_reloads_share_only_fresh_loads(self):
+        session = gated_session()
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=session)
+        first = threading.Thread(target=bamboo.get_all_employees, kwargs={'field_list': ['department'], 'reloadEmployees': True})
+        first.start()
+        time.sleep(0.05)
+        reloads = [threading.Thread(target=bamboo.get_all_employees, kwargs={'field_list': ['department'], 'reloadEmployees': True})
+                   for _ in range(3)]
+        for thread in reloads:
+            thread.start()
+        time.sleep(0.05)
+
+        session.gate.set()
+        for thread in [first] + reloads:
+            thread.join()
+        # The reloads asked for after the first load started shared one more fetch
+        self.assertEqual(2 * EMPLOYEES, session.counts['employee'])
+
+    def test_concurrent_loads_of_different_fields(self):
+        session = gated_session()
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=session)
+        results = {}
+
+        def load(field):
+            results[field] = bamboo.get_all_employees(field_list=[field], reloadEmployees=True)
+
+        threads = [threading.Thread(target=load, args=(field,)) for field in ('department', 'hireDate')]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        session.gate.set()
+        for thread in threads:
+            thread.join()
+
+        # Each call got the fields it asked for, from its own fetch
+        self.assertEqual({'id': '1', 'department': 'Dept 1'}, results['department']['1'])
+        self.assertEqual({'id': '1', 'hireDate': None}, results['hireDate']['1'])
+        self.assertEqual(2 * EMPLOYEES, session.counts['employee'])
+
+
+    def test_shared_instance(self):
+        session = fake_session()
+        bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey', session=session)
+        index = bamboo.index_employees(hash_fields=['department'])
+        errors = []
+        direct_calls = []
+        reloads = []
+        start = threading.Event()
+
+        def worker(seed):
+            rnd = random.Random(seed)
+            start.wait()
+            try:
+                for _ in range(40):
+                    action = rnd.random()
+                    if action < 0.4:
+                        reload = rnd.random() < 0.1
+                        if reload:
+                            reloads.append(1)
+                        employees = bamboo.get_all_employees(field_list=['department'], reloadEmployees=reload)
+                        # Whatever dictionary a thread gets is complete and stays consistent
+                        assert len(employees) == EMPLOYEES, len(employees)
+                        for employee_id, employee in list(employees.items()):
+                            assert employee['id'] == employee_id
+                    elif action < 0.6:
+                        employee_id = str(rnd.randrange(EMPLOYEES))
+                        bamboo.update_employee(employee_id, {'firstName': 'Thread {0}'.format(seed)})
+                    elif action < 0.7:
+                        assert bamboo.get_meta_tables()[0]['alias'] == 'customTable1'
+                    elif action < 0.8:
+                        bamboo.get_employee(rnd.randrange(EMPLOYEES), field_list=['department'])
+                        direct_calls.append(1)
+                    else:
+                        assert len(index.ids(department='Dept 0')) <= EMPLOYEES
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(16)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], errors)
+        employees = bamboo.get_all_employees()
+        self.assertEqual(EMPLOYEES, len(employees))
+        self.assertEqual(len([e for e in employees.values() if e['department'] == 'Dept 0']), len(index.ids(department='Dept 0')))
+        # Every load fetched each employee once, and threads waiting on a load did not start another one
+        loads = session.counts['employees/directory']
+        self.assertEqual(loads * EMPLOYEES + len(direct_calls), session.counts['employee'])
+        self.assertLessEqual(loads, 1 + len(reloads))
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+#encoding:utf-8
+#author:smeggingsmegger/Scott Blevins
+#project:PyBambooHR
+#repository:http://github.com/smeggingsmegger/PyBambooHR
+#license:agpl-3.0 (http://www.gnu.org/licenses/agpl-3.0.en.html)
+
+"""Unittests for time off indexes
+"""
+
+import datetime
+import httpretty
+import os
+import sys
+import unittest
+
+from json import dumps
+
+# Force parent directory onto path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyBambooHR import PyBambooHR, WhosOutIndex, TimeOffRequestCache, utils
+
+
+class test_time_off(unittest.TestCase):
+    # Used to store the cached instance of PyBambooHR
+    bamboo = None
+
+    def setUp(self):
+        if self.bamboo is None:
+            self.bamboo = PyBambooHR(subdomain='test', api_key='testingnotrealapikey')
+
+        self.entries = [
+            {"id": 1, "type": "timeOff", "employeeId": 123, "name": "Test Person", "start": "2014-01-01", "end": "2014-01-05"},
+            {"id": 2, "type": "timeOff", "employeeId": 124, "name": "Someother Guy", "start": "2014-01-04", "end": "2014-01-04"},
+            {"id": 3, "type": "holiday", "name": "Holiday", "start": "2014-01-10", "end": "2014-01-10"},
+            {"id": 4, "type": "timeOff", "employeeId": 123, "name": "Test Person", "start": "2014-01-09", "end": "2014-01-12"},
+        ]
+
+    def test_missing_date_ranges(self):
+        d = datetime.date
+        covered = utils.merge_date_ranges([(d(2014, 1, 5), d(2014, 1, 6)), (d(2014, 1, 1), d(2014, 1, 2)), (d(2014, 1, 3), d(2014, 1, 3))])
+        self.assertEqual([(d(2014, 1, 1), d(2014, 1, 3)), (d(2014, 1, 5), d(2014, 1, 6))], covered)
+
+        missing = utils.missing_date_ranges(covered, d(2013, 12, 30), d(2014, 1, 8))
+        self.assertEqual([(d(2013, 12, 30), d(2013, 12, 31)), (d(2014, 1, 4), d(2014, 1, 4)), (d(2014, 1, 7), d(2014, 1, 8))], missing)
+        self.assertEqual([], utils.missing_date_ranges(covered, d(2014, 1, 2), d(2014, 1, 3)))
+
+    def test_whos_out_index_queries(self):
+        index = WhosOutIndex(entries=self.entries)
+
+        self.assertEqual([1, 2], sorted(e['id'] for e in index.on('2014-01-04')))
+        self.assertEqual([3, 4], sorted(e['id'] for e in index.on(datetime.date(2014, 1, 10))))
+        self.assertEqual([], index.on('2014-01-07'))
+        self.assertEqual([1, 3, 4], sorted(e['id'] for e in index.between('2014-01-05', '2014-01-10')))
+        self.assertEqual([1, 2, 3, 4], sorted(e['id'] for e in index.between('2013-12-01', '2014-02-01')))
+
+        self.assertTrue(index.is_out(123, '2014-01-11'))
+        self.assertFalse(index.is_out(123, '2014-01-07'))
+        self.assertEqual([1, 4], [e['id'] for e in index.for_employee('123')])
+
+    @httpretty.activate
+    def test_whos_out_index_fetches_missing_windows(self):
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/time_off/whos_out",
+                               body=dumps(self.entries[:2]), content_type="application/json")
+
+        index = WhosOutIndex(self.bamboo)
+        self.assertEqual([1, 2], sorted(e['id'] for e in index.on('2014-01-04')))
+        self.assertEqual(1, len(httpretty.latest_requests()))
+
+        # Already covered, no new request
+        index.is_out(124, '2014-01-04')
+        self.assertEqual(1, len(httpretty.latest_requests()))
+
+        # Only the uncovered days are requested
+        index.between('2014-01-03', '2014-01-05')
+        self.assertEqual(3, len(httpretty.latest_requests()))
+        self.assertEqual({'start': ['2014-01-05'], 'end': ['2014-01-05']}, httpretty.last_request().querystring)
+        self.assertEqual(2, len(index.between('2014-01-03', '2014-01-05')))
+
+    @httpretty.activate
+    def test_time_off_request_cache(self):
+        requests = [
+            {"id": "1", "employeeId": "123", "status": {"status": "approved"}, "start": "2014-01-01", "end": "2014-01-05"},
+            {"id": "2", "employeeId": "124", "status": {"status": "approved"}, "start": "2014-01-20", "end": "2014-02-02"},
+        ]
+        httpretty.register_uri(httpretty.GET, "https://api.bamboohr.com/api/gateway.php/test/v1/time_off/requests",
+                               body=dumps(requests), content_type="application/json")
+
+        cache = TimeOffRequestCache(self.bamboo)
+        result = cache.get('2014-01-01', '2014-01-31', status='approved')
+        self.assertEqual(['1', '2'], [r['id'] for r in result])
+        self.assertEqual(1, len(httpretty.latest_requests()))
+
+        # A narrower window is served locally
+        self.assertEqual(['2'], [r['id'] for r in cache.get('2014-01-15', '2014-01-31', status='approved')])
+        self.assertEqual(1, len(httpretty.latest_requests()))
+
+        # An overlapping window only fetches the missing days, duplicates are merged
+        result = cache.get('2014-01-15', '2014-02-15', status='approved')
+        self.assertEqual(['2'], [r['id'] for r in result])
+        self.assertEqual(2, len(httpretty.latest_requests()))
+        self.assertEqual({'start': ['2014-02-01'], 'end': ['2014-02-15'], 'status': ['approved']}, httpretty.last_request().querystring)
+
+        # Other filters are cached separately
+        cache.get('2014-01-15', '2014-01-31', status='denied')
+        self.assertEqual(3, len(httpretty.latest_requests()))